@@ -5,10 +5,13 @@ class AccountsConfig(AppConfig):
     name = "accounts"
 
     def ready(self) -> None:
-        from django.db.models.signals import post_save
-        from .models import User
-        from .signals import post_save_account_receiver
+        from django.db.models.signals import post_save, post_delete
+        from .models import User, Student
+        from .signals import post_save_account_receiver, drop_stats_receiver
 
         post_save.connect(post_save_account_receiver, sender=User)
+        for model in (User, Student):
+            post_save.connect(drop_stats_receiver, sender=model)
+            post_delete.connect(drop_stats_receiver, sender=model)
 
         return super().ready()
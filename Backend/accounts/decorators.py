@@ -2,6 +2,8 @@ from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import redirect
 
+from .middleware import attach_role_profiles
+
 
 def admin_required(
     function=None,
@@ -43,6 +45,8 @@ def lecturer_required(
 
     # Define the wrapper function to handle the response
     def wrapper(request, *args, **kwargs):
+        # request.lecturer_allocations, also outside RoleProfileMiddleware
+        attach_role_profiles(request)
         if test_func(request.user):
             # Call the original function if the user passes the test
             return function(request, *args, **kwargs) if function else None
@@ -68,6 +72,8 @@ def student_required(
 
     # Define the wrapper function to handle the response
     def wrapper(request, *args, **kwargs):
+        # request.student, also outside RoleProfileMiddleware
+        attach_role_profiles(request)
         if test_func(request.user):
             # Call the original function if the user passes the test
             return function(request, *args, **kwargs) if function else None
@@ -0,0 +1,238 @@
+"""
+Student and lecturer list exports as PDF, CSV or XLSX.
+
+The lists are read with ``.iterator()`` in chunks of ``CHUNK_SIZE`` rows:
+
+- CSV and XLSX are written row by row, either streamed straight into a
+  response (``export_chunks``) or to a file by the PDF job worker, so
+  memory stays flat however many users there are.
+- The PDF renders the ``pdf/*_list.html`` template once per chunk with
+  xhtml2pdf and appends the pages of each chunk to one document with pypdf,
+  instead of laying out the HTML of the whole list at once. It is not
+  streamed: see ``pdf_document``.
+
+All formats are also available as background jobs (``PdfJob.USER_LIST``,
+see ``result.pdf_jobs``), which report their progress per chunk.
+"""
+import csv
+import re
+import zipfile
+from collections import namedtuple
+from io import BytesIO, StringIO
+from xml.sax.saxutils import escape
+
+from django.template.loader import get_template
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+from xhtml2pdf import pisa
+
+from core.utils import StreamBuffer
+
+from .models import User, Student
+
+CHUNK_SIZE = 500
+
+ListExport = namedtuple("ListExport", "queryset template context_name columns filename")
+
+LISTS = {
+    "students": ListExport(
+        queryset=lambda: Student.objects.select_related("student", "program"),
+        template="pdf/student_list.html",
+        context_name="students",
+        columns=(
+            ("ID No.", lambda student: student.student.username),
+            ("Full Name", lambda student: student.student.get_full_name),
+            ("Email", lambda student: student.student.email),
+            ("Level", lambda student: student.level or ""),
+            ("Program", lambda student: str(student.program or "")),
+        ),
+        filename="students_list",
+    ),
+    "lecturers": ListExport(
+        queryset=lambda: User.objects.filter(is_lecturer=True),
+        template="pdf/lecturer_list.html",
+        context_name="lecturers",
+        columns=(
+            ("ID No.", lambda lecturer: lecturer.username),
+            ("Full Name", lambda lecturer: lecturer.get_full_name),
+            ("Email", lambda lecturer: lecturer.email),
+            ("Mob No.", lambda lecturer: lecturer.phone or ""),
+            ("Address/City", lambda lecturer: lecturer.address or ""),
+        ),
+        filename="lecturers_list",
+    ),
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_inputs(name, fmt):
+    """Job inputs of a list export. The lists change without their inputs
+    changing, so the inputs carry the minute they were asked for: repeated
+    clicks share a job, later requests get a fresh export."""
+    requested_at = timezone.now().replace(second=0, microsecond=0)
+    return {"list": name, "format": fmt, "requested_at": requested_at.isoformat()}
+
+
+def chunks(export, progress=None):
+    """Lists of at most ``CHUNK_SIZE`` objects; ``progress(done, total)`` is
+    called after each."""
+    total = export.queryset().count() if progress else 0
+    done = 0
+    chunk = []
+    for obj in export.queryset().iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(obj)
+        if len(chunk) == CHUNK_SIZE:
+            done += len(chunk)
+            yield chunk
+            chunk = []
+            if progress:
+                progress(done, total)
+    if chunk:
+        yield chunk
+    if progress:
+        progress(total, total)
+
+
+def rows(export, chunk):
+    return [[str(value(obj)) for _, value in export.columns] for obj in chunk]
+
+
+def csv_chunks(export, progress=None):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in export.columns])
+    for chunk in chunks(export, progress):
+        writer.writerows(rows(export, chunk))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+# The smallest workbook Excel and LibreOffice open: one sheet of inline strings
+
+XLSX_PARTS = (
+    (
+        "[Content_Types].xml",
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>",
+    ),
+    (
+        "_rels/.rels",
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>",
+    ),
+    (
+        "xl/workbook.xml",
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>",
+    ),
+    (
+        "xl/_rels/workbook.xml.rels",
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        "</Relationships>",
+    ),
+)
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+SHEET_TAIL = "</sheetData></worksheet>"
+
+
+# Characters XML 1.0 does not allow even escaped; Excel rejects the workbook
+XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def xlsx_text(value):
+    return escape(XML_ILLEGAL.sub("", value))
+
+
+def xlsx_row(values):
+    cells = "".join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{xlsx_text(value)}</t></is></c>'
+        for value in values
+    )
+    return f"<row>{cells}</row>"
+
+
+def xlsx_chunks(export, progress=None):
+    stream = StreamBuffer()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in XLSX_PARTS:
+            archive.writestr(name, xml)
+        with archive.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+            sheet.write(SHEET_HEAD.encode())
+            sheet.write(xlsx_row(header for header, _ in export.columns).encode())
+            for chunk in chunks(export, progress):
+                sheet.write(
+                    "".join(xlsx_row(row) for row in rows(export, chunk)).encode()
+                )
+                yield stream.pop()
+            sheet.write(SHEET_TAIL.encode())
+    yield stream.pop()
+
+
+def pdf_document(export, progress=None):
+    """The whole PDF as a single bytes chunk.
+
+    Only one chunk of rows and its HTML are held at a time. The PdfWriter
+    keeps the pages of every chunk until the end, though, so peak memory is
+    about twice the size of the finished PDF: its pages, then its bytes.
+    That is why PDF lists are only rendered by the job worker.
+    """
+    template = get_template(export.template)
+    writer = PdfWriter()
+    offset = 0
+    for chunk in chunks(export, progress):
+        writer.append(
+            PdfReader(BytesIO(render_pdf_chunk(export, template, chunk, offset)))
+        )
+        offset += len(chunk)
+    # An empty list still renders once, with its "no rows" line
+    if not offset:
+        writer.append(PdfReader(BytesIO(render_pdf_chunk(export, template, [], 0))))
+    out = BytesIO()
+    writer.write(out)
+    yield out.getvalue()
+
+
+def render_pdf_chunk(export, template, chunk, offset):
+    html = template.render({export.context_name: chunk, "offset": offset})
+    out = BytesIO()
+    if pisa.CreatePDF(html, dest=out).err:
+        raise ExportError(f"xhtml2pdf could not render {export.template}")
+    return out.getvalue()
+
+
+# Keys are the formats of PdfJob.CONTENT_TYPES
+EXPORTERS = {"pdf": pdf_document, "csv": csv_chunks, "xlsx": xlsx_chunks}
+
+
+def export_chunks(name, fmt, progress=None):
+    """Bytes of the ``name`` list in ``fmt``, a chunk at a time."""
+    return EXPORTERS[fmt](LISTS[name], progress)
+
+
+def render_user_list(inputs, out, progress=None):
+    """PDF job renderer of the list exports (``out`` is a path)."""
+    with open(out, "wb") as destination:
+        for data in export_chunks(inputs["list"], inputs["format"], progress):
+            destination.write(data)
@@ -0,0 +1,92 @@
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject, cached_property
+
+
+class LecturerAllocations:
+    """
+    The CourseAllocation rows of a lecturer (none for other users), loaded
+    with their courses on first iteration; ``teaches`` only needs the ids of
+    the allocated courses, loaded with one query of their own
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def is_lecturer(self):
+        return self.user.is_authenticated and self.user.is_lecturer
+
+    @cached_property
+    def allocations(self):
+        from course.models import CourseAllocation
+
+        if not self.is_lecturer():
+            return []
+        return list(
+            CourseAllocation.objects.filter(lecturer_id=self.user.pk).prefetch_related(
+                "courses"
+            )
+        )
+
+    @cached_property
+    def course_ids(self):
+        from course.models import Course
+
+        if not self.is_lecturer():
+            return frozenset()
+        return frozenset(
+            Course.objects.filter(
+                allocated_course__lecturer_id=self.user.pk
+            ).values_list("pk", flat=True)
+        )
+
+    def teaches(self, course):
+        """Whether ``course`` (a Course or its id) is allocated to the user"""
+        return getattr(course, "pk", course) in self.course_ids
+
+    def __iter__(self):
+        return iter(self.allocations)
+
+    def __len__(self):
+        return len(self.allocations)
+
+
+def load_student(user):
+    from .models import Student
+
+    if not (user.is_authenticated and user.is_student):
+        return None
+    return (
+        Student.objects.select_related("student", "program")
+        .filter(student_id=user.pk)
+        .first()
+    )
+
+
+def attach_role_profiles(request):
+    """
+    Set ``request.student`` (the Student profile, falsy when the user has
+    none) and ``request.lecturer_allocations``, each loaded on first use and
+    then reused for the rest of the request
+    """
+    if not hasattr(request, "student"):
+        request.student = SimpleLazyObject(lambda: load_student(request.user))
+    if not hasattr(request, "lecturer_allocations"):
+        request.lecturer_allocations = LecturerAllocations(request.user)
+    return request
+
+
+def student_or_404(request):
+    """``request.student``, for views a superuser can open without having a
+    Student profile"""
+    if not request.student:
+        raise Http404("No Student profile for this user.")
+    return request.student
+
+
+class RoleProfileMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        attach_role_profiles(request)
+        return self.get_response(request)
@@ -7,6 +7,7 @@ from django.db.models import Q
 from PIL import Image
 
 from course.models import Program
+from .stats import get_stats
 from .validators import ASCIIUsernameValidator
 
 
@@ -155,10 +156,8 @@ class Student(models.Model):
 
     @classmethod
     def get_gender_count(cls):
-        males_count = Student.objects.filter(student__gender="M").count()
-        females_count = Student.objects.filter(student__gender="F").count()
-
-        return {"M": males_count, "F": females_count}
+        stats = get_stats()["students"]
+        return {"M": stats["male"], "F": stats["female"]}
 
     def get_absolute_url(self):
         return reverse("profile_single", kwargs={"id": self.id})
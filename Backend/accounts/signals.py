@@ -1,3 +1,4 @@
+from .stats import invalidate_stats
 from .utils import (
     generate_student_credentials,
     generate_lecturer_credentials,
@@ -30,3 +31,11 @@ def post_save_account_receiver(sender, instance=None, created=False, *args, **kw
                 instance.save()
                 # Send email with the generated credentials
                 send_new_account_email(instance, password)
+
+
+def drop_stats_receiver(sender, instance=None, update_fields=None, **kwargs):
+    """Drop the cached headcounts (see ``accounts.stats``); logins only touch
+    ``last_login`` and keep them."""
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_stats()
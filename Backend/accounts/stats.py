@@ -0,0 +1,68 @@
+"""
+Headcounts shown on the dashboard and the student and lecturer lists.
+
+A snapshot is one conditional aggregation (``Count(filter=Q(...))``) per
+model instead of a COUNT per figure. It is kept in the "querysets" cache
+alias for ``STATS_TIMEOUT`` seconds and dropped whenever a user or a
+student is saved or deleted (see ``accounts.signals``), so the figures are
+at most that old only for changes made outside the ORM.
+"""
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+STATS_CACHE_KEY = "accounts:stats"
+STATS_TIMEOUT = 60
+
+# Users who joined within this many days count as recent
+RECENT_DAYS = 30
+
+
+def user_stats():
+    from .models import User
+
+    recent = timezone.now() - timedelta(days=RECENT_DAYS)
+    lecturer = Q(is_lecturer=True)
+    return User.objects.aggregate(
+        students=Count("pk", filter=Q(is_student=True)),
+        superusers=Count("pk", filter=Q(is_superuser=True)),
+        lecturers=Count("pk", filter=lecturer),
+        active_lecturers=Count("pk", filter=lecturer & Q(is_active=True)),
+        male_lecturers=Count("pk", filter=lecturer & Q(gender="M")),
+        female_lecturers=Count("pk", filter=lecturer & Q(gender="F")),
+        recent_lecturers=Count("pk", filter=lecturer & Q(date_joined__gte=recent)),
+    )
+
+
+def student_stats():
+    from .models import Student
+
+    return Student.objects.aggregate(
+        total=Count("pk"),
+        active=Count("pk", filter=Q(student__is_active=True)),
+        male=Count("pk", filter=Q(student__gender="M")),
+        female=Count("pk", filter=Q(student__gender="F")),
+        bachelor=Count("pk", filter=Q(level="Bachelor")),
+        master=Count("pk", filter=Q(level="Master")),
+    )
+
+
+def get_stats():
+    """``{"users": {...}, "students": {...}}``, from the cache if possible."""
+    cache = caches["querysets"]
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = {"users": user_stats(), "students": student_stats()}
+        cache.set(STATS_CACHE_KEY, stats, STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_stats():
+    cache = caches["querysets"]
+    cache.delete(STATS_CACHE_KEY)
+    # Again once committed, in case another request cached the old figures
+    # in the meantime
+    transaction.on_commit(lambda: cache.delete(STATS_CACHE_KEY))
@@ -0,0 +1,133 @@
+import csv
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from pypdf import PdfReader
+
+from accounts.exports import export_chunks
+from accounts.models import User, Student
+from course.models import Program
+from result.models import PdfJob
+
+
+@mock.patch("accounts.exports.CHUNK_SIZE", 2)
+class ListExportTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media, PDF_JOBS_EAGER=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        program = Program.objects.create(title="Computer Science")
+        self.students = []
+        for i in range(3):
+            user = User.objects.create_user(
+                username=f"student{i}",
+                password="password",
+                first_name="Student",
+                last_name=f"<{i}> & co",
+                is_student=True,
+            )
+            self.students.append(Student.objects.create(student=user, program=program))
+        self.usernames = sorted(student.student.username for student in self.students)
+        self.url = reverse("student_list_pdf")
+
+    def test_csv_is_streamed_in_chunks(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {"format": "csv"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        chunks = list(response.streaming_content)
+        self.assertGreaterEqual(len(chunks), 2)
+        rows = list(csv.reader(StringIO(b"".join(chunks).decode())))
+        self.assertEqual(rows[0][0], "ID No.")
+        self.assertEqual(sorted(row[0] for row in rows[1:]), self.usernames)
+
+    def test_xlsx_is_a_valid_workbook(self):
+        User.objects.filter(pk=self.students[1].student_id).update(
+            last_name="Tab\x0bbed\x1f"
+        )
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {"format": "xlsx"})
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertIn("xl/workbook.xml", archive.namelist())
+
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        namespace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+        rows = [
+            [cell.text for cell in row.iter(f"{namespace}t")]
+            for row in sheet.iter(f"{namespace}row")
+        ]
+        self.assertEqual(len(rows), 4)
+        self.assertIn("Student <0> & co", [row[1] for row in rows])
+        self.assertIn("Student Tabbed", [row[1] for row in rows])
+
+    def test_progress_is_reported_per_chunk(self):
+        calls = []
+        list(export_chunks("students", "csv", lambda *step: calls.append(step)))
+        self.assertEqual(calls, [(2, 3), (3, 3)])
+
+    def test_pdf_is_rendered_by_chunks_in_a_job(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        job = PdfJob.objects.get()
+        self.assertEqual(job.kind, PdfJob.USER_LIST)
+        self.assertRedirects(
+            response,
+            reverse("pdf_job_status", args=[job.key]),
+            target_status_code=202,
+        )
+
+        call_command("process_pdf_jobs", once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, PdfJob.DONE, job.error)
+        self.assertEqual(job.progress, 100)
+        self.assertTrue(job.path.endswith(".pdf"))
+
+        # One rendered chunk per page, numbered on from the previous chunk
+        pages = PdfReader(job.path).pages
+        self.assertEqual(len(pages), 2)
+        self.assertIn("3.", pages[1].extract_text())
+
+        status = self.client.get(
+            reverse("pdf_job_status", args=[job.key]), {"format": "json"}
+        )
+        self.assertEqual(status.json()["progress"], 100)
+
+    def test_csv_in_the_background(self):
+        self.client.force_login(self.admin)
+        self.client.get(
+            reverse("lecturer_list_pdf"), {"format": "csv", "background": 1}
+        )
+        call_command("process_pdf_jobs", once=True, stdout=StringIO())
+
+        job = PdfJob.objects.get()
+        self.assertEqual(job.status, PdfJob.DONE, job.error)
+        response = self.client.get(reverse("pdf_job_download", args=[job.key]))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines()[0],
+            "ID No.,Full Name,Email,Mob No.,Address/City",
+        )
+
+    def test_exports_are_for_admins_only(self):
+        self.client.force_login(self.students[0].student)
+        response = self.client.get(self.url, {"format": "csv"})
+        self.assertNotEqual(response.status_code, 200)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {"format": "docx"})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.middleware import attach_role_profiles
+from accounts.models import User, Student
+from course.models import Course, CourseAllocation, Program
+
+
+class RoleProfileTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.program = Program.objects.create(title="Computer Science")
+        self.user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.student = Student.objects.create(
+            student=self.user, program=self.program, level="Bachelor"
+        )
+        self.lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        self.course = Course.objects.create(
+            title="Algorithms", code="ALG", program=self.program
+        )
+        self.other = Course.objects.create(
+            title="Databases", code="DB", program=self.program
+        )
+        allocation = CourseAllocation.objects.create(lecturer=self.lecturer)
+        allocation.courses.add(self.course)
+
+    def request(self, user):
+        request = self.factory.get("/")
+        request.user = user
+        return attach_role_profiles(request)
+
+    def test_student_profile_is_loaded_once_with_its_program(self):
+        request = self.request(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.student.pk, self.student.pk)
+            self.assertEqual(request.student.program.title, "Computer Science")
+            self.assertEqual(request.student.student, self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(request.lecturer_allocations.teaches(self.course))
+
+    def test_lecturer_allocations_are_loaded_once(self):
+        request = self.request(self.lecturer)
+        with self.assertNumQueries(1):
+            self.assertTrue(request.lecturer_allocations.teaches(self.course))
+            self.assertTrue(request.lecturer_allocations.teaches(self.course.pk))
+            self.assertFalse(request.lecturer_allocations.teaches(self.other))
+        with self.assertNumQueries(0):
+            self.assertFalse(request.student)
+
+    def test_views_404_for_students_without_profile(self):
+        user = User.objects.create_user(
+            username="orphan", password="password", is_student=True
+        )
+        self.client.force_login(user)
+        response = self.client.get(reverse("grade_results"))
+        self.assertEqual(response.status_code, 404)
+
+    def test_views_read_the_profile_once(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("grade_results"))
+        self.assertEqual(response.status_code, 200)
+        student_queries = [
+            q["sql"] for q in queries if 'FROM "accounts_student"' in q["sql"]
+        ]
+        self.assertEqual(len(student_queries), 1)
@@ -0,0 +1,73 @@
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User, Student
+from accounts.stats import get_stats
+from course.models import Program
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True, gender="F"
+        )
+        program = Program.objects.create(title="Computer Science")
+        for gender, level in (("M", "Bachelor"), ("M", "Master"), ("F", "Bachelor")):
+            user = User.objects.create_user(
+                username=f"student-{gender}-{level}",
+                password="password",
+                is_student=True,
+                gender=gender,
+            )
+            Student.objects.create(student=user, program=program, level=level)
+        caches["querysets"].clear()
+
+    def test_one_query_per_model_then_cached(self):
+        with self.assertNumQueries(2):
+            stats = get_stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_stats(), stats)
+
+        self.assertEqual(stats["users"]["students"], 3)
+        self.assertEqual(stats["users"]["lecturers"], 1)
+        self.assertEqual(stats["users"]["female_lecturers"], 1)
+        self.assertEqual(stats["users"]["recent_lecturers"], 1)
+        self.assertEqual(stats["users"]["superusers"], 1)
+        self.assertEqual(
+            stats["students"],
+            {
+                "total": 3,
+                "active": 3,
+                "male": 2,
+                "female": 1,
+                "bachelor": 2,
+                "master": 1,
+            },
+        )
+
+    def test_changes_drop_the_snapshot_but_logins_do_not(self):
+        get_stats()
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(0):
+            get_stats()
+
+        Student.objects.get(level="Master").delete()
+        self.assertEqual(get_stats()["students"]["total"], 2)
+
+        User.objects.filter(is_lecturer=True).get().delete()
+        self.assertEqual(get_stats()["users"]["lecturers"], 0)
+
+    def test_list_pages_use_the_snapshot(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("student_list"))
+        self.assertEqual(response.context["male_students"], 2)
+        self.assertEqual(response.context["master_students"], 1)
+
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["student_count"], 3)
+        self.assertEqual(response.context["females_count"], 1)
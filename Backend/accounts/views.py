@@ -10,10 +10,11 @@ from django.contrib.auth.forms import PasswordChangeForm
 from django_filters.views import FilterView
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
-from core.models import Session, Semester
 from course.models import Course
-from result.models import TakenCourse
+from result.models import TakenCourse, PdfJob
+from result.pdf_jobs import request_pdf, pdf_job_response
 from .decorators import admin_required
+from .middleware import student_or_404
 from .forms import (
     StaffAddForm,
     StudentAddForm,
@@ -26,10 +27,11 @@ from .forms import (
 )
 from .models import User, Student, Parent, DepartmentHead
 from .filters import LecturerFilter, StudentFilter
+from .exports import LISTS, export_chunks, export_inputs
+from .stats import get_stats
 
 # to generate pdf from template we need the following
-from django.http import HttpResponse
-from django.template.loader import get_template  # to get template which render as pdf
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from xhtml2pdf import pisa
 from django.template.loader import (
     render_to_string,
@@ -85,10 +87,8 @@ def user_count(request):
 @login_required
 def profile(request):
     """Show profile of any user that fire out the request"""
-    current_session = Session.objects.filter(is_current_session=True).first()
-    current_semester = Semester.objects.filter(
-        is_current_semester=True, session=current_session
-    ).first()
+    current_session = request.academic_period.session
+    current_semester = request.academic_period.session_semester
 
     if request.user.is_lecturer:
         # Mostrar todos los cursos asignados al profesor, no solo del semestre actual
@@ -106,7 +106,7 @@ def profile(request):
             },
         )
     elif request.user.is_student:
-        level = Student.objects.get(student__pk=request.user.id)
+        level = student_or_404(request)
         try:
             parent = Parent.objects.get(student=level)
         except:
@@ -180,10 +180,8 @@ def profile_single(request, id):
             messages.error(request, "No tienes permisos para ver este perfil.")
             return redirect("add_score")
 
-    current_session = Session.objects.filter(is_current_session=True).first()
-    current_semester = Semester.objects.filter(
-        is_current_semester=True, session=current_session
-    ).first()
+    current_session = request.academic_period.session
+    current_semester = request.academic_period.session_semester
 
     user = User.objects.get(pk=id)
     """
@@ -465,19 +463,14 @@ class LecturerFilterView(FilterView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Estadísticas generales
-        total_lecturers = User.objects.filter(is_lecturer=True).count()
-        active_lecturers = User.objects.filter(is_lecturer=True, is_active=True).count()
+        # Estadísticas (una sola consulta, en caché)
+        stats = get_stats()["users"]
+        total_lecturers = stats["lecturers"]
+        active_lecturers = stats["active_lecturers"]
         inactive_lecturers = total_lecturers - active_lecturers
-        
-        # Estadísticas por género
-        male_lecturers = User.objects.filter(is_lecturer=True, gender='M').count()
-        female_lecturers = User.objects.filter(is_lecturer=True, gender='F').count()
-        
-        # Estadísticas por fecha de registro (últimos 30 días)
-        from datetime import datetime, timedelta
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        recent_lecturers = User.objects.filter(is_lecturer=True, date_joined__gte=thirty_days_ago).count()
+        male_lecturers = stats["male_lecturers"]
+        female_lecturers = stats["female_lecturers"]
+        recent_lecturers = stats["recent_lecturers"]
         
         # Últimos registros
         latest_lecturers = User.objects.filter(is_lecturer=True).order_by('-date_joined')[:5]
@@ -497,23 +490,10 @@ class LecturerFilterView(FilterView):
 
 
 # lecturers list pdf
+@login_required
+@admin_required
 def render_lecturer_pdf_list(request):
-    lecturers = User.objects.filter(is_lecturer=True)
-    template_path = "pdf/lecturer_list.html"
-    context = {"lecturers": lecturers}
-    response = HttpResponse(
-        content_type="application/pdf"
-    )  # convert the response to pdf
-    response["Content-Disposition"] = 'filename="lecturers_list.pdf"'
-    # find the template and render it.
-    template = get_template(template_path)
-    html = template.render(context)
-    # create a pdf
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    # if error then show some funny view
-    if pisa_status.err:
-        return HttpResponse("We had some errors <pre>" + html + "</pre>")
-    return response
+    return list_export_response(request, "lecturers")
 
 
 # @login_required
@@ -578,18 +558,15 @@ class StudentListView(FilterView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Estadísticas generales
-        total_students = Student.objects.count()
-        active_students = Student.objects.filter(student__is_active=True).count()
+        # Estadísticas (una sola consulta, en caché)
+        stats = get_stats()["students"]
+        total_students = stats["total"]
+        active_students = stats["active"]
         inactive_students = total_students - active_students
-        
-        # Estadísticas por género
-        male_students = Student.objects.filter(student__gender='M').count()
-        female_students = Student.objects.filter(student__gender='F').count()
-        
-        # Estadísticas por nivel
-        bachelor_students = Student.objects.filter(level='Bachelor').count()
-        master_students = Student.objects.filter(level='Master').count()
+        male_students = stats["male"]
+        female_students = stats["female"]
+        bachelor_students = stats["bachelor"]
+        master_students = stats["master"]
         
         # Últimos registros
         recent_students = Student.objects.select_related('student', 'program').order_by('-student__date_joined')[:5]
@@ -610,23 +587,30 @@ class StudentListView(FilterView):
 
 
 # student list pdf
+@login_required
+@admin_required
 def render_student_pdf_list(request):
-    students = Student.objects.all()
-    template_path = "pdf/student_list.html"
-    context = {"students": students}
-    response = HttpResponse(
-        content_type="application/pdf"
-    )  # convert the response to pdf
-    response["Content-Disposition"] = 'filename="students_list.pdf"'
-    # find the template and render it.
-    template = get_template(template_path)
-    html = template.render(context)
-    # create a pdf
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    # if error then show some funny view
-    if pisa_status.err:
-        return HttpResponse("We had some errors <pre>" + html + "</pre>")
-    return response
+    return list_export_response(request, "students")
+
+
+def list_export_response(request, name):
+    """``?format=pdf`` (default), ``csv`` or ``xlsx``. CSV and XLSX are
+    streamed as they are written unless ``?background=1`` asks for a job;
+    the PDF is always rendered by a PDF job."""
+    fmt = request.GET.get("format", "pdf")
+    if fmt not in PdfJob.CONTENT_TYPES:
+        raise Http404
+    filename = f"{LISTS[name].filename}.{fmt}"
+    if fmt != "pdf" and not request.GET.get("background"):
+        response = StreamingHttpResponse(
+            export_chunks(name, fmt), content_type=PdfJob.CONTENT_TYPES[fmt]
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+    job = request_pdf(
+        PdfJob.USER_LIST, export_inputs(name, fmt), filename, request.user
+    )
+    return pdf_job_response(request, job)
 
 
 @login_required
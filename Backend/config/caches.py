@@ -0,0 +1,86 @@
+"""
+CACHES built from environment variables.
+
+Every alias uses ``CACHE_BACKEND`` unless ``CACHE_<ALIAS>_BACKEND`` says
+otherwise:
+
+- ``locmem``: per process memory (default, fine for a single worker)
+- ``file``: files under ``CACHE_LOCATION``, shared by every worker of a host
+- ``redis``: a Redis protocol server at ``CACHE_LOCATION`` (``redis://...``),
+  ``CACHE_REDIS_CONNECTION_CLASS`` swaps the connection class, e.g.
+  ``fakeredis.FakeConnection`` to run without a server
+- ``dummy``: no caching at all
+"""
+import os
+
+from django.utils.module_loading import import_string
+
+CACHE_ALIASES = ("default", "sessions", "fragments", "querysets")
+
+BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+
+# Seconds; None keeps the entry until it is evicted or invalidated
+DEFAULT_TIMEOUTS = {
+    "default": 300,
+    "sessions": None,
+    "fragments": 600,
+    "querysets": 300,
+}
+
+
+def cache_alias(alias, backend, location, key_prefix, timeout, redis_options=None):
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown cache backend {backend!r} for {alias!r}, "
+            f"expected one of {', '.join(BACKENDS)}"
+        )
+    settings = {
+        "BACKEND": BACKENDS[backend],
+        "KEY_PREFIX": f"{key_prefix}:{alias}",
+        "TIMEOUT": timeout,
+    }
+    if backend == "locmem":
+        settings["LOCATION"] = alias
+    elif backend == "file":
+        settings["LOCATION"] = os.path.join(location, alias)
+    elif backend == "redis":
+        settings["LOCATION"] = location or "redis://127.0.0.1:6379/0"
+        if redis_options:
+            settings["OPTIONS"] = dict(redis_options)
+    return settings
+
+
+def build_caches(env, base_dir):
+    """CACHES for every alias in ``CACHE_ALIASES``.
+
+    ``env`` is a ``decouple.config``-like callable.
+    """
+    backend = env("CACHE_BACKEND", default="locmem")
+    location = env("CACHE_LOCATION", default="")
+    key_prefix = env("CACHE_KEY_PREFIX", default="lms")
+
+    redis_options = {}
+    connection_class = env("CACHE_REDIS_CONNECTION_CLASS", default="")
+    if connection_class:
+        redis_options["connection_class"] = import_string(connection_class)
+
+    caches = {}
+    for alias in CACHE_ALIASES:
+        alias_backend = env(f"CACHE_{alias.upper()}_BACKEND", default=backend)
+        alias_location = env(f"CACHE_{alias.upper()}_LOCATION", default=location)
+        if alias_backend == "file" and not alias_location:
+            alias_location = os.path.join(base_dir, "cache")
+        caches[alias] = cache_alias(
+            alias,
+            alias_backend,
+            alias_location,
+            key_prefix,
+            DEFAULT_TIMEOUTS[alias],
+            redis_options,
+        )
+    return caches
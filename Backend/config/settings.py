@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 import os
 from decouple import config
 
+from .caches import build_caches
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -78,6 +80,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.CurrentPeriodMiddleware",
+    "accounts.middleware.RoleProfileMiddleware",
+    "core.activity.ActivityLogMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -121,6 +126,17 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Aliases and backends are documented in config/caches.py
+
+CACHES = build_caches(config, BASE_DIR)
+
+# Keep sessions in the "sessions" cache, backed by the database
+if config("SESSION_CACHE", default=False, cast=bool):
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    SESSION_CACHE_ALIAS = "sessions"
+
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -257,5 +273,16 @@ CSRF_COOKIE_SAMESITE = 'Lax'  # Para desarrollo
 CSRF_TRUSTED_ORIGINS = ['http://localhost:8000', 'http://127.0.0.1:8000']
 CSRF_USE_SESSIONS = False  # Usar cookies en lugar de sesiones
 
+# PDF jobs (see result/pdf_jobs.py): render inside the request instead of in
+# "manage.py process_pdf_jobs", for development without a worker
+PDF_JOBS_EAGER = config("PDF_JOBS_EAGER", default=False, cast=bool)
+# Processes rendering certificates for a ZIP export, 0 renders in the request
+PDF_EXPORT_WORKERS = config("PDF_EXPORT_WORKERS", default=2, cast=int)
+
+# Activity log (see core/activity.py): entries are buffered and written in
+# batches; turn it off e.g. for bulk data loads
+ACTIVITY_LOG_ENABLED = config("ACTIVITY_LOG_ENABLED", default=True, cast=bool)
+ACTIVITY_LOG_BUFFER_SIZE = config("ACTIVITY_LOG_BUFFER_SIZE", default=500, cast=int)
+
 STUDENT_ID_PREFIX = config("STUDENT_ID_PREFIX", "ugr")
 LECTURER_ID_PREFIX = config("LECTURER_ID_PREFIX", "lec")
@@ -0,0 +1,61 @@
+"""
+Current session and semester, resolved once and shared.
+
+``get_current_period()`` keeps the current ``Session``/``Semester`` pair in
+the "querysets" cache alias, so with a shared backend every worker reads
+it without touching the database; ``core.signals`` drops it whenever a
+session or semester is saved or deleted. Views read it from
+``request.academic_period`` (see ``CurrentPeriodMiddleware``), which
+resolves it at most once per request.
+"""
+from django.core.cache import caches
+from django.db import transaction
+
+CURRENT_PERIOD_CACHE_KEY = "core:current-academic-period"
+CURRENT_PERIOD_TIMEOUT = 60 * 60
+
+
+class AcademicPeriod:
+    def __init__(self, session, semester):
+        self.session = session
+        self.semester = semester
+
+    @property
+    def session_semester(self):
+        """The current semester, only if it belongs to the current session."""
+        if (
+            self.session is None
+            or self.semester is None
+            or self.semester.session_id != self.session.pk
+        ):
+            return None
+        return self.semester
+
+    def __repr__(self):
+        return f"<AcademicPeriod {self.session} / {self.semester}>"
+
+
+def load_current_period():
+    from .models import Session, Semester
+
+    return AcademicPeriod(
+        Session.objects.filter(is_current_session=True).first(),
+        Semester.objects.filter(is_current_semester=True).first(),
+    )
+
+
+def get_current_period():
+    cache = caches["querysets"]
+    period = cache.get(CURRENT_PERIOD_CACHE_KEY)
+    if period is None:
+        period = load_current_period()
+        cache.set(CURRENT_PERIOD_CACHE_KEY, period, CURRENT_PERIOD_TIMEOUT)
+    return period
+
+
+def invalidate_current_period():
+    cache = caches["querysets"]
+    cache.delete(CURRENT_PERIOD_CACHE_KEY)
+    # Again once committed, in case another request cached the old period
+    # in the meantime
+    transaction.on_commit(lambda: cache.delete(CURRENT_PERIOD_CACHE_KEY))
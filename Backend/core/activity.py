@@ -0,0 +1,122 @@
+"""
+Buffered ActivityLog writer.
+
+``log_activity(message)`` keeps the entry in memory for the current thread
+and writes it later, together with the others, in one ``bulk_create``:
+
+- inside a transaction, when it commits (``transaction.on_commit``).
+  Entries logged inside a savepoint that is rolled back are dropped with
+  it, as the INSERTs they replace would have been;
+- otherwise, inside a request, when the response is ready
+  (``ActivityLogMiddleware``);
+- otherwise right away.
+
+A buffer also goes out as soon as it holds ``ACTIVITY_LOG_BUFFER_SIZE``
+entries. ``ACTIVITY_LOG_ENABLED = False`` turns logging off, and
+``activity_log_disabled()`` does so for a block, e.g. a bulk data load.
+"""
+import threading
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+_state = threading.local()
+
+
+class Buffer:
+    def __init__(self):
+        self.entries = []
+
+    def add(self, message):
+        from .models import ActivityLog
+
+        # Translated now, the language may be gone by the time it is written
+        self.entries.append(ActivityLog(message=str(message)))
+        if len(self.entries) >= getattr(settings, "ACTIVITY_LOG_BUFFER_SIZE", 500):
+            self.flush()
+
+    def flush(self):
+        from .models import ActivityLog
+
+        entries, self.entries = self.entries, []
+        if entries:
+            ActivityLog.objects.bulk_create(entries)
+
+
+class TransactionBuffer(Buffer):
+    """Entries logged at one savepoint level, written when the transaction
+    commits.
+
+    ``registered`` is set while the ``on_commit`` callback is pending and
+    cleared once the entries are written. The callback is the only strong
+    reference to the buffer (see ``transaction_buffer``): when its savepoint
+    or transaction rolls back, Django discards it and the buffer goes with it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        transaction.on_commit(self.flush)
+        self.registered = True
+
+    def flush(self):
+        self.registered = False
+        super().flush()
+
+
+@contextmanager
+def activity_log_disabled():
+    """Log nothing in this thread inside the block."""
+    _state.disabled = getattr(_state, "disabled", 0) + 1
+    try:
+        yield
+    finally:
+        _state.disabled -= 1
+
+
+def logging_enabled():
+    return getattr(settings, "ACTIVITY_LOG_ENABLED", True) and not getattr(
+        _state, "disabled", 0
+    )
+
+
+def transaction_buffer():
+    connection = transaction.get_connection()
+    buffers = getattr(_state, "transaction_buffers", None)
+    if buffers is None:
+        buffers = _state.transaction_buffers = weakref.WeakValueDictionary()
+    key = (connection.alias, tuple(connection.savepoint_ids))
+    buffer = buffers.get(key)
+    if buffer is None or not buffer.registered:
+        buffer = buffers[key] = TransactionBuffer()
+    return buffer
+
+
+def log_activity(message):
+    if not logging_enabled():
+        return
+    if transaction.get_connection().in_atomic_block:
+        transaction_buffer().add(message)
+    elif getattr(_state, "request_buffer", None) is not None:
+        _state.request_buffer.add(message)
+    else:
+        buffer = Buffer()
+        buffer.add(message)
+        buffer.flush()
+
+
+class ActivityLogMiddleware:
+    """Write the entries logged outside transactions during a request in one
+    INSERT at the end of it."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.request_buffer = Buffer()
+        try:
+            return self.get_response(request)
+        finally:
+            buffer, _state.request_buffer = _state.request_buffer, None
+            buffer.flush()
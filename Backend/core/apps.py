@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self) -> None:
+        from django.db.models.signals import post_save, post_delete
+        from .models import Session, Semester
+        from .signals import academic_period_changed_receiver
+
+        for model in (Session, Semester):
+            post_save.connect(academic_period_changed_receiver, sender=model)
+            post_delete.connect(academic_period_changed_receiver, sender=model)
+
+        return super().ready()
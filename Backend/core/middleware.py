@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from .academic_period import get_current_period
+
+
+class CurrentPeriodMiddleware:
+    """
+    Set ``request.academic_period``, resolved on first use and then reused
+    for the rest of the request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.academic_period = SimpleLazyObject(get_current_period)
+        return self.get_response(request)
@@ -0,0 +1,8 @@
+from .academic_period import invalidate_current_period
+
+
+def academic_period_changed_receiver(sender, instance=None, *args, **kwargs):
+    """
+    Drop the cached current session/semester when any of them changes
+    """
+    invalidate_current_period()
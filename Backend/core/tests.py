@@ -1,3 +1,188 @@
-from django.test import TestCase
+import unittest
+from tempfile import TemporaryDirectory
 
-# Create your tests here.
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache import CacheHandler, caches
+from django.http import HttpResponse
+from django.db import transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    RequestFactory,
+    override_settings,
+)
+
+from config.caches import build_caches, CACHE_ALIASES
+from course.models import Program
+from .activity import activity_log_disabled
+from .academic_period import get_current_period
+from .middleware import CurrentPeriodMiddleware
+from .models import ActivityLog, Session, Semester
+
+try:
+    import fakeredis
+except ImportError:  # fakeredis (and redis) are only needed for the Redis mode
+    fakeredis = None
+
+
+def env_from(values):
+    def env(name, default=None, cast=None):
+        return values.get(name, default)
+
+    return env
+
+
+class CacheSettingsTests(SimpleTestCase):
+    def test_defaults_to_one_locmem_cache_per_alias(self):
+        caches = build_caches(env_from({}), "/srv/lms")
+        self.assertEqual(tuple(caches), CACHE_ALIASES)
+        self.assertEqual(
+            {settings["LOCATION"] for settings in caches.values()}, set(CACHE_ALIASES)
+        )
+        self.assertEqual(caches["querysets"]["KEY_PREFIX"], "lms:querysets")
+
+    def test_file_backend_is_shared_per_alias_directory(self):
+        with TemporaryDirectory() as location:
+            settings = build_caches(
+                env_from({"CACHE_BACKEND": "file", "CACHE_LOCATION": location}),
+                "/srv/lms",
+            )
+            writer = CacheHandler(settings)["fragments"]
+            reader = CacheHandler(settings)["fragments"]
+            self.assertIsInstance(writer, FileBasedCache)
+            writer.set("card", "cached")
+            self.assertEqual(reader.get("card"), "cached")
+            self.assertIsNone(CacheHandler(settings)["default"].get("card"))
+
+    def test_alias_backend_can_be_overridden(self):
+        caches = build_caches(
+            env_from({"CACHE_BACKEND": "file", "CACHE_SESSIONS_BACKEND": "dummy"}),
+            "/srv/lms",
+        )
+        self.assertEqual(caches["default"]["LOCATION"], "/srv/lms/cache/default")
+        self.assertTrue(caches["sessions"]["BACKEND"].endswith("DummyCache"))
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_caches(env_from({"CACHE_BACKEND": "memcached"}), "/srv/lms")
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_backend_with_fake_connection(self):
+        settings = build_caches(
+            env_from(
+                {
+                    "CACHE_BACKEND": "redis",
+                    "CACHE_REDIS_CONNECTION_CLASS": "fakeredis.FakeConnection",
+                }
+            ),
+            "/srv/lms",
+        )
+        cache = CacheHandler(settings)["querysets"]
+        cache.set("bundle", {"questions": [1, 2]})
+        self.assertEqual(cache.get("bundle"), {"questions": [1, 2]})
+        cache.set("hits", 0)
+        self.assertEqual(cache.incr("hits"), 1)
+
+
+class CurrentPeriodTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        self.session = Session.objects.create(
+            session="2024/2025", is_current_session=True
+        )
+        self.semester = Semester.objects.create(
+            semester="First", is_current_semester=True, session=self.session
+        )
+
+    def test_period_is_cached_across_calls(self):
+        with self.assertNumQueries(2):
+            period = get_current_period()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_current_period().semester, period.semester)
+        self.assertEqual(period.session, self.session)
+        self.assertEqual(period.session_semester, self.semester)
+
+    def test_saving_a_semester_drops_the_cached_period(self):
+        get_current_period()
+        self.semester.is_current_semester = False
+        self.semester.save()
+        second = Semester.objects.create(
+            semester="Second", is_current_semester=True, session=None
+        )
+
+        period = get_current_period()
+        self.assertEqual(period.semester, second)
+        self.assertIsNone(period.session_semester)
+
+    def test_middleware_resolves_period_lazily_once(self):
+        request = RequestFactory().get("/")
+
+        def view(request):
+            request.academic_period.session
+            request.academic_period.semester
+            return HttpResponse()
+
+        middleware = CurrentPeriodMiddleware(view)
+        with self.assertNumQueries(2):
+            middleware(request)
+        with self.assertNumQueries(0):
+            middleware(RequestFactory().get("/"))
+
+
+class ActivityLogTests(TestCase):
+    def test_entries_are_written_together_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for title in ("Physics", "Chemistry", "Biology"):
+                Program.objects.create(title=title)
+            self.assertFalse(ActivityLog.objects.exists())
+            with self.assertNumQueries(1):
+                Program.objects.create(title="Geology")
+        self.assertEqual(ActivityLog.objects.count(), 4)
+        self.assertIn("Physics", ActivityLog.objects.order_by("pk").first().message)
+
+    def test_entries_of_a_rolled_back_savepoint_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Program.objects.create(title="Physics")
+                    raise ValueError
+            except ValueError:
+                pass
+            Program.objects.create(title="Chemistry")
+        self.assertEqual(
+            [log.message for log in ActivityLog.objects.all()],
+            ["The program 'Chemistry' has been created."],
+        )
+
+    @override_settings(ACTIVITY_LOG_BUFFER_SIZE=2)
+    def test_full_buffer_is_written_early(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for title in ("Physics", "Chemistry", "Biology"):
+                Program.objects.create(title=title)
+            self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+    def test_logging_can_be_switched_off(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with activity_log_disabled():
+                Program.objects.create(title="Physics")
+            with override_settings(ACTIVITY_LOG_ENABLED=False):
+                Program.objects.create(title="Chemistry")
+        self.assertFalse(ActivityLog.objects.exists())
+
+
+class ActivityLogTransactionTests(TransactionTestCase):
+    def test_entries_of_a_rolled_back_transaction_are_dropped(self):
+        try:
+            with transaction.atomic():
+                Program.objects.create(title="Physics")
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            Program.objects.create(title="Chemistry")
+        self.assertEqual(
+            [log.message for log in ActivityLog.objects.all()],
+            ["The program 'Chemistry' has been created."],
+        )
@@ -30,3 +30,27 @@ def send_html_email(subject, recipient_list, template, context):
         recipient_list,
         html_message=html_message,
     )
+
+
+class StreamBuffer:
+    """Write-only file object whose contents are taken out with ``pop``."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
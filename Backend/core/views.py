@@ -3,7 +3,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
 from accounts.decorators import admin_required, lecturer_required
-from accounts.models import User, Student
+from accounts.stats import get_stats
 from .forms import SessionForm, SemesterForm, NewsAndEventsForm
 from .models import NewsAndEvents, ActivityLog, Session, Semester
 
@@ -24,13 +24,13 @@ def home_view(request):
 @login_required
 def dashboard_view(request):
     logs = ActivityLog.objects.all().order_by("-created_at")[:10]
-    gender_count = Student.get_gender_count()
+    stats = get_stats()
     context = {
-        "student_count": User.objects.get_student_count(),
-        "lecturer_count": User.objects.get_lecturer_count(),
-        "superuser_count": User.objects.get_superuser_count(),
-        "males_count": gender_count["M"],
-        "females_count": gender_count["F"],
+        "student_count": stats["users"]["students"],
+        "lecturer_count": stats["users"]["lecturers"],
+        "superuser_count": stats["users"]["superusers"],
+        "males_count": stats["students"]["male"],
+        "females_count": stats["students"]["female"],
         "logs": logs,
     }
     return render(request, "core/dashboard.html", context)
@@ -0,0 +1,76 @@
+"""
+Course "cards": the display fields shown for a course in the catalog,
+registration and program pages.
+
+Cards only depend on the course row, so they are cached per course (and
+language, since they hold translated labels) in the "querysets" cache
+alias and fetched for a whole page with one ``get_many``. Saving or
+deleting a course drops its cards.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import get_language
+
+COURSE_CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(course_id, language=None):
+    return f"course:{course_id}:card:{language or get_language() or ''}"
+
+
+def build_course_card(course):
+    professional_info = {}
+    if course.duration and course.duration_unit:
+        professional_info[
+            "Duración"
+        ] = f"{course.duration} {course.get_duration_unit_display()}"
+    if course.modality:
+        professional_info["Modalidad"] = course.get_modality_display()
+    if course.category:
+        professional_info["Categoría"] = course.get_category_display()
+    if course.max_students:
+        professional_info["Máximo Estudiantes"] = course.max_students
+    if course.certification:
+        professional_info["Certificación"] = "Sí"
+    if course.is_active:
+        professional_info["Estado"] = "Activo"
+    return {
+        "full_duration": course.full_duration,
+        "professional_info": professional_info,
+    }
+
+
+def get_course_cards(courses):
+    """{course id: card} for ``courses``, building and caching the missing
+    ones."""
+    cache = caches["querysets"]
+    keys = {card_cache_key(course.pk): course for course in courses}
+    cards = cache.get_many(keys.keys())
+    missing = {
+        key: build_course_card(course)
+        for key, course in keys.items()
+        if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, COURSE_CARD_TIMEOUT)
+        cards.update(missing)
+    return {course.pk: cards[key] for key, course in keys.items()}
+
+
+def attach_course_cards(courses):
+    """Set ``professional_info`` on every course from its card."""
+    courses = list(courses)
+    cards = get_course_cards(courses)
+    for course in courses:
+        course.professional_info = cards[course.pk]["professional_info"]
+    return courses
+
+
+def invalidate_course_cards(course_id):
+    cache = caches["querysets"]
+    keys = [card_cache_key(course_id, code) for code, _ in settings.LANGUAGES]
+    cache.delete_many(keys)
+    # Again once committed, in case another request cached the old card in
+    # the meantime
+    transaction.on_commit(lambda: cache.delete_many(keys))
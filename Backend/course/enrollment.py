@@ -0,0 +1,149 @@
+"""
+Course registration and drop for a student.
+
+Each call is one transaction with a fixed number of queries whatever the
+number of submitted courses: the courses are resolved with one query that
+locks them with ``select_for_update`` in primary key order, the
+student's current enrollments are read with one query, and the rows are
+written with one ``bulk_create`` or one filtered delete.
+
+The row locks make the capacity check against ``Course.enrolled_count``
+safe against concurrent registrations, and taking them in the same order
+everywhere means two students registering overlapping sets of courses wait
+for each other instead of deadlocking. Since the bulk writes skip the
+TakenCourse receivers, the enrollment counters and the grade ledger are
+updated here directly.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+
+class EnrollmentResult:
+    def __init__(self):
+        self.done = []
+        self.skipped = []
+        self.full = []
+        self.missing = []
+
+    @property
+    def total_credits(self):
+        return sum(course.credit for course in self.done)
+
+
+def parse_course_ids(keys):
+    """(valid ids, keys that are not course ids) from the POSTed keys."""
+    ids, invalid = [], []
+    for key in keys:
+        try:
+            ids.append(int(key))
+        except (TypeError, ValueError):
+            invalid.append(key)
+    return ids, invalid
+
+
+def lock_courses(keys, result):
+    """The courses of ``keys`` locked in primary key order; unknown keys go
+    to ``result.missing``."""
+    from .models import Course
+
+    course_ids, result.missing = parse_course_ids(keys)
+    # Not in_bulk(): it clears the ordering, and with it the lock order
+    locked = list(
+        Course.objects.select_for_update().filter(pk__in=set(course_ids)).order_by("pk")
+    )
+    found = {course.pk for course in locked}
+    result.missing += [pk for pk in dict.fromkeys(course_ids) if pk not in found]
+    return locked
+
+
+def move_counters(courses, step):
+    from .models import Course
+
+    if courses:
+        Course.objects.filter(pk__in=[course.pk for course in courses]).update(
+            enrolled_count=F("enrolled_count") + step
+        )
+
+
+def ledger_deltas(student, rows):
+    """Grade ledger deltas for (course, point) ``rows`` of ``student``."""
+    deltas = {}
+    for course, point in rows:
+        key = (student.pk, course.level or "", course.semester)
+        credits, points = deltas.get(key, (0, Decimal("0")))
+        deltas[key] = (
+            credits + (course.credit or 0),
+            points + Decimal(str(point or 0)),
+        )
+    return deltas
+
+
+@transaction.atomic
+def register_courses(student, keys):
+    """Register ``student`` in the courses of ``keys``; courses already
+    taken go to ``skipped`` and courses without free seats to ``full``."""
+    from result.models import TakenCourse, GradeLedger
+
+    result = EnrollmentResult()
+    courses = lock_courses(keys, result)
+    taken = set(
+        TakenCourse.objects.filter(student=student, course__in=courses).values_list(
+            "course_id", flat=True
+        )
+    )
+    for course in courses:
+        if course.pk in taken:
+            result.skipped.append(course)
+        elif course.is_full:
+            result.full.append(course)
+        else:
+            result.done.append(course)
+
+    if result.done:
+        # The course locks rule out duplicates from this service; a row
+        # written outside it raises and rolls the whole registration back,
+        # instead of counting a course that was not inserted
+        TakenCourse.objects.bulk_create(
+            [TakenCourse(student=student, course=course) for course in result.done]
+        )
+        move_counters(result.done, 1)
+        GradeLedger.objects.apply_deltas(
+            ledger_deltas(student, [(course, 0) for course in result.done])
+        )
+    return result
+
+
+@transaction.atomic
+def drop_courses(student, keys):
+    """Drop ``student`` from the courses of ``keys``; courses not taken go
+    to ``skipped``."""
+    from result.models import TakenCourse, GradeLedger
+    from result.signals import taken_course_receivers_muted
+
+    result = EnrollmentResult()
+    courses = lock_courses(keys, result)
+    points = dict(
+        TakenCourse.objects.filter(student=student, course__in=courses).values_list(
+            "course_id", "point"
+        )
+    )
+    for course in courses:
+        if course.pk in points:
+            result.done.append(course)
+        else:
+            result.skipped.append(course)
+
+    if result.done:
+        with taken_course_receivers_muted():
+            TakenCourse.objects.filter(student=student, course__in=result.done).delete()
+        move_counters(result.done, -1)
+        deltas = ledger_deltas(
+            student, [(course, points[course.pk]) for course in result.done]
+        )
+        GradeLedger.objects.apply_deltas(
+            {key: (-credits, -point) for key, (credits, point) in deltas.items()},
+            create=False,
+        )
+    return result
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.8 on 2026-10-18 06:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_enrollments(apps, schema_editor):
+    Course = apps.get_model("course", "Course")
+    TakenCourse = apps.get_model("result", "TakenCourse")
+    Course.objects.update(
+        enrolled_count=Coalesce(
+            Subquery(
+                TakenCourse.objects.filter(course=OuterRef("pk"))
+                .order_by()
+                .values("course")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0009_alter_lessonblock_background_color_and_more'),
+        ('result', '0005_gradingscale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Número de estudiantes inscritos'),
+        ),
+        migrations.RunPython(count_enrollments, migrations.RunPython.noop),
+    ]
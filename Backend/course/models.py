@@ -3,13 +3,15 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.db.models.signals import pre_save, post_save, post_delete
-from django.db.models import Q
+from django.db.models import Q, Count, Sum, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 # project import
 from .utils import *
-from core.models import ActivityLog
+from core.activity import log_activity
+from .catalog import invalidate_course_cards
 
 YEARS = (
     (1, "1"),
@@ -70,7 +72,30 @@ DURATION_UNIT_CHOICES = (
 )
 
 
-class ProgramManager(models.Manager):
+class ProgramQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Annotate course_count, active_course_count, total_duration and
+        student_count, all in the same statement as the programs."""
+        from accounts.models import Student
+
+        students = (
+            Student.objects.filter(program=OuterRef("pk"))
+            .order_by()
+            .values("program")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return self.annotate(
+            course_count=Count("course", distinct=True),
+            active_course_count=Count(
+                "course", filter=Q(course__is_active=True), distinct=True
+            ),
+            total_duration=Coalesce(Sum("course__duration"), 0),
+            student_count=Coalesce(Subquery(students), 0),
+        )
+
+
+class ProgramManager(models.Manager.from_queryset(ProgramQuerySet)):
     def search(self, query=None):
         queryset = self.get_queryset()
         if query is not None:
@@ -97,15 +122,63 @@ class Program(models.Model):
 @receiver(post_save, sender=Program)
 def log_save(sender, instance, created, **kwargs):
     verb = "created" if created else "updated"
-    ActivityLog.objects.create(message=_(f"The program '{instance}' has been {verb}."))
+    log_activity(_(f"The program '{instance}' has been {verb}."))
 
 
 @receiver(post_delete, sender=Program)
 def log_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(message=_(f"The program '{instance}' has been deleted."))
+    log_activity(_(f"The program '{instance}' has been deleted."))
+
+
+def count_of(queryset):
+    """Correlated COUNT(*) of ``queryset`` usable as an annotation."""
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .annotate(group=Value(1))
+            .values("group")
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def material_counts(course_ref="pk"):
+    """documents_count, videos_count and materials_count annotations for the
+    course at ``course_ref``."""
+    documents = count_of(Upload.objects.filter(course=OuterRef(course_ref)))
+    videos = count_of(UploadVideo.objects.filter(course=OuterRef(course_ref)))
+    return {
+        "documents_count": documents,
+        "videos_count": videos,
+        "materials_count": documents + videos,
+    }
+
+
+class CourseQuerySet(models.QuerySet):
+    def with_material_counts(self):
+        return self.annotate(**material_counts())
+
+    def for_catalog(self, student=None):
+        """Courses with their material counts and whether ``student`` is
+        registered in them, in one statement."""
+        from result.models import TakenCourse
+
+        if student is None:
+            is_registered = Value(False)
+        else:
+            is_registered = Exists(
+                TakenCourse.objects.filter(student=student, course=OuterRef("pk"))
+            )
+        return (
+            self.with_material_counts()
+            .annotate(is_registered=is_registered)
+            .select_related("program")
+        )
 
 
-class CourseManager(models.Manager):
+class CourseManager(models.Manager.from_queryset(CourseQuerySet)):
     def search(self, query=None):
         queryset = self.get_queryset()
         if query is not None:
@@ -206,6 +279,12 @@ class Course(models.Model):
         default=True,
         help_text=_("¿El curso está activo y disponible?")
     )
+    # Mantenido por las señales de TakenCourse, ver result.signals
+    enrolled_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_("Número de estudiantes inscritos")
+    )
 
     objects = CourseManager()
 
@@ -215,6 +294,17 @@ class Course(models.Model):
     def get_absolute_url(self):
         return reverse("course:course_single", kwargs={"slug": self.slug})
 
+    @property
+    def seats_left(self):
+        """Free seats, or None when the course has no limit."""
+        if not self.max_students:
+            return None
+        return max(self.max_students - self.enrolled_count, 0)
+
+    @property
+    def is_full(self):
+        return self.seats_left == 0
+
     def user_can_edit(self, user):
         """Return True if the given user can edit this course.
 
@@ -237,9 +327,9 @@ class Course(models.Model):
 
     @property
     def is_current_semester(self):
-        from core.models import Semester
+        from core.academic_period import get_current_period
 
-        current_semester = Semester.objects.filter(is_current_semester=True).first()
+        current_semester = get_current_period().semester
 
         if current_semester and self.semester == current_semester.semester:
             return True
@@ -270,12 +360,18 @@ pre_save.connect(course_pre_save_receiver, sender=Course)
 @receiver(post_save, sender=Course)
 def log_save(sender, instance, created, **kwargs):
     verb = "created" if created else "updated"
-    ActivityLog.objects.create(message=_(f"The course '{instance}' has been {verb}."))
+    log_activity(_(f"The course '{instance}' has been {verb}."))
 
 
 @receiver(post_delete, sender=Course)
 def log_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(message=_(f"The course '{instance}' has been deleted."))
+    log_activity(_(f"The course '{instance}' has been deleted."))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def drop_course_cards(sender, instance, **kwargs):
+    invalidate_course_cards(instance.pk)
 
 
 class CourseAllocation(models.Model):
@@ -348,14 +444,14 @@ class Upload(models.Model):
 @receiver(post_save, sender=Upload)
 def log_save(sender, instance, created, **kwargs):
     if created:
-        ActivityLog.objects.create(
-            message=_(
+        log_activity(
+            _(
                 f"The file '{instance.title}' has been uploaded to the course '{instance.course}'."
             )
         )
     else:
-        ActivityLog.objects.create(
-            message=_(
+        log_activity(
+            _(
                 f"The file '{instance.title}' of the course '{instance.course}' has been updated."
             )
         )
@@ -363,8 +459,8 @@ def log_save(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=Upload)
 def log_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(
-        message=_(
+    log_activity(
+        _(
             f"The file '{instance.title}' of the course '{instance.course}' has been deleted."
         )
     )
@@ -408,14 +504,14 @@ pre_save.connect(video_pre_save_receiver, sender=UploadVideo)
 @receiver(post_save, sender=UploadVideo)
 def log_save(sender, instance, created, **kwargs):
     if created:
-        ActivityLog.objects.create(
-            message=_(
+        log_activity(
+            _(
                 f"The video '{instance.title}' has been uploaded to the course {instance.course}."
             )
         )
     else:
-        ActivityLog.objects.create(
-            message=_(
+        log_activity(
+            _(
                 f"The video '{instance.title}' of the course '{instance.course}' has been updated."
             )
         )
@@ -423,8 +519,8 @@ def log_save(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=UploadVideo)
 def log_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(
-        message=_(
+    log_activity(
+        _(
             f"The video '{instance.title}' of the course '{instance.course}' has been deleted."
         )
     )
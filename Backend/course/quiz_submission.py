@@ -0,0 +1,81 @@
+"""
+Grading of a lesson quiz submission.
+
+The active questions of the quiz are read with their options in two queries
+(``prefetch_related``) and the POSTed answers are graded in memory. Saving
+creates the QuizAttempt first and then every QuizResponse already linked to
+it with one ``bulk_create``, in one transaction, so a submission costs the
+same handful of queries whatever the number of questions.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+
+class QuizSubmission:
+    def __init__(self, quiz, data):
+        self.quiz = quiz
+        self.score = 0
+        self.total_points = 0
+        self.responses = []
+        self.grade(data)
+
+    def questions(self):
+        return self.quiz.questions.filter(is_active=True).prefetch_related("options")
+
+    def grade(self, data):
+        from .models import QuizResponse
+
+        for question in self.questions():
+            self.total_points += question.points
+            answer = data.get(f"question_{question.id}")
+
+            if question.question_type == "multiple_choice":
+                options = {str(option.id): option for option in question.options.all()}
+                selected_option = options.get(answer)
+                if selected_option is None:
+                    # Sin respuesta o con una opción de otra pregunta
+                    continue
+                is_correct = selected_option.is_correct
+                response = QuizResponse(
+                    question=question,
+                    selected_option=selected_option,
+                    is_correct=is_correct,
+                )
+            elif question.question_type == "true_false":
+                # Asumiendo que 'true' es la respuesta correcta
+                is_correct = answer == "true"
+                response = QuizResponse(
+                    question=question, text_response=answer, is_correct=is_correct
+                )
+            else:
+                # Para preguntas de texto, guardar respuesta sin evaluar
+                is_correct = False  # Requiere revisión manual
+                response = QuizResponse(
+                    question=question, text_response=answer, is_correct=False
+                )
+
+            if is_correct:
+                self.score += question.points
+                response.points_earned = question.points
+            self.responses.append(response)
+
+    @property
+    def final_score(self):
+        if self.total_points > 0:
+            return self.score / self.total_points * 100
+        return 0
+
+    @transaction.atomic
+    def save(self, student):
+        from .models import QuizAttempt, QuizResponse
+
+        attempt = QuizAttempt.objects.create(
+            student=student,
+            quiz=self.quiz,
+            score=self.final_score,
+            completed_at=timezone.now(),
+        )
+        for response in self.responses:
+            response.attempt = attempt
+        QuizResponse.objects.bulk_create(self.responses)
+        return attempt
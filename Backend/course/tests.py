@@ -1,3 +1,397 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError, connection
+from django.db.models.query import QuerySet
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import translation
+
+from accounts.models import Student
+from result.models import TakenCourse, GradeLedger
+from .catalog import card_cache_key, get_course_cards
+from .enrollment import register_courses, drop_courses
+from .models import (
+    Program,
+    Course,
+    Upload,
+    UploadVideo,
+    Module,
+    Lesson,
+    Quiz,
+    QuizQuestion,
+    QuizOption,
+    QuizAttempt,
+    QuizResponse,
+    StudentProgress,
+)
+from .quiz_submission import QuizSubmission
+
+User = get_user_model()
+
+
+class ProgramStatsTests(TestCase):
+    def make_program(self, title, courses=2, students=1, active=True):
+        program = Program.objects.create(title=title)
+        for i in range(courses):
+            Course.objects.create(
+                title=f"{title} {i}",
+                code=f"{title}-{i}",
+                program=program,
+                semester="First",
+                duration=10,
+                is_active=active,
+            )
+        for i in range(students):
+            user = User.objects.create_user(
+                username=f"{title}-student{i}", password="password", is_student=True
+            )
+            Student.objects.create(student=user, program=program)
+        return program
+
+    def test_with_stats_annotates_every_program(self):
+        self.make_program("Computer Science", courses=3, students=2)
+        self.make_program("Design", courses=2, students=0, active=False)
+        Program.objects.create(title="Empty")
+
+        stats = {
+            program.title: (
+                program.course_count,
+                program.active_course_count,
+                program.total_duration,
+                program.student_count,
+            )
+            for program in Program.objects.with_stats()
+        }
+        self.assertEqual(stats["Computer Science"], (3, 3, 30, 2))
+        self.assertEqual(stats["Design"], (2, 0, 20, 0))
+        self.assertEqual(stats["Empty"], (0, 0, 0, 0))
+
+    def test_program_list_query_count_does_not_grow(self):
+        lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        self.client.force_login(lecturer)
+        url = reverse("course:programs")
+
+        # session, user, paginator count and the annotated page
+        self.make_program("P1")
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        for i in range(2, 8):
+            self.make_program(f"P{i}")
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.context["paginator"].count, 7)
+        self.assertEqual(response.context["object_list"][0].status, "Activo")
+
+
+class CourseCatalogTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        self.program = Program.objects.create(title="Computer Science")
+        user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.student = Student.objects.create(
+            student=user, program=self.program, level="Bachelor"
+        )
+        self.client.force_login(user)
+
+    def make_course(self, code, uploads=0, videos=0):
+        course = Course.objects.create(
+            title=f"Course {code}",
+            code=code,
+            program=self.program,
+            level="Bachelor",
+            semester="First",
+            modality="e-learning",
+        )
+        for i in range(uploads):
+            Upload.objects.create(title=f"{code} doc {i}", course=course)
+        for i in range(videos):
+            UploadVideo.objects.create(title=f"{code} video {i}", course=course)
+        return course
+
+    def test_for_catalog_annotates_counts_and_registration(self):
+        taken = self.make_course("C1", uploads=2, videos=1)
+        self.make_course("C2", videos=3)
+        self.make_course("C3")
+        TakenCourse.objects.create(student=self.student, course=taken)
+
+        catalog = {
+            course.code: (
+                course.documents_count,
+                course.videos_count,
+                course.materials_count,
+                course.is_registered,
+            )
+            for course in Course.objects.for_catalog(self.student)
+        }
+        self.assertEqual(catalog["C1"], (2, 1, 3, True))
+        self.assertEqual(catalog["C2"], (0, 3, 3, False))
+        self.assertEqual(catalog["C3"], (0, 0, 0, False))
+
+    def test_user_course_list_query_count_does_not_grow(self):
+        url = reverse("course:user_course_list")
+        course = self.make_course("C1", uploads=1)
+        TakenCourse.objects.create(student=self.student, course=course)
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for i in range(2, 7):
+            course = self.make_course(f"C{i}", uploads=2, videos=1)
+            TakenCourse.objects.create(student=self.student, course=course)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(response.context["courses"]), 6)
+        self.assertTrue(all(c.is_registered for c in response.context["courses"]))
+
+    def test_course_save_drops_cached_card(self):
+        course = self.make_course("C1")
+        with translation.override("es"):
+            card = get_course_cards([course])[course.pk]
+            self.assertEqual(
+                card["professional_info"]["Modalidad"], course.get_modality_display()
+            )
+
+            course.max_students = 30
+            course.save()
+            self.assertIsNone(caches["querysets"].get(card_cache_key(course.pk)))
+            card = get_course_cards([course])[course.pk]
+        self.assertEqual(card["professional_info"]["Máximo Estudiantes"], 30)
+
+
+class EnrollmentTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Computer Science")
+        self.students = []
+        for i in range(3):
+            user = User.objects.create_user(
+                username=f"student{i}", password="password", is_student=True
+            )
+            self.students.append(
+                Student.objects.create(
+                    student=user, program=self.program, level="Bachelor"
+                )
+            )
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="ALG",
+            program=self.program,
+            level="Bachelor",
+            semester="First",
+            max_students=2,
+        )
+        self.other = Course.objects.create(
+            title="Databases", code="DB", program=self.program, semester="First"
+        )
+
+    def enrolled(self, course):
+        course.refresh_from_db()
+        return course.enrolled_count
+
+    def test_register_and_drop_move_the_counter(self):
+        result = register_courses(
+            self.students[0], [str(self.course.pk), str(self.other.pk)]
+        )
+        self.assertEqual(result.done, [self.course, self.other])
+        self.assertEqual(
+            (self.enrolled(self.course), self.enrolled(self.other)), (1, 1)
+        )
+
+        result = register_courses(self.students[0], [str(self.course.pk), "x"])
+        self.assertEqual(result.skipped, [self.course])
+        self.assertEqual(result.missing, ["x"])
+        self.assertEqual(self.enrolled(self.course), 1)
+
+        result = drop_courses(self.students[0], [str(self.course.pk)])
+        self.assertEqual(result.done, [self.course])
+        self.assertEqual(self.enrolled(self.course), 0)
+
+    def test_register_rejects_full_course(self):
+        register_courses(self.students[0], [self.course.pk])
+        register_courses(self.students[1], [self.course.pk])
+
+        result = register_courses(self.students[2], [self.course.pk, self.other.pk])
+        self.assertEqual(result.full, [self.course])
+        self.assertEqual(result.done, [self.other])
+        self.assertEqual(self.enrolled(self.course), 2)
+        self.assertFalse(
+            TakenCourse.objects.filter(
+                student=self.students[2], course=self.course
+            ).exists()
+        )
+
+    def test_row_written_meanwhile_rolls_the_registration_back(self):
+        for course, credit in ((self.course, 3), (self.other, 2)):
+            course.credit = credit
+            course.save()
+        TakenCourse.objects.create(student=self.students[0], course=self.course)
+        # As if the row had been inserted after the enrollments were read
+        with mock.patch.object(QuerySet, "values_list", return_value=[]):
+            with self.assertRaises(IntegrityError):
+                register_courses(
+                    self.students[0], [str(self.course.pk), str(self.other.pk)]
+                )
+        self.assertEqual(
+            (self.enrolled(self.course), self.enrolled(self.other)), (1, 0)
+        )
+        self.assertEqual(GradeLedger.objects.get(student=self.students[0]).credits, 3)
+
+    def test_courses_are_locked_in_primary_key_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = register_courses(
+                self.students[0], [str(self.other.pk), str(self.course.pk), "999"]
+            )
+        self.assertEqual(result.missing, [999])
+        locks = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "course_course"' in query["sql"]
+            and '"course_course"."id" IN' in query["sql"]
+        ]
+        self.assertEqual(len(locks), 1)
+        self.assertIn('ORDER BY "course_course"."id" ASC', locks[0])
+
+    def test_registration_view_enforces_max_students(self):
+        register_courses(self.students[0], [self.course.pk])
+        register_courses(self.students[1], [self.course.pk])
+
+        self.client.force_login(self.students[2].student)
+        response = self.client.post(
+            reverse("course:course_registration"), {str(self.course.pk): "on"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.enrolled(self.course), 2)
+        self.assertEqual(self.course.seats_left, 0)
+        self.assertTrue(self.course.is_full)
+
+    def test_deleting_a_student_releases_the_seat(self):
+        register_courses(self.students[0], [self.course.pk])
+        self.students[0].student.delete()
+        self.assertEqual(self.enrolled(self.course), 0)
+
+    def test_bulk_paths_run_a_fixed_number_of_queries(self):
+        courses = [
+            Course.objects.create(
+                title=f"Course {i}",
+                code=f"C{i}",
+                program=self.program,
+                level="Bachelor",
+                semester="First",
+                credit=3,
+            )
+            for i in range(5)
+        ]
+        keys = [str(course.pk) for course in courses]
+
+        # savepoint, locked in_bulk, enrollments, bulk_create, counters, two
+        # for the ledger and the savepoint release
+        with self.assertNumQueries(8):
+            result = register_courses(self.students[0], keys)
+        self.assertEqual(result.total_credits, 15)
+        self.assertEqual(
+            TakenCourse.objects.filter(student=self.students[0]).count(), 5
+        )
+        self.assertEqual(
+            GradeLedger.objects.expected_rows(),
+            {
+                (row.student_id, row.level, row.semester): (row.credits, row.points)
+                for row in GradeLedger.objects.all()
+            },
+        )
+
+        result = drop_courses(self.students[0], keys[:3])
+        self.assertEqual(result.total_credits, 9)
+        self.assertEqual([self.enrolled(course) for course in courses], [0, 0, 0, 1, 1])
+        ledger = GradeLedger.objects.get(student=self.students[0])
+        self.assertEqual(ledger.credits, 6)
+
+
+class QuizSubmissionTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Computer Science")
+        user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.student = Student.objects.create(
+            student=user, program=program, level="Bachelor"
+        )
+        self.course = Course.objects.create(
+            title="Algorithms", code="ALG", program=program, semester="First"
+        )
+        self.module = Module.objects.create(
+            course=self.course, title="Intro", description="Intro"
+        )
+        self.lesson = Lesson.objects.create(module=self.module, title="Sorting")
+        self.quiz = Quiz.objects.create(
+            lesson=self.lesson, title="Sorting", passing_score=50
+        )
+        self.answers = {}
+        for i in range(20):
+            question = QuizQuestion.objects.create(
+                quiz=self.quiz, question_text=f"Question {i}", order=i
+            )
+            right = QuizOption.objects.create(
+                question=question, option_text="right", is_correct=True
+            )
+            wrong = QuizOption.objects.create(question=question, option_text="wrong")
+            self.answers[f"question_{question.id}"] = str(
+                right.id if i % 4 else wrong.id
+            )
+        self.true_false = QuizQuestion.objects.create(
+            quiz=self.quiz, question_text="True?", question_type="true_false", points=5
+        )
+        self.essay = QuizQuestion.objects.create(
+            quiz=self.quiz, question_text="Why?", question_type="essay"
+        )
+        self.answers[f"question_{self.true_false.id}"] = "true"
+        self.answers[f"question_{self.essay.id}"] = "Because"
+
+    def test_grades_in_memory_and_saves_in_bulk(self):
+        # questions, options, then attempt and responses inside a savepoint
+        with self.assertNumQueries(6):
+            submission = QuizSubmission(self.quiz, self.answers)
+            attempt = submission.save(self.student)
+
+        self.assertEqual((submission.score, submission.total_points), (20, 26))
+        self.assertTrue(attempt.is_passed)
+        responses = QuizResponse.objects.filter(attempt=attempt)
+        self.assertEqual(responses.count(), 22)
+        self.assertEqual(responses.filter(is_correct=True).count(), 16)
+        essay = responses.get(question=self.essay)
+        self.assertEqual((essay.text_response, essay.points_earned), ("Because", 0))
+
+    def test_unknown_options_are_skipped(self):
+        first = self.quiz.questions.first()
+        other = QuizOption.objects.exclude(question=first).first()
+        submission = QuizSubmission(self.quiz, {f"question_{first.id}": str(other.id)})
+        self.assertNotIn(
+            first, [response.question for response in submission.responses]
+        )
+        self.assertEqual(submission.score, 0)
 
-# Create your tests here.
+    def test_take_quiz_view_records_the_attempt(self):
+        self.client.force_login(self.student.student)
+        url = reverse(
+            "course:take_quiz", args=[self.course.slug, self.module.id, self.lesson.id]
+        )
+        response = self.client.post(url, self.answers)
+        self.assertEqual(response.status_code, 302)
+        attempt = QuizAttempt.objects.get(student=self.student)
+        self.assertEqual(attempt.responses.count(), 22)
+        self.assertTrue(
+            StudentProgress.objects.get(
+                student=self.student, lesson=self.lesson
+            ).is_completed
+        )
@@ -10,14 +10,13 @@ from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView
 from django_filters.views import FilterView
-from django.utils import timezone
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 
-from accounts.models import User, Student
-from core.models import Session, Semester
+from accounts.models import User
 from result.models import TakenCourse
 from accounts.decorators import lecturer_required, student_required
+from accounts.middleware import student_or_404
 from .forms import (
     ProgramForm,
     CourseAddForm,
@@ -37,10 +36,14 @@ from .forms import (
     QuizBlockOptionForm,
 )
 from .filters import ProgramFilter, CourseFilter, CourseAllocationFilter
+from .catalog import attach_course_cards, get_course_cards
+from .enrollment import register_courses, drop_courses
+from .quiz_submission import QuizSubmission
 from .models import (
     Program, Course, CourseAllocation, Upload, UploadVideo, Module, Lesson, 
-    LessonContent, Quiz, QuizOption, QuizResponse, QuizAttempt, ActivitySubmission, 
-    StudentProgress, LessonBlock, QuizBlock, QuizBlockQuestion, QuizBlockOption
+    LessonContent, Quiz, ActivitySubmission, 
+    StudentProgress, LessonBlock, QuizBlock, QuizBlockQuestion, QuizBlockOption,
+    material_counts,
 )
 
 
@@ -48,42 +51,28 @@ from .models import (
 class ProgramFilterView(FilterView):
     filterset_class = ProgramFilter
     template_name = "course/program_list.html"
+    paginate_by = 12
+
+    def get_queryset(self):
+        # Estadísticas anotadas en la misma consulta que los programas
+        return Program.objects.with_stats().order_by("title")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["title"] = "Programas Académicos"
-        
-        # Agregar información adicional a cada programa
-        for program in context['filter'].qs:
-            # Contar cursos por programa
-            program.course_count = program.course_set.count()
-            
-            # Contar estudiantes inscritos en el programa
-            program.student_count = Student.objects.filter(
-                program=program
-            ).count()
-            
-            # Obtener cursos activos del programa
-            program.active_courses = program.course_set.filter(is_active=True).count()
-            
-            # Calcular duración total del programa (suma de duraciones de cursos)
-            total_duration = 0
-            for course in program.course_set.all():
-                if course.duration:
-                    total_duration += course.duration
-            program.total_duration = total_duration
-            
-            # Determinar el estado del programa
+
+        # Determinar el estado de cada programa de la página
+        for program in context["object_list"]:
             if program.course_count == 0:
                 program.status = "Sin cursos"
                 program.status_color = "text-muted"
-            elif program.active_courses == 0:
+            elif program.active_course_count == 0:
                 program.status = "Inactivo"
                 program.status_color = "text-warning"
             else:
                 program.status = "Activo"
                 program.status_color = "text-success"
-        
+
         return context
 
 
@@ -125,23 +114,8 @@ def program_add(request):
 @login_required
 def program_detail(request, pk):
     program = Program.objects.get(pk=pk)
-    courses = Course.objects.filter(program__pk=pk)
-    
-    # Agregar información profesional a cada curso
-    for course in courses:
-        course.professional_info = {}
-        if course.duration and course.duration_unit:
-            course.professional_info['Duración'] = f"{course.duration} {course.get_duration_unit_display()}"
-        if course.modality:
-            course.professional_info['Modalidad'] = course.get_modality_display()
-        if course.category:
-            course.professional_info['Categoría'] = course.get_category_display()
-        if course.max_students:
-            course.professional_info['Máximo Estudiantes'] = course.max_students
-        if course.certification:
-            course.professional_info['Certificación'] = "Sí"
-        if course.is_active:
-            course.professional_info['Estado'] = "Activo"
+    # Información profesional de cada curso desde su tarjeta en caché
+    courses = attach_course_cards(Course.objects.filter(program__pk=pk))
 
     return render(
         request,
@@ -508,7 +482,7 @@ def handle_video_delete(request, slug, video_slug):
 @student_required
 def course_registration(request):
     if request.method == "POST":
-        student = Student.objects.get(student__pk=request.user.id)
+        student = student_or_404(request)
         ids = ()
         data = request.POST.copy()
         data.pop("csrfmiddlewaretoken", None)  # remove csrf_token
@@ -518,74 +492,75 @@ def course_registration(request):
             messages.warning(request, "Por favor selecciona al menos un curso para registrar.")
             return redirect("course:course_registration")
         
-        courses_to_register = []
-        for key in data.keys():
-            try:
-                course = Course.objects.get(pk=key)
-                # Verificar si ya está registrado para evitar duplicados
-                if not TakenCourse.objects.filter(student=student, course=course).exists():
-                    courses_to_register.append(course)
-                else:
-                    messages.warning(request, f"El curso '{course.title}' ya está registrado.")
-            except Course.DoesNotExist:
-                messages.error(request, f"Curso con ID {key} no encontrado.")
-                continue
+        # Cursos bloqueados en orden de pk y cupo validado en la transacción
+        result = register_courses(student, data.keys())
+        for course in result.skipped:
+            messages.warning(request, f"El curso '{course.title}' ya está registrado.")
+        for course in result.full:
+            messages.error(request, f"El curso '{course.title}' no tiene cupos disponibles.")
+        for key in result.missing:
+            messages.error(request, f"Curso con ID {key} no encontrado.")
         
         # Registrar los cursos válidos
-        if courses_to_register:
-            for course in courses_to_register:
-                obj = TakenCourse.objects.create(student=student, course=course)
-                obj.save()
+        if result.done:
+            total_credits = result.total_credits
+            course_names = ", ".join([course.title for course in result.done])
             
-            total_credits = sum(course.credit for course in courses_to_register)
-            course_names = ", ".join([course.title for course in courses_to_register])
-            
-            if len(courses_to_register) == 1:
+            if len(result.done) == 1:
                 messages.success(request, f"¡Curso '{course_names}' registrado exitosamente! ({total_credits} créditos)")
             else:
-                messages.success(request, f"¡{len(courses_to_register)} cursos registrados exitosamente! ({total_credits} créditos total)")
+                messages.success(request, f"¡{len(result.done)} cursos registrados exitosamente! ({total_credits} créditos total)")
         
         return redirect("course:course_registration")
     else:
-        current_semester = Semester.objects.filter(is_current_semester=True).first()
+        current_semester = request.academic_period.semester
         if not current_semester:
             messages.error(request, "No se encontró un semestre activo.")
             return render(request, "course/course_registration.html")
 
-        student = get_object_or_404(Student, student__id=request.user.id)
-        taken_courses = TakenCourse.objects.filter(student__student__id=request.user.id).select_related('course')
-        t = ()
-        for i in taken_courses:
-            t += (i.course.pk,)
+        student = student_or_404(request)
+        t = tuple(
+            TakenCourse.objects.filter(student=student)
+            .values_list("course_id", flat=True)
+        )
 
-        # Obtener cursos disponibles para el semestre actual
-        courses = (
+        # Obtener cursos disponibles para el semestre actual, con sus
+        # materiales contados en la misma consulta
+        courses = attach_course_cards(
             Course.objects.filter(
-                program__pk=student.program.id,
+                program__pk=student.program_id,
                 level=student.level,
                 semester=current_semester.semester,
             )
             .exclude(id__in=t)
             .order_by("year")
             .select_related('program')
+            .with_material_counts()
         )
         
         # Obtener todos los cursos del programa para estadísticas
-        all_courses = Course.objects.filter(
-            level=student.level, 
-            program__pk=student.program.id
-        ).select_related('program')
+        all_courses = list(
+            Course.objects.filter(
+                level=student.level, 
+                program__pk=student.program_id
+            ).select_related('program')
+        )
 
         # Cursos ya registrados
-        registered_courses = Course.objects.filter(level=student.level).filter(id__in=t).select_related('program')
+        registered_courses = attach_course_cards(
+            Course.objects.filter(level=student.level)
+            .filter(id__in=t)
+            .select_related('program')
+            .with_material_counts()
+        )
 
         # Estados del registro
-        no_course_is_registered = registered_courses.count() == 0
-        all_courses_are_registered = registered_courses.count() == all_courses.count()
+        no_course_is_registered = len(registered_courses) == 0
+        all_courses_are_registered = len(registered_courses) == len(all_courses)
 
         # Calcular estadísticas por semestre
-        first_semester_courses = courses.filter(semester="First")
-        second_semester_courses = courses.filter(semester="Second")
+        first_semester_courses = [c for c in courses if c.semester == "First"]
+        second_semester_courses = [c for c in courses if c.semester == "Second"]
         
         total_first_semester_credit = sum(course.credit for course in first_semester_courses)
         total_sec_semester_credit = sum(course.credit for course in second_semester_courses)
@@ -595,44 +570,6 @@ def course_registration(request):
         total_available_credits = sum(course.credit for course in courses)
         total_program_credits = sum(course.credit for course in all_courses)
         progress_percentage = (total_registered_credit / total_program_credits * 100) if total_program_credits > 0 else 0
-        
-        # Agregar información profesional a cada curso
-        for course in courses:
-            course.professional_info = {}
-            if course.duration and course.duration_unit:
-                course.professional_info['Duración'] = f"{course.duration} {course.get_duration_unit_display()}"
-            if course.modality:
-                course.professional_info['Modalidad'] = course.get_modality_display()
-            if course.category:
-                course.professional_info['Categoría'] = course.get_category_display()
-            if course.max_students:
-                course.professional_info['Máximo Estudiantes'] = course.max_students
-            if course.certification:
-                course.professional_info['Certificación'] = "Sí"
-            if course.is_active:
-                course.professional_info['Estado'] = "Activo"
-            
-            # Contar materiales disponibles
-            course.materials_count = course.upload_set.count() + course.uploadvideo_set.count()
-        
-        # Agregar información a cursos registrados
-        for course in registered_courses:
-            course.materials_count = course.upload_set.count() + course.uploadvideo_set.count()
-            
-            # Información profesional
-            course.professional_info = {}
-            if course.duration and course.duration_unit:
-                course.professional_info['Duración'] = f"{course.duration} {course.get_duration_unit_display()}"
-            if course.modality:
-                course.professional_info['Modalidad'] = course.get_modality_display()
-            if course.category:
-                course.professional_info['Categoría'] = course.get_category_display()
-            if course.max_students:
-                course.professional_info['Máximo Estudiantes'] = course.max_students
-            if course.certification:
-                course.professional_info['Certificación'] = "Sí"
-            if course.is_active:
-                course.professional_info['Estado'] = "Activo"
 
         context = {
             "is_calender_on": True,
@@ -660,7 +597,7 @@ def course_registration(request):
 @student_required
 def course_drop(request):
     if request.method == "POST":
-        student = Student.objects.get(student__pk=request.user.id)
+        student = student_or_404(request)
         data = request.POST.copy()
         data.pop("csrfmiddlewaretoken", None)  # remove csrf_token
         
@@ -669,33 +606,21 @@ def course_drop(request):
             messages.warning(request, "Por favor selecciona al menos un curso para eliminar.")
             return redirect("course:course_registration")
         
-        courses_to_drop = []
-        for key in data.keys():
-            try:
-                course = Course.objects.get(pk=key)
-                # Verificar si está registrado
-                taken_course = TakenCourse.objects.filter(student=student, course=course).first()
-                if taken_course:
-                    courses_to_drop.append(course)
-                else:
-                    messages.warning(request, f"El curso '{course.title}' no está registrado.")
-            except Course.DoesNotExist:
-                messages.error(request, f"Curso con ID {key} no encontrado.")
-                continue
+        result = drop_courses(student, data.keys())
+        for course in result.skipped:
+            messages.warning(request, f"El curso '{course.title}' no está registrado.")
+        for key in result.missing:
+            messages.error(request, f"Curso con ID {key} no encontrado.")
         
         # Eliminar los cursos válidos
-        if courses_to_drop:
-            for course in courses_to_drop:
-                obj = TakenCourse.objects.get(student=student, course=course)
-                obj.delete()
+        if result.done:
+            total_credits = result.total_credits
+            course_names = ", ".join([course.title for course in result.done])
             
-            total_credits = sum(course.credit for course in courses_to_drop)
-            course_names = ", ".join([course.title for course in courses_to_drop])
-            
-            if len(courses_to_drop) == 1:
+            if len(result.done) == 1:
                 messages.success(request, f"¡Curso '{course_names}' eliminado exitosamente! ({total_credits} créditos)")
             else:
-                messages.success(request, f"¡{len(courses_to_drop)} cursos eliminados exitosamente! ({total_credits} créditos total)")
+                messages.success(request, f"¡{len(result.done)} cursos eliminados exitosamente! ({total_credits} créditos total)")
         
         return redirect("course:course_registration")
     else:
@@ -708,26 +633,32 @@ def course_drop(request):
 @login_required
 def user_course_list(request):
     if request.user.is_lecturer:
-        courses = Course.objects.filter(allocated_course__lecturer__pk=request.user.id)
-        
-        # Agregar información adicional para cada curso
-        for course in courses:
-            course.student_count = course.taken_courses.count()
-            course.materials_count = course.upload_set.count() + course.uploadvideo_set.count()
+        # Estudiantes y materiales contados en la misma consulta
+        courses = attach_course_cards(
+            Course.objects.filter(allocated_course__lecturer__pk=request.user.id)
+            .with_material_counts()
+            # Contador de inscritos en lugar de COUNT sobre TakenCourse
+            .annotate(student_count=F("enrolled_count"))
+        )
             
         return render(request, "course/user_course_list.html", {"courses": courses})
 
     elif request.user.is_student:
-        student = Student.objects.get(student__pk=request.user.id)
-        taken_courses = TakenCourse.objects.filter(
-            student__student__id=student.student.id
-        ).select_related('course', 'course__program')
+        student = student_or_404(request)
+        taken_courses = list(
+            TakenCourse.objects.filter(student=student)
+            .select_related('course', 'course__program')
+            .annotate(**material_counts("course"))
+        )
         
-        # Obtener todos los cursos disponibles para el estudiante
-        all_courses = Course.objects.filter(
-            level=student.level,
-            program__pk=student.program.id
-        ).select_related('program')
+        # Obtener todos los cursos disponibles para el estudiante, con
+        # materiales y registro del estudiante en la misma consulta
+        all_courses = attach_course_cards(
+            Course.objects.filter(
+                level=student.level,
+                program__pk=student.program.id
+            ).for_catalog(student)
+        )
         
         # Calcular estadísticas del estudiante
         total_credits_registered = sum(course.course.credit for course in taken_courses)
@@ -744,14 +675,17 @@ def user_course_list(request):
         
         current_gpa = (total_points / total_credits) if total_credits > 0 else 0
         
+        # Información profesional de los cursos tomados
+        cards = get_course_cards([taken_course.course for taken_course in taken_courses])
+
         # Agregar información detallada a cada curso tomado
         for taken_course in taken_courses:
             course = taken_course.course
             
             # Información de materiales
-            course.materials_count = course.upload_set.count() + course.uploadvideo_set.count()
-            course.documents_count = course.upload_set.count()
-            course.videos_count = course.uploadvideo_set.count()
+            course.materials_count = taken_course.materials_count
+            course.documents_count = taken_course.documents_count
+            course.videos_count = taken_course.videos_count
             
             # Información de progreso
             if taken_course.total > 0:
@@ -770,40 +704,7 @@ def user_course_list(request):
                 course.status = 'registered'
                 course.status_text = 'Registrado'
                 
-            # Información profesional del curso
-            course.professional_info = {}
-            if course.duration and course.duration_unit:
-                course.professional_info['Duración'] = f"{course.duration} {course.get_duration_unit_display()}"
-            if course.modality:
-                course.professional_info['Modalidad'] = course.get_modality_display()
-            if course.category:
-                course.professional_info['Categoría'] = course.get_category_display()
-            if course.max_students:
-                course.professional_info['Máximo Estudiantes'] = course.max_students
-            if course.certification:
-                course.professional_info['Certificación'] = "Sí"
-            if course.is_active:
-                course.professional_info['Estado'] = "Activo"
-        
-        # Agregar información a cursos disponibles
-        for course in all_courses:
-            course.is_registered = course.taken_courses.filter(student=student).exists()
-            course.materials_count = course.upload_set.count() + course.uploadvideo_set.count()
-            
-            # Información profesional
-            course.professional_info = {}
-            if course.duration and course.duration_unit:
-                course.professional_info['Duración'] = f"{course.duration} {course.get_duration_unit_display()}"
-            if course.modality:
-                course.professional_info['Modalidad'] = course.get_modality_display()
-            if course.category:
-                course.professional_info['Categoría'] = course.get_category_display()
-            if course.max_students:
-                course.professional_info['Máximo Estudiantes'] = course.max_students
-            if course.certification:
-                course.professional_info['Certificación'] = "Sí"
-            if course.is_active:
-                course.professional_info['Estado'] = "Activo"
+            course.professional_info = cards[course.pk]["professional_info"]
 
         context = {
             "student": student,
@@ -832,10 +733,9 @@ def course_modules(request, slug):
     
     # Calcular progreso del estudiante si está logueado como estudiante
     student_progress = None
-    if request.user.is_student:
-        student = Student.objects.get(student__pk=request.user.id)
+    if request.student:
         student_progress = StudentProgress.objects.filter(
-            student=student,
+            student=request.student,
             lesson__module__course=course
         ).select_related('lesson', 'lesson__module')
     
@@ -859,10 +759,9 @@ def module_detail(request, slug, module_id):
     
     # Calcular progreso del estudiante si está logueado como estudiante
     student_progress = None
-    if request.user.is_student:
-        student = Student.objects.get(student__pk=request.user.id)
+    if request.student:
         student_progress = StudentProgress.objects.filter(
-            student=student,
+            student=request.student,
             lesson__module=module
         ).select_related('lesson')
     
@@ -894,10 +793,9 @@ def lesson_detail(request, slug, module_id, lesson_id):
     
     # Obtener progreso del estudiante si está logueado como estudiante
     student_progress = None
-    if request.user.is_student:
-        student = Student.objects.get(student__pk=request.user.id)
+    if request.student:
         student_progress, created = StudentProgress.objects.get_or_create(
-            student=student,
+            student=request.student,
             lesson=lesson,
             defaults={'is_completed': False}
         )
@@ -912,11 +810,10 @@ def lesson_detail(request, slug, module_id, lesson_id):
     
     # Obtener entrega de actividad si la lección es de tipo activity
     activity_submission = None
-    if lesson.lesson_type == 'activity' and request.user.is_student:
-        student = Student.objects.get(student__pk=request.user.id)
+    if lesson.lesson_type == 'activity' and request.student:
         try:
             activity_submission = ActivitySubmission.objects.get(
-                student=student,
+                student=request.student,
                 lesson=lesson
             )
         except ActivitySubmission.DoesNotExist:
@@ -944,7 +841,7 @@ def mark_lesson_complete(request, slug, module_id, lesson_id):
         course = get_object_or_404(Course, slug=slug)
         module = get_object_or_404(Module, id=module_id, course=course)
         lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
-        student = Student.objects.get(student__pk=request.user.id)
+        student = student_or_404(request)
         
         # Actualizar o crear progreso del estudiante
         progress, created = StudentProgress.objects.get_or_create(
@@ -971,7 +868,7 @@ def submit_activity(request, slug, module_id, lesson_id):
         course = get_object_or_404(Course, slug=slug)
         module = get_object_or_404(Module, id=module_id, course=course)
         lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
-        student = Student.objects.get(student__pk=request.user.id)
+        student = student_or_404(request)
         
         # Obtener datos del formulario
         title = request.POST.get('title')
@@ -1022,7 +919,7 @@ def take_quiz(request, slug, module_id, lesson_id):
     course = get_object_or_404(Course, slug=slug)
     module = get_object_or_404(Module, id=module_id, course=course)
     lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
-    student = Student.objects.get(student__pk=request.user.id)
+    student = student_or_404(request)
     
     try:
         quiz = lesson.quiz
@@ -1032,71 +929,9 @@ def take_quiz(request, slug, module_id, lesson_id):
     
     if request.method == 'POST':
         # Procesar respuestas del cuestionario
-        score = 0
-        total_points = 0
-        responses = []
-        
-        for question in quiz.questions.filter(is_active=True):
-            total_points += question.points
-            answer = request.POST.get(f'question_{question.id}')
-            
-            if question.question_type == 'multiple_choice':
-                try:
-                    selected_option = QuizOption.objects.get(id=answer, question=question)
-                    if selected_option.is_correct:
-                        score += question.points
-                    
-                    # Guardar respuesta
-                    response = QuizResponse.objects.create(
-                        attempt=None,  # Se actualizará después
-                        question=question,
-                        selected_option=selected_option,
-                        is_correct=selected_option.is_correct,
-                        points_earned=question.points if selected_option.is_correct else 0
-                    )
-                    responses.append(response)
-                except QuizOption.DoesNotExist:
-                    pass
-            elif question.question_type == 'true_false':
-                is_correct = answer == 'true'  # Asumiendo que 'true' es la respuesta correcta
-                if is_correct:
-                    score += question.points
-                
-                # Guardar respuesta
-                response = QuizResponse.objects.create(
-                    attempt=None,  # Se actualizará después
-                    question=question,
-                    text_response=answer,
-                    is_correct=is_correct,
-                    points_earned=question.points if is_correct else 0
-                )
-                responses.append(response)
-            else:
-                # Para preguntas de texto, guardar respuesta sin evaluar
-                response = QuizResponse.objects.create(
-                    attempt=None,  # Se actualizará después
-                    question=question,
-                    text_response=answer,
-                    is_correct=False,  # Requiere revisión manual
-                    points_earned=0
-                )
-                responses.append(response)
-        
-        # Calcular puntuación final
-        final_score = (score / total_points * 100) if total_points > 0 else 0
-        
-        # Crear intento del cuestionario
-        attempt = QuizAttempt.objects.create(
-            student=student,
-            quiz=quiz,
-            score=final_score,
-            completed_at=timezone.now()
-        )
-        
-        # Actualizar respuestas con el intento
-        for response in responses:
-            response.attempt = attempt
-            response.save()
+        submission = QuizSubmission(quiz, request.POST)
+        submission.save(student)
+        final_score = submission.final_score
         
         # Marcar lección como completada si aprobó
         if final_score >= quiz.passing_score:
@@ -8,6 +8,7 @@ from modeltranslation.forms import TranslationModelForm
 from .models import (
     Quiz,
     Progress,
+    ProgressEntry,
     Question,
     MCQuestion,
     Choice,
@@ -70,10 +71,13 @@ class MCQuestionAdmin(TranslationAdmin):
 
 
 class ProgressAdmin(admin.ModelAdmin):
-    search_fields = (
-        "user",
-        "score",
-    )
+    search_fields = ("user__username",)
+
+
+class ProgressEntryAdmin(admin.ModelAdmin):
+    list_display = ("user", "quiz", "score", "possible")
+    list_select_related = ("user", "quiz")
+    search_fields = ("user__username", "quiz__title")
 
 
 class EssayQuestionAdmin(admin.ModelAdmin):
@@ -91,5 +95,6 @@ class EssayQuestionAdmin(admin.ModelAdmin):
 admin.site.register(Quiz, QuizAdmin)
 admin.site.register(MCQuestion, MCQuestionAdmin)
 admin.site.register(Progress, ProgressAdmin)
+admin.site.register(ProgressEntry, ProgressEntryAdmin)
 admin.site.register(EssayQuestion, EssayQuestionAdmin)
 admin.site.register(Sitting)
@@ -3,3 +3,35 @@ from django.apps import AppConfig
 
 class QuizConfig(AppConfig):
     name = "quiz"
+
+    def ready(self) -> None:
+        from django.db.models.signals import (
+            post_save,
+            pre_delete,
+            post_delete,
+            m2m_changed,
+        )
+        from .models import Quiz, Question, MCQuestion, EssayQuestion, Choice, Sitting
+        from .signals import (
+            question_changed_receiver,
+            choice_changed_receiver,
+            question_quizzes_changed_receiver,
+            quiz_deleted_receiver,
+            quiz_saved_receiver,
+            sitting_changed_receiver,
+        )
+
+        for model in (Question, MCQuestion, EssayQuestion):
+            post_save.connect(question_changed_receiver, sender=model)
+            pre_delete.connect(question_changed_receiver, sender=model)
+        post_save.connect(choice_changed_receiver, sender=Choice)
+        post_delete.connect(choice_changed_receiver, sender=Choice)
+        m2m_changed.connect(
+            question_quizzes_changed_receiver, sender=Question.quiz.through
+        )
+        post_delete.connect(quiz_deleted_receiver, sender=Quiz)
+        post_save.connect(quiz_saved_receiver, sender=Quiz)
+        post_save.connect(sitting_changed_receiver, sender=Sitting)
+        post_delete.connect(sitting_changed_receiver, sender=Sitting)
+
+        return super().ready()
@@ -109,3 +109,19 @@ MCQuestionFormSet = inlineformset_factory(
     extra=10,  # Aumentamos de 5 a 10 opciones extra
     max_num=15,  # Máximo 15 opciones
 )
+
+
+class QuestionBankImportForm(forms.Form):
+    file = forms.FileField(
+        label=_("File"), help_text=_("CSV, JSON or GIFT (.txt) question bank.")
+    )
+    format = forms.ChoiceField(
+        label=_("Format"),
+        required=False,
+        choices=(
+            ("", _("From the file extension")),
+            ("csv", "CSV"),
+            ("json", "JSON"),
+            ("gift", "GIFT"),
+        ),
+    )
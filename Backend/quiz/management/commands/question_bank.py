@@ -0,0 +1,77 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Quiz
+from quiz.question_bank import (
+    QuestionBankError,
+    export_chunks,
+    format_from_name,
+    import_questions,
+)
+
+FORMATS = ("csv", "json", "gift")
+
+
+class Command(BaseCommand):
+    help = "Import questions into a quiz from a CSV, JSON or GIFT file, or export its questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("import", "export"))
+        parser.add_argument("quiz", help="Slug or id of the quiz.")
+        parser.add_argument(
+            "file",
+            nargs="?",
+            default="-",
+            help="File to read or write, '-' (default) for stdin/stdout.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format; guessed from the file extension by default.",
+        )
+
+    def get_quiz(self, key):
+        quizzes = Quiz.objects.filter(slug=key)
+        if key.isdigit():
+            quizzes = quizzes | Quiz.objects.filter(pk=key)
+        quiz = quizzes.first()
+        if quiz is None:
+            raise CommandError(f"No quiz with slug or id {key!r}.")
+        return quiz
+
+    def handle(self, *args, **options):
+        quiz = self.get_quiz(options["quiz"])
+        path = options["file"]
+        fmt = options["format"] or format_from_name(path)
+        if fmt is None:
+            raise CommandError("Can't tell the file format, use --format.")
+
+        if options["action"] == "export":
+            out = sys.stdout.buffer if path == "-" else open(path, "wb")
+            try:
+                for chunk in export_chunks(quiz, fmt):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+            return
+
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig")
+        try:
+            counts = import_questions(quiz, stream, fmt)
+        except QuestionBankError as error:
+            for message in error.messages:
+                self.stderr.write(message)
+            raise CommandError(
+                f"{error.count} invalid record(s), no question was imported."
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {counts['mc']} multiple choice and "
+                f"{counts['essay']} essay question(s) into {quiz}."
+            )
+        )
@@ -0,0 +1,143 @@
+"""
+Completed sittings list for markers.
+
+The list is read one page at a time with keyset pagination over
+(end, id), newest first: a page asks for the ``PAGE_SIZE`` sittings after
+the last one of the previous page (the ``after`` cursor), which the
+(complete, end, id) and (quiz, complete, end) indexes serve without
+counting or skipping the rows before it. Sittings without an end
+(completed outside ``mark_quiz_complete``) come after all the others, by
+id, from a query of their own: mixing them into the (end, id) comparison
+would need an ``OR end IS NULL`` that the indexes cannot serve.
+
+The header of the page sums up each quiz on it: attempts, mean score and
+pass rate, from one aggregation over the completed sittings of the quizzes
+not in the cache yet. A summary stays in the "querysets" cache alias until
+a sitting of its quiz is completed or marked again, or the quiz changes
+(see ``quiz.signals``).
+"""
+from datetime import datetime
+
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models.functions import Least, Round
+
+PAGE_SIZE = 50
+
+SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+def summary_cache_key(quiz_id):
+    return f"quiz:{quiz_id}:marking-summary"
+
+
+def encode_cursor(sitting):
+    end = sitting.end.isoformat() if sitting.end else ""
+    return f"{end}|{sitting.pk}"
+
+
+def decode_cursor(cursor):
+    """(end, id) of a cursor, or None if it is not one."""
+    end, _, pk = (cursor or "").rpartition("|")
+    try:
+        return (datetime.fromisoformat(end) if end else None), int(pk)
+    except ValueError:
+        return None
+
+
+class SittingPage:
+    def __init__(self, queryset, cursor=None, size=None):
+        size = size or PAGE_SIZE
+        queryset = queryset.select_related("user", "quiz__course")
+        dated = queryset.filter(end__isnull=False).order_by("-end", "-id")
+        undated = queryset.filter(end__isnull=True).order_by("-id")
+        position = decode_cursor(cursor)
+        if position is None:
+            sittings = list(dated[: size + 1])
+        elif position[0] is None:
+            # Past the dated sittings already
+            sittings = []
+            undated = undated.filter(id__lt=position[1])
+        else:
+            end, pk = position
+            dated = dated.filter(models.Q(end__lt=end) | models.Q(end=end, id__lt=pk))
+            sittings = list(dated[: size + 1])
+        if len(sittings) <= size:
+            sittings += undated[: size + 1 - len(sittings)]
+        self.sittings = sittings[:size]
+        self.has_next = len(sittings) > size
+        self.is_first = position is None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.sittings[-1]) if self.has_next else None
+
+
+def percent_correct():
+    """``Sitting.get_percent_correct`` in SQL."""
+    return models.Case(
+        models.When(question_count__lt=1, then=models.Value(0.0)),
+        default=Round(
+            Least(
+                models.Value(100.0),
+                models.F("current_score") * 100.0 / models.F("question_count"),
+            )
+        ),
+        output_field=models.FloatField(),
+    )
+
+
+def aggregate_summaries(quiz_ids):
+    from .models import Sitting
+
+    rows = (
+        Sitting.objects.filter(quiz_id__in=quiz_ids, complete=True)
+        .annotate(percent=percent_correct())
+        .values("quiz_id")
+        .annotate(
+            attempts=models.Count("id"),
+            mean=models.Avg("percent"),
+            passed=models.Count(
+                "id", filter=models.Q(percent__gte=models.F("quiz__pass_mark"))
+            ),
+        )
+        .order_by()
+    )
+    summaries = {
+        quiz_id: {"attempts": 0, "mean": 0.0, "pass_rate": 0.0} for quiz_id in quiz_ids
+    }
+    for row in rows:
+        summaries[row["quiz_id"]] = {
+            "attempts": row["attempts"],
+            "mean": round(row["mean"] or 0.0, 1),
+            "pass_rate": round(row["passed"] * 100.0 / row["attempts"], 1),
+        }
+    return summaries
+
+
+def quiz_summaries(quiz_ids):
+    """{quiz id: {"attempts", "mean", "pass_rate"}} from the cache, the
+    missing ones computed together."""
+    cache = caches["querysets"]
+    quiz_ids = set(quiz_ids)
+    keys = {summary_cache_key(quiz_id): quiz_id for quiz_id in quiz_ids}
+    cached = cache.get_many(keys)
+    summaries = {keys[key]: summary for key, summary in cached.items()}
+    missing = quiz_ids - summaries.keys()
+    if missing:
+        computed = aggregate_summaries(missing)
+        cache.set_many(
+            {summary_cache_key(quiz_id): s for quiz_id, s in computed.items()},
+            SUMMARY_TIMEOUT,
+        )
+        summaries.update(computed)
+    return summaries
+
+
+def invalidate_quiz_summary(quiz_id):
+    cache = caches["querysets"]
+    key = summary_cache_key(quiz_id)
+    cache.delete(key)
+    # Again once committed, in case another request cached the old figures
+    # in the meantime
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,103 @@
+# Generated by Django 4.0.8 on 2026-10-18 06:27
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def parse_ids(value):
+    return [int(n) for n in (value or "").split(",") if n.strip().isdigit()]
+
+
+def copy_sitting_questions(apps, schema_editor):
+    Sitting = apps.get_model("quiz", "Sitting")
+    SittingQuestion = apps.get_model("quiz", "SittingQuestion")
+    Question = apps.get_model("quiz", "Question")
+
+    existing = set(Question.objects.values_list("id", flat=True))
+    for sitting in Sitting.objects.iterator():
+        order = [qid for qid in parse_ids(sitting.question_order) if qid in existing]
+        pending = set(parse_ids(sitting.question_list))
+        incorrect = set(parse_ids(sitting.incorrect_questions))
+        try:
+            answers = json.loads(sitting.user_answers or "{}")
+        except ValueError:
+            answers = {}
+
+        rows = []
+        for position, question_id in enumerate(dict.fromkeys(order)):
+            answer = answers.get(str(question_id))
+            answered = question_id not in pending
+            rows.append(
+                SittingQuestion(
+                    sitting=sitting,
+                    question_id=question_id,
+                    position=position,
+                    answered=answered,
+                    answer="" if answer is None else str(answer),
+                    # As record_answer stores it; None only when unanswered
+                    is_correct=(question_id not in incorrect) if answered else None,
+                )
+            )
+        SittingQuestion.objects.bulk_create(rows)
+        Sitting.objects.filter(pk=sitting.pk).update(
+            question_count=len(parse_ids(sitting.question_order))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_remove_choice_choice_en_remove_choice_choice_fr_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitting',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Question Count'),
+        ),
+        migrations.CreateModel(
+            name='SittingQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Position')),
+                ('answered', models.BooleanField(default=False, verbose_name='Answered')),
+                ('answer', models.TextField(blank=True, default='', verbose_name='Answer')),
+                ('is_correct', models.BooleanField(null=True, verbose_name='Is correct')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.question', verbose_name='Question')),
+                ('sitting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sitting_questions', to='quiz.sitting', verbose_name='Sitting')),
+            ],
+            options={
+                'verbose_name': 'Sitting Question',
+                'verbose_name_plural': 'Sitting Questions',
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sittingquestion',
+            index=models.Index(fields=['sitting', 'answered', 'position'], name='sitting_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sittingquestion',
+            constraint=models.UniqueConstraint(fields=('sitting', 'position'), name='unique_sitting_position'),
+        ),
+        migrations.RunPython(copy_sitting_questions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='incorrect_questions',
+        ),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='question_list',
+        ),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='question_order',
+        ),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='user_answers',
+        ),
+    ]
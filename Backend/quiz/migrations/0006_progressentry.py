@@ -0,0 +1,78 @@
+# Generated by Django 4.0.8 on 2026-10-18 06:31
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Progress.score segments: <quiz title>,<score>,<possible>,
+PROGRESS_ENTRY_RE = re.compile(r"([^,]+),(\d+),(\d+),")
+
+
+def copy_progress_scores(apps, schema_editor):
+    """Turn every <title>,<score>,<possible>, segment into a ProgressEntry.
+
+    Segments are matched to quizzes by title (case insensitive, lowest id
+    first when titles repeat); those without a quiz are dropped.
+    """
+    Progress = apps.get_model("quiz", "Progress")
+    ProgressEntry = apps.get_model("quiz", "ProgressEntry")
+    Quiz = apps.get_model("quiz", "Quiz")
+
+    quiz_by_title = {}
+    for quiz_id, title in Quiz.objects.order_by("-id").values_list("id", "title"):
+        quiz_by_title[title.strip().lower()] = quiz_id
+
+    entries = {}
+    for user_id, score in Progress.objects.values_list("user_id", "score"):
+        for match in PROGRESS_ENTRY_RE.finditer(score or ""):
+            quiz_id = quiz_by_title.get(match.group(1).strip().lower())
+            if quiz_id is None:
+                continue
+            current = entries.get((user_id, quiz_id), (0, 0))
+            entries[(user_id, quiz_id)] = (
+                current[0] + int(match.group(2)),
+                current[1] + int(match.group(3)),
+            )
+
+    ProgressEntry.objects.bulk_create(
+        [
+            ProgressEntry(
+                user_id=user_id, quiz_id=quiz_id, score=score, possible=possible
+            )
+            for (user_id, quiz_id), (score, possible) in entries.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz', '0005_sittingquestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(default=0, verbose_name='Score')),
+                ('possible', models.PositiveIntegerField(default=0, verbose_name='Possible')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.quiz', verbose_name='Quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_entries', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Progress Entry',
+                'verbose_name_plural': 'Progress Entries',
+                'unique_together': {('user', 'quiz')},
+            },
+        ),
+        migrations.RunPython(copy_progress_scores, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='progress',
+            name='score',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.8 on 2026-10-18 07:14
+
+from django.db import migrations, models
+import quiz.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_progressentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitting',
+            name='seed',
+            field=models.PositiveIntegerField(default=quiz.utils.new_seed, editable=False, verbose_name='Seed'),
+        ),
+    ]
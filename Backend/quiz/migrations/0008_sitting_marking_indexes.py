@@ -0,0 +1,21 @@
+# Generated by Django 4.0.8 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_sitting_seed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sitting',
+            index=models.Index(fields=['complete', 'end', 'id'], name='sitting_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sitting',
+            index=models.Index(fields=['quiz', 'complete', 'end'], name='sitting_quiz_done_idx'),
+        ),
+    ]
@@ -1,14 +1,9 @@
-import re
-import json
-
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.urls import reverse
 from django.core.exceptions import ValidationError, ImproperlyConfigured
-from django.core.validators import (
-    MaxValueValidator,
-    validate_comma_separated_integer_list,
-)
+from django.core.validators import MaxValueValidator
 from django.utils.translation import gettext_lazy as _
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 from django.conf import settings
 from django.db.models.signals import pre_save
@@ -18,6 +13,7 @@ from django.db.models import Q
 from model_utils.managers import InheritanceManager
 from course.models import Course
 from .utils import *
+from .question_bundle import get_question_bundle
 
 CHOICE_ORDER_OPTIONS = (
     ("content", _("Content")),
@@ -154,7 +150,7 @@ pre_save.connect(quiz_pre_save_receiver, sender=Quiz)
 
 class ProgressManager(models.Manager):
     def new_progress(self, user):
-        new_progress = self.create(user=user, score="")
+        new_progress = self.create(user=user)
         new_progress.save()
         return new_progress
 
@@ -163,11 +159,6 @@ class Progress(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL, verbose_name=_("User"), on_delete=models.CASCADE
     )
-    score = models.CharField(
-        max_length=1024,
-        verbose_name=_("Score"),
-        validators=[validate_comma_separated_integer_list],
-    )
 
     objects = ProgressManager()
 
@@ -177,53 +168,33 @@ class Progress(models.Model):
 
     # @property
     def list_all_cat_scores(self):
-        score_before = self.score
+        """{category: [correct, incorrect, percent]} from the user's entries."""
+        labels = dict(CATEGORY_OPTIONS)
         output = {}
-
-        if len(self.score) > len(score_before):
-            # If a new category has been added, save changes.
-            self.save()
-
+        for row in ProgressEntry.objects.category_totals(self.user_id):
+            score, possible = row["score"], row["possible"]
+            label = labels.get(row["quiz__category"], _("Uncategorized"))
+            percent = int(round(score / possible * 100)) if possible else 0
+            output[label] = [score, possible - score, percent]
         return output
 
-    def update_score(self, question, score_to_add=0, possible_to_add=0):
+    def update_score(self, quiz, score_to_add=0, possible_to_add=0):
         # category_test = Category.objects.filter(category=question.category).exists()
 
         if any(
             [
                 item is False
                 for item in [
-                    score_to_add,
-                    possible_to_add,
                     isinstance(score_to_add, int),
                     isinstance(possible_to_add, int),
                 ]
             ]
-        ):
+        ) or not possible_to_add:
             return _("error"), _("la categoría no existe o la puntuación no es válida")
 
-        to_find = re.escape(str(question.quiz)) + r",(?P<score>\d+),(?P<possible>\d+),"
-
-        match = re.search(to_find, self.score, re.IGNORECASE)
-
-        if match:
-            updated_score = int(match.group("score")) + abs(score_to_add)
-            updated_possible = int(match.group("possible")) + abs(possible_to_add)
-
-            new_score = ",".join(
-                [str(question.quiz), str(updated_score), str(updated_possible), ""]
-            )
-
-            # swap old score for the new one
-            self.score = self.score.replace(match.group(), new_score)
-            self.save()
-
-        else:
-            #  if not present but existing, add with the points passed in
-            self.score += ",".join(
-                [str(question.quiz), str(score_to_add), str(possible_to_add), ""]
-            )
-            self.save()
+        ProgressEntry.objects.add(
+            self.user_id, quiz, abs(score_to_add), abs(possible_to_add)
+        )
 
     def show_exams(self):
         if self.user.is_superuser:
@@ -234,14 +205,72 @@ class Progress(models.Model):
             )
 
 
+class ProgressEntryManager(models.Manager):
+    def add(self, user_id, quiz, score_to_add, possible_to_add):
+        """Add the points to the (user, quiz) entry with an F() update,
+        creating the entry on the first answer to the quiz."""
+        quiz_id = getattr(quiz, "pk", quiz)
+        increments = {
+            "score": models.F("score") + score_to_add,
+            "possible": models.F("possible") + possible_to_add,
+        }
+        if self.filter(user_id=user_id, quiz_id=quiz_id).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    user_id=user_id,
+                    quiz_id=quiz_id,
+                    score=score_to_add,
+                    possible=possible_to_add,
+                )
+        except IntegrityError:
+            # Otra petición creó la fila entre el UPDATE y el INSERT
+            self.filter(user_id=user_id, quiz_id=quiz_id).update(**increments)
+
+    def category_totals(self, user_id):
+        return (
+            self.filter(user_id=user_id)
+            .values("quiz__category")
+            .annotate(score=models.Sum("score"), possible=models.Sum("possible"))
+            .order_by("quiz__category")
+        )
+
+
+class ProgressEntry(models.Model):
+    """Points a user scored on a quiz, over every attempt."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="progress_entries",
+        verbose_name=_("User"),
+        on_delete=models.CASCADE,
+    )
+    quiz = models.ForeignKey(Quiz, verbose_name=_("Quiz"), on_delete=models.CASCADE)
+    score = models.PositiveIntegerField(default=0, verbose_name=_("Score"))
+    possible = models.PositiveIntegerField(default=0, verbose_name=_("Possible"))
+
+    objects = ProgressEntryManager()
+
+    class Meta:
+        verbose_name = _("Progress Entry")
+        verbose_name_plural = _("Progress Entries")
+        unique_together = ("user", "quiz")
+
+    def __str__(self):
+        return f"{self.user} - {self.quiz}: {self.score}/{self.possible}"
+
+
 class SittingManager(models.Manager):
     def new_sitting(self, user, quiz, course):
+        # Ids from the cached bundle; a random order is a permutation of
+        # them seeded per sitting instead of an ORDER BY RANDOM() sort
+        seed = new_seed()
+        question_set = [
+            question.id for question in get_question_bundle(quiz.id).questions
+        ]
         if quiz.random_order is True:
-            question_set = quiz.question_set.all().select_subclasses().order_by("?")
-        else:
-            question_set = quiz.question_set.all().select_subclasses()
-
-        question_set = [item.id for item in question_set]
+            question_set = seeded_shuffle(question_set, seed)
 
         if len(question_set) == 0:
             raise ImproperlyConfigured(
@@ -251,18 +280,22 @@ class SittingManager(models.Manager):
         # if quiz.max_questions and quiz.max_questions < len(question_set):
         #     question_set = question_set[:quiz.max_questions]
 
-        questions = ",".join(map(str, question_set)) + ","
-
         new_sitting = self.create(
             user=user,
             quiz=quiz,
             course=course,
-            question_order=questions,
-            question_list=questions,
-            incorrect_questions="",
+            question_count=len(question_set),
             current_score=0,
             complete=False,
-            user_answers="{}",
+            seed=seed,
+        )
+        SittingQuestion.objects.bulk_create(
+            [
+                SittingQuestion(
+                    sitting=new_sitting, question_id=question_id, position=position
+                )
+                for position, question_id in enumerate(question_set)
+            ]
         )
         return new_sitting
 
@@ -292,55 +325,59 @@ class Sitting(models.Model):
         Course, null=True, verbose_name=_("Course"), on_delete=models.CASCADE
     )
 
-    question_order = models.CharField(
-        max_length=1024,
-        verbose_name=_("Question Order"),
-        validators=[validate_comma_separated_integer_list],
-    )
-
-    question_list = models.CharField(
-        max_length=1024,
-        verbose_name=_("Question List"),
-        validators=[validate_comma_separated_integer_list],
-    )
-
-    incorrect_questions = models.CharField(
-        max_length=1024,
-        blank=True,
-        verbose_name=_("Incorrect questions"),
-        validators=[validate_comma_separated_integer_list],
+    question_count = models.PositiveIntegerField(
+        default=0, verbose_name=_("Question Count")
     )
 
     current_score = models.IntegerField(verbose_name=_("Current Score"))
     complete = models.BooleanField(
         default=False, blank=False, verbose_name=_("Complete")
     )
-    user_answers = models.TextField(
-        blank=True, default="{}", verbose_name=_("User Answers")
-    )
     start = models.DateTimeField(auto_now_add=True, verbose_name=_("Start"))
     end = models.DateTimeField(null=True, blank=True, verbose_name=_("End"))
+    # Orden de las opciones de las preguntas con choice_order "random"
+    seed = models.PositiveIntegerField(
+        default=new_seed, editable=False, verbose_name=_("Seed")
+    )
 
     objects = SittingManager()
 
     class Meta:
         permissions = (("view_sittings", _("Can see completed exams.")),)
+        indexes = [
+            # Lista de corrección: keyset sobre (end, id)
+            models.Index(fields=["complete", "end", "id"], name="sitting_done_idx"),
+            models.Index(
+                fields=["quiz", "complete", "end"], name="sitting_quiz_done_idx"
+            ),
+        ]
+
+    def _pending(self):
+        return self.sitting_questions.filter(answered=False)
 
     def get_first_question(self):
-        if not self.question_list:
+        question_id = (
+            self._pending()
+            .order_by("position")
+            .values_list("question_id", flat=True)
+            .first()
+        )
+        if question_id is None:
             return False
 
-        first, _ = self.question_list.split(",", 1)
-        question_id = int(first)
-        return Question.objects.get_subclass(id=question_id)
+        question = get_question_bundle(self.quiz_id).get(question_id)
+        if question is None:
+            # La pregunta ya no pertenece al examen
+            question = Question.objects.get_subclass(id=question_id)
+        question.choice_seed = self.seed
+        return question
 
     def remove_first_question(self):
-        if not self.question_list:
-            return
-
-        _, others = self.question_list.split(",", 1)
-        self.question_list = others
-        self.save()
+        # Una sola UPDATE sobre el índice (sitting, answered, position)
+        first_position = self._pending().order_by("position").values("position")[:1]
+        self.sitting_questions.filter(position=models.Subquery(first_position)).update(
+            answered=True
+        )
 
     def add_to_score(self, points):
         self.current_score += int(points)
@@ -351,12 +388,16 @@ class Sitting(models.Model):
         return self.current_score
 
     def _question_ids(self):
-        return [int(n) for n in self.question_order.split(",") if n]
+        return list(
+            self.sitting_questions.order_by("position").values_list(
+                "question_id", flat=True
+            )
+        )
 
     @property
     def get_percent_correct(self):
         dividend = float(self.current_score)
-        divisor = len(self._question_ids())
+        divisor = self.question_count
         if divisor < 1:
             return 0  # prevent divide by zero error
 
@@ -376,23 +417,23 @@ class Sitting(models.Model):
         self.save()
 
     def add_incorrect_question(self, question):
-        if len(self.incorrect_questions) > 0:
-            self.incorrect_questions += ","
-        self.incorrect_questions += str(question.id) + ","
+        self.sitting_questions.filter(question=question).update(is_correct=False)
+        self.__dict__.pop("get_incorrect_questions", None)
         if self.complete:
             self.add_to_score(-1)
-        self.save()
 
-    @property
+    @cached_property
     def get_incorrect_questions(self):
-        return [int(q) for q in self.incorrect_questions.split(",") if q]
+        return list(
+            self.sitting_questions.filter(is_correct=False)
+            .order_by("position")
+            .values_list("question_id", flat=True)
+        )
 
     def remove_incorrect_question(self, question):
-        current = self.get_incorrect_questions
-        current.remove(question.id)
-        self.incorrect_questions = ",".join(map(str, current))
+        self.sitting_questions.filter(question=question).update(is_correct=True)
+        self.__dict__.pop("get_incorrect_questions", None)
         self.add_to_score(1)
-        self.save()
 
     @property
     def check_if_passed(self):
@@ -405,23 +446,46 @@ class Sitting(models.Model):
         else:
             return _(f"You failed this quiz, give it one chance again.")
 
+    @transaction.atomic
+    def record_answer(self, question, guess, is_correct):
+        """Store the answer to ``question`` and move on to the next one.
+
+        All the state changes are computed in memory and written with one
+        statement per table: the sitting question, the sitting score (only
+        when the answer is right) and the user progress entry for the quiz.
+        A question already answered (a resubmitted form) changes nothing.
+        """
+        recorded = self.sitting_questions.filter(
+            question=question, answered=False
+        ).update(answer=str(guess), answered=True, is_correct=is_correct)
+        if not recorded:
+            return
+        if is_correct:
+            Sitting.objects.filter(pk=self.pk).update(
+                current_score=models.F("current_score") + 1
+            )
+            self.current_score += 1
+        else:
+            self.__dict__.pop("get_incorrect_questions", None)
+
+        ProgressEntry.objects.add(self.user_id, self.quiz_id, int(is_correct), 1)
+
     def add_user_answer(self, question, guess):
-        current = json.loads(self.user_answers)
-        current[question.id] = guess
-        self.user_answers = json.dumps(current)
-        self.save()
+        self.sitting_questions.filter(question=question).update(answer=str(guess))
 
     def get_questions(self, with_answers=False):
-        question_ids = self._question_ids()
-        questions = sorted(
-            self.quiz.question_set.filter(id__in=question_ids).select_subclasses(),
-            key=lambda q: question_ids.index(q.id),
+        entries = list(
+            self.sitting_questions.values_list("question_id", "position", "answer")
         )
+        positions = {question_id: position for question_id, position, _ in entries}
+        questions = get_question_bundle(self.quiz_id).ordered(positions)
+        for question in questions:
+            question.choice_seed = self.seed
 
         if with_answers:
-            user_answers = json.loads(self.user_answers)
+            user_answers = {question_id: answer for question_id, _, answer in entries}
             for question in questions:
-                question.user_answer = user_answers[str(question.id)]
+                question.user_answer = user_answers[question.id]
 
         return questions
 
@@ -431,14 +495,52 @@ class Sitting(models.Model):
 
     @property
     def get_max_score(self):
-        return len(self._question_ids())
+        return self.question_count
 
     def progress(self):
-        answered = len(json.loads(self.user_answers))
+        answered = self.sitting_questions.filter(answered=True).count()
         total = self.get_max_score
         return answered, total
 
 
+class SittingQuestion(models.Model):
+    """One question of a sitting, in the order it is served to the student."""
+
+    sitting = models.ForeignKey(
+        Sitting,
+        related_name="sitting_questions",
+        verbose_name=_("Sitting"),
+        on_delete=models.CASCADE,
+    )
+    question = models.ForeignKey(
+        "Question", verbose_name=_("Question"), on_delete=models.CASCADE
+    )
+    position = models.PositiveIntegerField(verbose_name=_("Position"))
+    answered = models.BooleanField(default=False, verbose_name=_("Answered"))
+    answer = models.TextField(blank=True, default="", verbose_name=_("Answer"))
+    # None hasta que se corrige la respuesta
+    is_correct = models.BooleanField(null=True, verbose_name=_("Is correct"))
+
+    class Meta:
+        verbose_name = _("Sitting Question")
+        verbose_name_plural = _("Sitting Questions")
+        ordering = ["position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sitting", "position"], name="unique_sitting_position"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["sitting", "answered", "position"],
+                name="sitting_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sitting_id} #{self.position}: {self.question_id}"
+
+
 class Question(models.Model):
     quiz = models.ManyToManyField(Quiz, verbose_name=_("Quiz"), blank=True)
     figure = models.ImageField(
@@ -484,33 +586,45 @@ class MCQuestion(Question):
     )
 
     def check_if_correct(self, guess):
-        answer = Choice.objects.get(id=guess)
+        answer = self._choice(guess)
 
         if answer.correct is True:
             return True
         else:
             return False
 
-    def order_choices(self, queryset):
+    def order_choices(self, queryset, seed=None):
         if self.choice_order == "content":
             return queryset.order_by("choice")
         if self.choice_order == "random":
-            return queryset.order_by("?")
+            return seeded_shuffle(queryset.order_by("id"), seed, self.id)
         if self.choice_order == "none":
             return queryset.order_by()
         return queryset
 
     def get_choices(self):
-        return self.order_choices(Choice.objects.filter(question=self))
+        # Questions served by a sitting carry its seed, so the random order
+        # is the same every time the question is shown
+        seed = getattr(self, "choice_seed", None)
+        # Questions served from the quiz bundle carry their choices already
+        choices = getattr(self, "_bundle_choices", None)
+        if choices is None:
+            return self.order_choices(Choice.objects.filter(question=self), seed)
+        if self.choice_order == "random":
+            return seeded_shuffle(choices, seed, self.id)
+        return list(choices)
 
     def get_choices_list(self):
-        return [
-            (choice.id, choice.choice)
-            for choice in self.order_choices(Choice.objects.filter(question=self))
-        ]
+        return [(choice.id, choice.choice) for choice in self.get_choices()]
+
+    def _choice(self, guess):
+        for choice in getattr(self, "_bundle_choices", ()):
+            if str(choice.id) == str(guess):
+                return choice
+        return Choice.objects.get(id=guess)
 
     def answer_choice_to_string(self, guess):
-        return Choice.objects.get(id=guess).choice
+        return self._choice(guess).choice
 
     class Meta:
         verbose_name = _("Multiple Choice Question")
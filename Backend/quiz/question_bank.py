@@ -0,0 +1,570 @@
+"""
+Question bank import and export as CSV, JSON or GIFT.
+
+Import reads the file one record at a time, validates it and queues the
+valid ones; every ``BATCH_SIZE`` records are inserted with one
+``bulk_create`` of the Question parents, one INSERT per subclass table
+(``bulk_create`` does not handle multi-table inheritance), one
+``bulk_create`` of the choices and one of the quiz links. The whole import
+is one transaction: if any record is invalid nothing is kept and the errors
+are reported with the line or record they come from. Bulk inserts skip the
+model signals, so the cached question bundle of the quiz is dropped here.
+
+Export reads the questions of a quiz in keyset chunks of ``BATCH_SIZE`` with
+their choices, two queries per chunk, and yields the file piece by piece.
+
+Formats:
+
+- CSV: ``type, content, explanation, choice_order, correct, choice_1, ...``
+  with ``type`` "mc" or "essay" and ``correct`` the numbers of the right
+  choices separated by ";".
+- JSON: an array, or one object per line, of ``{"type", "content",
+  "explanation", "choice_order", "choices": [{"text", "correct"}]}``.
+- GIFT (Moodle): multiple choice (``{=right ~wrong}``), true/false
+  (``{T}``) and essay (``{}``) questions; the general feedback
+  (``####``) is the explanation.
+"""
+import csv
+import json
+import re
+from collections import defaultdict, namedtuple
+from io import StringIO
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils.translation import gettext as _
+
+from .models import CHOICE_ORDER_OPTIONS, Question, MCQuestion, EssayQuestion, Choice
+from .question_bundle import invalidate_question_bundles
+
+BATCH_SIZE = 500
+
+# Only the first ones are reported, the file is still checked to the end
+MAX_ERRORS = 50
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "gift": "text/plain",
+}
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".jsonl": "json",
+    ".gift": "gift",
+    ".txt": "gift",
+}
+
+CSV_COLUMNS = ("type", "content", "explanation", "choice_order", "correct")
+
+QUESTION_TYPES = {
+    "mc": "mc",
+    "multiple_choice": "mc",
+    "multichoice": "mc",
+    "essay": "essay",
+}
+
+CHOICE_ORDERS = {value for value, _label in CHOICE_ORDER_OPTIONS}
+
+QuestionRecord = namedtuple(
+    "QuestionRecord", "kind content explanation choice_order choices"
+)
+
+
+class QuestionBankError(Exception):
+    def __init__(self, errors, count=None):
+        self.errors = errors
+        self.count = len(errors) if count is None else count
+        super().__init__("\n".join(self.messages))
+
+    @property
+    def messages(self):
+        return [f"{where}: {message}" for where, message in self.errors]
+
+
+def format_from_name(filename):
+    for extension, fmt in EXTENSIONS.items():
+        if filename.lower().endswith(extension):
+            return fmt
+    return None
+
+
+# Reading
+
+
+def csv_records(stream):
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    if "content" not in header:
+        raise QuestionBankError([(_("Line 1"), _("Missing the CSV header."))])
+    choice_columns = [
+        (index, name[len("choice_") :])
+        for index, name in enumerate(header)
+        if re.fullmatch(r"choice_\d+", name)
+    ]
+    for row in reader:
+        where = _("Line %(line)s") % {"line": reader.line_num}
+        if not any(value.strip() for value in row):
+            continue
+        row += [""] * (len(header) - len(row))
+        values = dict(zip(header, row))
+        correct = {
+            number.strip() for number in values.get("correct", "").split(";")
+        } - {""}
+        yield where, {
+            "type": values.get("type"),
+            "content": values.get("content"),
+            "explanation": values.get("explanation"),
+            "choice_order": values.get("choice_order"),
+            "choices": [
+                {"text": row[index], "correct": number in correct}
+                for index, number in choice_columns
+                if row[index].strip()
+            ],
+        }
+
+
+def json_values(stream, size=64 * 1024):
+    """The values of a JSON array, or of one value per line, decoded as the
+    text is read instead of after reading it all."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    done = False
+    while True:
+        # Skip the separators between values: "[", ",", "]" and whitespace
+        while position < len(buffer) and buffer[position] in "[],\r\n\t ":
+            position += 1
+        if position == len(buffer):
+            if done:
+                return
+            buffer, position = stream.read(size), 0
+            done = not buffer
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if done:
+                raise
+            # The value goes on in the next block
+            more = stream.read(size)
+            done = not more
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield value
+        position = end
+
+
+def json_records(stream):
+    try:
+        for number, value in enumerate(json_values(stream), 1):
+            where = _("Record %(number)s") % {"number": number}
+            if not isinstance(value, dict):
+                yield where, {"errors": [_("Not a JSON object.")]}
+                continue
+            yield where, value
+    except json.JSONDecodeError as error:
+        raise QuestionBankError([(_("JSON"), str(error))])
+
+
+GIFT_ESCAPED = re.compile(r"\\(.)", re.DOTALL)
+GIFT_SPECIAL = "~=#{}:"
+GIFT_FORMAT = re.compile(r"^\[(html|moodle|plain|markdown)\]", re.IGNORECASE)
+
+
+def gift_unescape(text):
+    return GIFT_ESCAPED.sub(
+        lambda match: "\n" if match.group(1) == "n" else match.group(1), text
+    ).strip()
+
+
+def gift_escape(text):
+    text = (text or "").replace("\\", "\\\\")
+    for char in GIFT_SPECIAL:
+        text = text.replace(char, "\\" + char)
+    return text.replace("\r\n", "\n").replace("\n", "\\n")
+
+
+def gift_find(text, token, start=0):
+    """Index of the first unescaped ``token`` from ``start``, or -1."""
+    index = start
+    while index < len(text):
+        if text[index] == "\\":
+            index += 2
+            continue
+        if text.startswith(token, index):
+            return index
+        index += 1
+    return -1
+
+
+def gift_answers(text):
+    """[(marker, text)] of a multiple choice answer block."""
+    answers = []
+    index = 0
+    while index < len(text):
+        if text[index] == "\\":
+            if answers:
+                answers[-1][1] += text[index : index + 2]
+            index += 2
+            continue
+        if text[index] in "=~":
+            answers.append([text[index], ""])
+        elif answers:
+            answers[-1][1] += text[index]
+        index += 1
+    return answers
+
+
+def gift_question(block):
+    """The record of one GIFT question (text without comments)."""
+    text = block.strip()
+    if text.startswith("::"):
+        end = gift_find(text, "::", 2)
+        if end != -1:
+            text = text[end + 2 :].strip()
+    opening = gift_find(text, "{")
+    closing = gift_find(text, "}", opening + 1) if opening != -1 else -1
+    if opening == -1 or closing == -1:
+        return {"errors": [_("Missing the {...} answer block.")]}
+
+    content = text[:opening] + " " + text[closing + 1 :]
+    content = gift_unescape(GIFT_FORMAT.sub("", content.strip()))
+    answer = text[opening + 1 : closing]
+    explanation = ""
+    feedback = gift_find(answer, "####")
+    if feedback != -1:
+        explanation = gift_unescape(GIFT_FORMAT.sub("", answer[feedback + 4 :]))
+        answer = answer[:feedback]
+    answer = answer.strip()
+    record = {"content": content, "explanation": explanation}
+
+    if not answer:
+        return dict(record, type="essay")
+    if answer.upper() in ("T", "TRUE", "F", "FALSE"):
+        right = answer.upper().startswith("T")
+        return dict(
+            record,
+            type="mc",
+            choice_order="none",
+            choices=[
+                {"text": _("True"), "correct": right},
+                {"text": _("False"), "correct": not right},
+            ],
+        )
+    answers = gift_answers(answer)
+    if answer.startswith("#") or gift_find(answer, "->") != -1:
+        return dict(record, type="numerical or matching")
+    if not any(marker == "~" for marker, _text in answers):
+        return dict(record, type="short answer")
+
+    choices = []
+    for marker, text in answers:
+        # Per answer feedback is dropped
+        end = gift_find(text, "#")
+        if end != -1:
+            text = text[:end]
+        weight = re.match(r"\s*%(-?\d+(?:\.\d+)?)%", text)
+        if weight:
+            text = text[weight.end() :]
+        correct = marker == "=" or bool(weight and float(weight.group(1)) > 0)
+        choices.append({"text": gift_unescape(text), "correct": correct})
+    return dict(record, type="mc", choices=choices)
+
+
+def gift_records(stream):
+    lines = []
+    start = None
+    for number, line in enumerate(stream, 1):
+        stripped = line.strip()
+        if stripped.startswith("//") or stripped.startswith("$CATEGORY:"):
+            continue
+        if stripped:
+            if start is None:
+                start = number
+            lines.append(line)
+            continue
+        if lines:
+            yield _("Line %(line)s") % {"line": start}, gift_question("".join(lines))
+            lines, start = [], None
+    if lines:
+        yield _("Line %(line)s") % {"line": start}, gift_question("".join(lines))
+
+
+READERS = {"csv": csv_records, "json": json_records, "gift": gift_records}
+
+
+def text(value):
+    return "" if value is None else str(value).strip()
+
+
+def validate(data):
+    """(QuestionRecord or None, [error messages]) for one parsed record."""
+    errors = list(data.get("errors", ()))
+    if errors:
+        return None, errors
+
+    kind = QUESTION_TYPES.get(text(data.get("type")).lower())
+    if kind is None:
+        errors.append(
+            _("Unsupported question type %(type)r.") % {"type": data.get("type")}
+        )
+    content = text(data.get("content"))
+    if not content:
+        errors.append(_("The question has no content."))
+    elif len(content) > Question._meta.get_field("content").max_length:
+        errors.append(_("The question is too long."))
+    explanation = text(data.get("explanation"))
+    if len(explanation) > Question._meta.get_field("explanation").max_length:
+        errors.append(_("The explanation is too long."))
+
+    choice_order = text(data.get("choice_order")).lower() or None
+    choices = data.get("choices") or []
+    if not isinstance(choices, list):
+        errors.append(_("The choices must be a list."))
+        choices = []
+    parsed = []
+    for choice in choices:
+        if isinstance(choice, dict):
+            choice_text = text(choice.get("text", choice.get("choice")))
+            correct = choice.get("correct") in (True, 1, "1", "true", "True")
+        else:
+            choice_text, correct = text(choice), False
+        if not choice_text:
+            errors.append(_("A choice has no text."))
+        elif len(choice_text) > Choice._meta.get_field("choice").max_length:
+            errors.append(_("A choice is too long."))
+        parsed.append((choice_text, correct))
+
+    if kind == "mc":
+        if choice_order is not None and choice_order not in CHOICE_ORDERS:
+            errors.append(
+                _("Unknown choice order %(order)r.") % {"order": choice_order}
+            )
+        if len(parsed) < 2:
+            errors.append(_("A multiple choice question needs two choices or more."))
+        elif [correct for _text, correct in parsed].count(True) != 1:
+            # Same rule as MCQuestionFormSet
+            errors.append(_("Exactly one choice must be marked as correct."))
+    elif kind == "essay" and parsed:
+        errors.append(_("An essay question cannot have choices."))
+
+    if errors:
+        return None, errors
+    return QuestionRecord(kind, content, explanation, choice_order, parsed), []
+
+
+# Writing
+
+
+def insert_rows(model, objs):
+    """INSERT the rows of a multi-table inherited model into its own table;
+    the parent rows must exist already."""
+    if objs:
+        # bulk_create() refuses multi-table inherited models, and save() would
+        # cost a query per row. _insert() is the private method bulk_create()
+        # writes with: given only the child's local fields, it inserts into
+        # the child table alone. Checked against Django 4.0.8.
+        model._base_manager._insert(objs, fields=model._meta.local_concrete_fields)
+
+
+def insert_batch(quiz, records):
+    questions = Question.objects.bulk_create(
+        [
+            Question(content=record.content, explanation=record.explanation)
+            for record in records
+        ]
+    )
+    insert_rows(
+        MCQuestion,
+        [
+            MCQuestion(question_ptr_id=question.pk, choice_order=record.choice_order)
+            for question, record in zip(questions, records)
+            if record.kind == "mc"
+        ],
+    )
+    insert_rows(
+        EssayQuestion,
+        [
+            EssayQuestion(question_ptr_id=question.pk)
+            for question, record in zip(questions, records)
+            if record.kind == "essay"
+        ],
+    )
+    Choice.objects.bulk_create(
+        [
+            Choice(question_id=question.pk, choice=choice_text, correct=correct)
+            for question, record in zip(questions, records)
+            for choice_text, correct in record.choices
+        ]
+    )
+    Through = Question.quiz.through
+    Through.objects.bulk_create(
+        [Through(question_id=question.pk, quiz_id=quiz.pk) for question in questions]
+    )
+
+
+@transaction.atomic
+def import_questions(quiz, stream, fmt):
+    """
+    Add the questions of ``stream`` (a text file) to ``quiz``.
+    Returns {"mc": count, "essay": count}; raises QuestionBankError, having
+    saved nothing, if a record is not valid.
+    """
+    counts = {"mc": 0, "essay": 0}
+    errors = []
+    error_count = 0
+    batch = []
+    for where, data in READERS[fmt](stream):
+        record, record_errors = validate(data)
+        if record_errors:
+            error_count += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append((where, " ".join(record_errors)))
+            continue
+        if error_count:
+            # Nothing will be kept, only check the rest of the file
+            continue
+        batch.append(record)
+        counts[record.kind] += 1
+        if len(batch) == BATCH_SIZE:
+            insert_batch(quiz, batch)
+            batch = []
+    if error_count:
+        raise QuestionBankError(errors, error_count)
+    if batch:
+        insert_batch(quiz, batch)
+    invalidate_question_bundles([quiz.pk])
+    return counts
+
+
+# Export
+
+
+def question_chunks(quiz):
+    """Lists of (question, choices) of at most ``BATCH_SIZE`` questions."""
+    last_id = 0
+    while True:
+        questions = list(
+            Question.objects.filter(quiz=quiz, id__gt=last_id)
+            .order_by("id")
+            .select_subclasses()[:BATCH_SIZE]
+        )
+        if not questions:
+            return
+        choices = defaultdict(list)
+        for choice in Choice.objects.filter(
+            question_id__in=[q.id for q in questions if isinstance(q, MCQuestion)]
+        ).order_by("id"):
+            choices[choice.question_id].append(choice)
+        yield [(question, choices[question.id]) for question in questions]
+        last_id = questions[-1].id
+
+
+def record_of(question, choices):
+    if isinstance(question, MCQuestion):
+        return {
+            "type": "mc",
+            "content": question.content,
+            "explanation": question.explanation or "",
+            "choice_order": question.choice_order or "",
+            "choices": [
+                {"text": choice.choice, "correct": choice.correct} for choice in choices
+            ],
+        }
+    if isinstance(question, EssayQuestion):
+        return {
+            "type": "essay",
+            "content": question.content,
+            "explanation": question.explanation or "",
+        }
+    return None
+
+
+def records(quiz):
+    for chunk in question_chunks(quiz):
+        yield [
+            record
+            for record in (record_of(question, choices) for question, choices in chunk)
+            if record is not None
+        ]
+
+
+def csv_chunks(quiz):
+    most_choices = (
+        Choice.objects.filter(question__quiz=quiz)
+        .values("question")
+        .annotate(count=Count("id"))
+        .order_by("-count")
+        .values_list("count", flat=True)
+        .first()
+    ) or 0
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(
+        list(CSV_COLUMNS) + [f"choice_{n}" for n in range(1, most_choices + 1)]
+    )
+    for chunk in records(quiz):
+        for record in chunk:
+            choices = record.get("choices", [])
+            correct = [
+                str(n) for n, choice in enumerate(choices, 1) if choice["correct"]
+            ]
+            writer.writerow(
+                [record["type"], record["content"], record["explanation"]]
+                + [record.get("choice_order", ""), ";".join(correct)]
+                + [choice["text"] for choice in choices]
+            )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def json_chunks(quiz):
+    # One record per line, which json_values reads back as it goes
+    separator = "[\n"
+    for chunk in records(quiz):
+        lines = []
+        for record in chunk:
+            lines.append(separator + json.dumps(record, ensure_ascii=False))
+            separator = ",\n"
+        yield "".join(lines).encode()
+    yield b"[]\n" if separator == "[\n" else b"\n]\n"
+
+
+def gift_of(record):
+    content = gift_escape(record["content"])
+    feedback = ""
+    if record["explanation"]:
+        feedback = "####" + gift_escape(record["explanation"])
+    if record["type"] == "essay":
+        return f"{content} {{{feedback}}}\n\n"
+    lines = [
+        "\t{}{}\n".format(
+            "=" if choice["correct"] else "~", gift_escape(choice["text"])
+        )
+        for choice in record["choices"]
+    ]
+    if feedback:
+        lines.append(f"\t{feedback}\n")
+    return f"{content} {{\n{''.join(lines)}}}\n\n"
+
+
+def gift_chunks(quiz):
+    for chunk in records(quiz):
+        yield "".join(gift_of(record) for record in chunk).encode()
+
+
+WRITERS = {"csv": csv_chunks, "json": json_chunks, "gift": gift_chunks}
+
+
+def export_chunks(quiz, fmt):
+    """The question bank of ``quiz`` as pieces of a ``fmt`` file (bytes)."""
+    return WRITERS[fmt](quiz)
+
+
+def export_filename(quiz, fmt):
+    extension = "txt" if fmt == "gift" else fmt
+    return f"{quiz.slug}-questions.{extension}"
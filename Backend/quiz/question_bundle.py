@@ -0,0 +1,85 @@
+"""
+Per-quiz question bundle kept in the "querysets" cache alias.
+
+A bundle holds every question of a quiz already resolved to its subclass
+(``MCQuestion``, ``EssayQuestion``) with the choices of multiple choice
+questions attached in display order, so serving the next question of a
+sitting does not touch the question tables. Bundles are immutable: any
+change to a question, a choice or the questions of a quiz drops the
+cached bundle (see ``quiz.signals``) and the next read rebuilds it.
+"""
+import copy
+
+from django.core.cache import caches
+from django.db import transaction
+
+QUESTION_BUNDLE_TIMEOUT = 60 * 60 * 24
+
+
+def bundle_cache_key(quiz_id):
+    return f"quiz:{quiz_id}:question-bundle"
+
+
+class QuestionBundle:
+    def __init__(self, quiz_id, questions):
+        self.quiz_id = quiz_id
+        self.questions = tuple(questions)
+        self.by_id = {question.id: question for question in self.questions}
+
+    def __len__(self):
+        return len(self.questions)
+
+    def get(self, question_id):
+        """A private copy of the question, or None if it left the quiz."""
+        question = self.by_id.get(question_id)
+        return copy.copy(question) if question is not None else None
+
+    def ordered(self, positions):
+        """Copies of the questions in ``positions`` ({question id: position}),
+        sorted by position."""
+        return [
+            copy.copy(self.by_id[question_id])
+            for question_id in sorted(
+                positions.keys() & self.by_id.keys(), key=positions.__getitem__
+            )
+        ]
+
+    @classmethod
+    def build(cls, quiz_id):
+        from .models import Question, MCQuestion, Choice
+
+        questions = list(
+            Question.objects.filter(quiz__id=quiz_id).order_by("id").select_subclasses()
+        )
+        choices = {}
+        for choice in Choice.objects.filter(question__quiz__id=quiz_id).order_by("id"):
+            choices.setdefault(choice.question_id, []).append(choice)
+
+        for question in questions:
+            if isinstance(question, MCQuestion):
+                question_choices = choices.get(question.id, [])
+                if question.choice_order == "content":
+                    question_choices.sort(key=lambda choice: choice.choice)
+                question._bundle_choices = tuple(question_choices)
+        return cls(quiz_id, questions)
+
+
+def get_question_bundle(quiz_id):
+    cache = caches["querysets"]
+    key = bundle_cache_key(quiz_id)
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = QuestionBundle.build(quiz_id)
+        cache.set(key, bundle, QUESTION_BUNDLE_TIMEOUT)
+    return bundle
+
+
+def invalidate_question_bundles(quiz_ids):
+    cache = caches["querysets"]
+    keys = [bundle_cache_key(quiz_id) for quiz_id in set(quiz_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # Again once committed, in case another request rebuilt the bundle
+    # from the old rows in the meantime
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,59 @@
+from .models import Quiz
+from .question_bundle import invalidate_question_bundles
+from .marking import invalidate_quiz_summary
+
+
+def question_quiz_ids(question_id):
+    return list(
+        Quiz.objects.filter(question__id=question_id).values_list("id", flat=True)
+    )
+
+
+def question_changed_receiver(sender, instance=None, *args, **kwargs):
+    """
+    Drop the cached bundles of every quiz the question belongs to
+    (pre_delete too, since the quiz links are gone by post_delete)
+    """
+    if instance.pk:
+        invalidate_question_bundles(question_quiz_ids(instance.pk))
+
+
+def choice_changed_receiver(sender, instance=None, *args, **kwargs):
+    if instance.question_id:
+        invalidate_question_bundles(question_quiz_ids(instance.question_id))
+
+
+def question_quizzes_changed_receiver(
+    sender, instance=None, action="", reverse=False, pk_set=None, *args, **kwargs
+):
+    """
+    Questions added to or removed from a quiz, from either side of the m2m
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # quiz.question_set.add(...)
+        invalidate_question_bundles([instance.pk])
+    elif action == "pre_clear":
+        invalidate_question_bundles(question_quiz_ids(instance.pk))
+    else:
+        invalidate_question_bundles(pk_set or [])
+
+
+def quiz_deleted_receiver(sender, instance=None, *args, **kwargs):
+    invalidate_question_bundles([instance.pk])
+    invalidate_quiz_summary(instance.pk)
+
+
+def quiz_saved_receiver(sender, instance=None, *args, **kwargs):
+    # The pass mark may have changed
+    invalidate_quiz_summary(instance.pk)
+
+
+def sitting_changed_receiver(sender, instance=None, *args, **kwargs):
+    """
+    A sitting completed, marked again or deleted changes the marking summary
+    of its quiz; sittings in progress are not part of it
+    """
+    if instance.complete:
+        invalidate_quiz_summary(instance.quiz_id)
@@ -1,3 +1,581 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import quote
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+
+from course.models import Program, Course, CourseAllocation
+from .models import (
+    Quiz,
+    Progress,
+    ProgressEntry,
+    Sitting,
+    SittingQuestion,
+    MCQuestion,
+    EssayQuestion,
+    Question,
+    Choice,
+)
+from . import question_bank
+from .marking import SittingPage, decode_cursor, quiz_summaries
+from .question_bundle import get_question_bundle, bundle_cache_key
+from .utils import seeded_shuffle
+
+User = get_user_model()
+
+
+class SittingQuestionTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.quiz = Quiz.objects.create(course=self.course, title="Cuestionario 1")
+        self.questions = []
+        for i in range(4):
+            question = MCQuestion.objects.create(content=f"Question {i}")
+            question.quiz.add(self.quiz)
+            self.questions.append(question)
+        self.user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+
+    def test_new_sitting_stores_one_row_per_question(self):
+        self.assertEqual(self.sitting.get_max_score, 4)
+        self.assertEqual(
+            list(self.sitting.sitting_questions.values_list("question_id", flat=True)),
+            [q.id for q in self.questions],
+        )
+        self.assertEqual(self.sitting.progress(), (0, 4))
+
+    def test_answering_advances_with_single_update(self):
+        first = self.sitting.get_first_question()
+        self.assertEqual(first, self.questions[0])
+        self.assertIsInstance(first, MCQuestion)
+
+        self.sitting.add_user_answer(first, 7)
+        self.sitting.add_incorrect_question(first)
+        with self.assertNumQueries(1):
+            self.sitting.remove_first_question()
+
+        self.assertEqual(self.sitting.get_first_question(), self.questions[1])
+        self.assertEqual(self.sitting.progress(), (1, 4))
+        self.assertEqual(self.sitting.get_incorrect_questions, [first.id])
+        answered = SittingQuestion.objects.get(sitting=self.sitting, answered=True)
+        self.assertEqual((answered.answer, answered.is_correct), ("7", False))
+
+    def test_last_question_is_served_as_its_subclass(self):
+        for _ in range(3):
+            self.sitting.remove_first_question()
+        last = self.sitting.get_first_question()
+        self.assertIsInstance(last, MCQuestion)
+        self.assertEqual(last, self.questions[3])
+        self.sitting.remove_first_question()
+        self.assertIs(self.sitting.get_first_question(), False)
+
+    def test_marking_toggles_incorrect_questions(self):
+        question = self.questions[1]
+        self.sitting.mark_quiz_complete()
+        self.sitting.add_to_score(4)
+
+        self.sitting.add_incorrect_question(question)
+        self.assertEqual(self.sitting.get_incorrect_questions, [question.id])
+        self.assertEqual(self.sitting.current_score, 3)
+        self.sitting.remove_incorrect_question(question)
+        self.assertEqual(self.sitting.get_incorrect_questions, [])
+        self.assertEqual(self.sitting.get_percent_correct, 100)
+
+    def test_get_questions_keeps_sitting_order_and_answers(self):
+        for question in reversed(self.questions):
+            self.sitting.add_user_answer(question, f"answer {question.id}")
+        questions = self.sitting.get_questions(with_answers=True)
+        self.assertEqual(questions, self.questions)
+        self.assertEqual(questions[2].user_answer, f"answer {self.questions[2].id}")
+
+
+class RecordAnswerTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Computer Science")
+        course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.quiz = Quiz.objects.create(course=course, title="Cuestionario 1")
+        self.questions = []
+        for i in range(2):
+            question = MCQuestion.objects.create(content=f"Question {i}")
+            question.quiz.add(self.quiz)
+            self.questions.append(question)
+        user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.sitting = Sitting.objects.new_sitting(user, self.quiz, course)
+
+    def test_record_answer_writes_each_table_once(self):
+        # sitting question, sitting and progress entry updates, plus creating
+        # the progress entry on the first answer
+        with self.assertNumQueries(8):
+            self.sitting.record_answer(self.questions[0], 3, True)
+        with self.assertNumQueries(4):
+            self.sitting.record_answer(self.questions[1], 4, False)
+
+        self.sitting.refresh_from_db()
+        self.assertEqual(self.sitting.current_score, 1)
+        self.assertEqual(self.sitting.progress(), (2, 2))
+        self.assertEqual(self.sitting.get_incorrect_questions, [self.questions[1].id])
+        self.assertIs(self.sitting.get_first_question(), False)
+        entry = ProgressEntry.objects.get(user=self.sitting.user, quiz=self.quiz)
+        self.assertEqual((entry.score, entry.possible), (1, 2))
+
+    def test_answering_twice_counts_once(self):
+        self.sitting.record_answer(self.questions[0], 3, True)
+        # only the sitting question update, inside its savepoint
+        with self.assertNumQueries(3):
+            self.sitting.record_answer(self.questions[0], 3, True)
+
+        self.sitting.refresh_from_db()
+        self.assertEqual(self.sitting.current_score, 1)
+        entry = ProgressEntry.objects.get(user=self.sitting.user, quiz=self.quiz)
+        self.assertEqual((entry.score, entry.possible), (1, 1))
+
+    def test_progress_reads_category_totals_in_one_query(self):
+        exam = Quiz.objects.create(
+            course=self.quiz.course, title="Parcial", category="exam"
+        )
+        user = self.sitting.user
+        ProgressEntry.objects.add(user.id, self.quiz, 1, 2)
+        ProgressEntry.objects.add(user.id, exam, 3, 4)
+        ProgressEntry.objects.add(user.id, exam, 3, 4)
+        progress = Progress.objects.new_progress(user)
+
+        with self.assertNumQueries(1):
+            scores = progress.list_all_cat_scores()
+        self.assertEqual(scores["Exam"], [6, 2, 75])
+        self.assertEqual(scores["Uncategorized"], [1, 1, 50])
+
+
+class QuestionBundleTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        program = Program.objects.create(title="Computer Science")
+        course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.quiz = Quiz.objects.create(course=course, title="Cuestionario 1")
+        self.questions = []
+        for i in range(3):
+            question = MCQuestion.objects.create(
+                content=f"Question {i}", choice_order="content"
+            )
+            question.quiz.add(self.quiz)
+            Choice.objects.create(question=question, choice="b", correct=True)
+            Choice.objects.create(question=question, choice="a")
+            self.questions.append(question)
+        user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.sitting = Sitting.objects.new_sitting(user, self.quiz, course)
+
+    def test_next_question_needs_no_question_queries(self):
+        get_question_bundle(self.quiz.id)
+        # only the pending sitting question lookup
+        with self.assertNumQueries(1):
+            question = self.sitting.get_first_question()
+            choices = question.get_choices_list()
+            self.assertTrue(question.check_if_correct(choices[1][0]))
+        self.assertEqual([text for _, text in choices], ["a", "b"])
+
+    def test_changes_drop_the_cached_bundle(self):
+        get_question_bundle(self.quiz.id)
+        choice = Choice.objects.filter(question=self.questions[0]).get(choice="a")
+        choice.choice = "c"
+        choice.save()
+        self.assertIsNone(caches["querysets"].get(bundle_cache_key(self.quiz.id)))
+
+        question = self.sitting.get_first_question()
+        self.assertEqual([text for _, text in question.get_choices_list()], ["b", "c"])
+
+        get_question_bundle(self.quiz.id)
+        self.questions[2].quiz.remove(self.quiz)
+        self.assertEqual(len(get_question_bundle(self.quiz.id)), 2)
+
+    def test_get_questions_follows_sitting_positions(self):
+        self.sitting.sitting_questions.filter(question=self.questions[0]).update(
+            position=10
+        )
+        questions = self.sitting.get_questions()
+        self.assertEqual(questions, self.questions[1:] + self.questions[:1])
+
+
+class SeededOrderTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.quiz = Quiz.objects.create(
+            course=self.course, title="Cuestionario 1", random_order=True
+        )
+        self.questions = []
+        for i in range(12):
+            question = MCQuestion.objects.create(
+                content=f"Question {i}", choice_order="random"
+            )
+            question.quiz.add(self.quiz)
+            for text in "abcdef":
+                Choice.objects.create(question=question, choice=text)
+            self.questions.append(question)
+        self.user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+
+    def test_new_sitting_shuffles_cached_ids_without_random_sort(self):
+        get_question_bundle(self.quiz.id)
+        # Only the two INSERTs, the question ids come from the cached bundle
+        with self.assertNumQueries(2) as queries:
+            sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+        for query in queries.captured_queries:
+            self.assertNotIn("RANDOM()", query["sql"].upper())
+        ids = [question.id for question in self.questions]
+        self.assertEqual(sitting._question_ids(), seeded_shuffle(ids, sitting.seed))
+        self.assertNotEqual(sitting._question_ids(), ids)
+
+    def test_choice_order_is_stable_per_sitting(self):
+        sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+        first = sitting.get_first_question().get_choices_list()
+        reloaded = Sitting.objects.get(pk=sitting.pk).get_first_question()
+        self.assertEqual(reloaded.get_choices_list(), first)
+        self.assertCountEqual([text for _, text in first], "abcdef")
+
+        # Without the bundle, from the Choice rows, the order is the same
+        caches["querysets"].clear()
+        question = MCQuestion.objects.get(pk=reloaded.pk)
+        question.choice_seed = sitting.seed
+        self.assertEqual(question.get_choices_list(), first)
+
+        questions = sitting.get_questions()
+        by_id = {question.id: question.get_choices_list() for question in questions}
+        self.assertEqual(by_id[reloaded.id], first)
+
+
+GIFT_BANK = r"""// Banco de preguntas
+$CATEGORY: algoritmos
+
+::Q1:: ¿Cuál es la complejidad de la búsqueda binaria? {
+	=O(log n)
+	~O(n) # Lineal
+	~O(n\{2\})
+	####Se descarta la mitad en cada paso.
+}
+
+La búsqueda binaria requiere datos ordenados. {T}
+
+Explica qué es un algoritmo voraz. {}
+"""
+
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.quiz = Quiz.objects.create(course=self.course, title="Cuestionario 1")
+        self.other = Quiz.objects.create(course=self.course, title="Cuestionario 2")
+
+    def bank(self, quiz):
+        return [record for chunk in question_bank.records(quiz) for record in chunk]
+
+    def test_import_gift(self):
+        get_question_bundle(self.quiz.id)
+        counts = question_bank.import_questions(self.quiz, StringIO(GIFT_BANK), "gift")
+        self.assertEqual(counts, {"mc": 2, "essay": 1})
+        self.assertIsNone(caches["querysets"].get(bundle_cache_key(self.quiz.id)))
+
+        first, true_false, essay = get_question_bundle(self.quiz.id).questions
+        self.assertEqual(
+            first.content, "¿Cuál es la complejidad de la búsqueda binaria?"
+        )
+        self.assertEqual(first.explanation, "Se descarta la mitad en cada paso.")
+        self.assertEqual(
+            [(choice.choice, choice.correct) for choice in first.get_choices()],
+            [("O(log n)", True), ("O(n)", False), ("O(n{2})", False)],
+        )
+        self.assertEqual(
+            [choice.correct for choice in true_false.get_choices()], [True, False]
+        )
+        self.assertIsInstance(essay, EssayQuestion)
+
+    def test_imported_questions_have_their_child_rows(self):
+        question_bank.import_questions(self.quiz, StringIO(GIFT_BANK), "gift")
+        questions = list(Question.objects.filter(quiz=self.quiz).order_by("pk"))
+        mc_ids = set(MCQuestion.objects.values_list("pk", flat=True))
+        essay_ids = set(EssayQuestion.objects.values_list("pk", flat=True))
+        self.assertEqual(mc_ids, {questions[0].pk, questions[1].pk})
+        self.assertEqual(essay_ids, {questions[2].pk})
+        self.assertEqual(
+            MCQuestion.objects.get(pk=questions[0].pk).content, questions[0].content
+        )
+
+    def test_invalid_records_import_nothing(self):
+        bank = (
+            "type,content,explanation,choice_order,correct,choice_1,choice_2\n"
+            "mc,Dos más dos,,content,1,4,5\n"
+            "mc,Sin respuesta,,,,a,b\n"
+            "essay,,,,,,\n"
+            "quiz,Tipo raro,,,,,\n"
+        )
+        with self.assertRaises(question_bank.QuestionBankError) as raised:
+            question_bank.import_questions(self.quiz, StringIO(bank), "csv")
+        self.assertEqual(raised.exception.count, 3)
+        self.assertEqual(
+            [where for where, _ in raised.exception.errors],
+            ["Line 3", "Line 4", "Line 5"],
+        )
+        self.assertFalse(Question.objects.exists())
+
+    def test_round_trip_in_every_format(self):
+        question_bank.import_questions(self.quiz, StringIO(GIFT_BANK), "gift")
+        expected = self.bank(self.quiz)
+        for fmt in ("csv", "json", "gift"):
+            with self.subTest(fmt=fmt):
+                Question.objects.filter(quiz=self.other).delete()
+                exported = b"".join(question_bank.export_chunks(self.quiz, fmt))
+                question_bank.import_questions(
+                    self.other, StringIO(exported.decode()), fmt
+                )
+                imported = self.bank(self.other)
+                if fmt == "gift":
+                    # GIFT has no choice order
+                    for record in expected + imported:
+                        record.pop("choice_order", None)
+                self.assertEqual(imported, expected)
+
+    def test_large_banks_are_written_in_batches(self):
+        records = [
+            {
+                "type": "mc",
+                "content": f"Pregunta {i}",
+                "choices": [{"text": "a", "correct": True}, {"text": "b"}],
+            }
+            for i in range(1200)
+        ]
+        bank = "\n".join(json.dumps(record) for record in records)
+        with CaptureQueriesContext(connection) as queries:
+            counts = question_bank.import_questions(self.quiz, StringIO(bank), "json")
+        self.assertEqual(counts["mc"], 1200)
+        # Nothing is read back, and each batch of 500 is one INSERT per table
+        # (SQLite splits the bigger ones to stay within its variable limit)
+        statements = [query["sql"] for query in queries]
+        self.assertFalse([sql for sql in statements if sql.startswith("SELECT")])
+        self.assertEqual(
+            len([sql for sql in statements if 'INTO "quiz_mcquestion"' in sql]), 3
+        )
+        self.assertEqual(Choice.objects.filter(question__quiz=self.quiz).count(), 2400)
+        self.assertEqual(len(get_question_bundle(self.quiz.id)), 1200)
+
+    def test_import_and_export_views(self):
+        lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        allocation = CourseAllocation.objects.create(lecturer=lecturer)
+        allocation.courses.add(self.course)
+        self.client.force_login(lecturer)
+        upload = SimpleUploadedFile("bank.txt", GIFT_BANK.encode())
+        response = self.client.post(
+            reverse("quiz:question_bank_import", args=[self.course.slug, self.quiz.pk]),
+            {"file": upload},
+        )
+        self.assertRedirects(
+            response, reverse("quiz:quiz_index", args=[self.course.slug])
+        )
+        self.assertEqual(Question.objects.filter(quiz=self.quiz).count(), 3)
+
+        response = self.client.get(
+            reverse("quiz:question_bank_export", args=[self.course.slug, self.quiz.pk]),
+            {"format": "json"},
+        )
+        self.assertEqual(response["Content-Type"], "application/json")
+        exported = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(exported, self.bank(self.quiz))
+
+    def test_views_are_forbidden_to_lecturers_of_other_courses(self):
+        lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        self.client.force_login(lecturer)
+        upload = SimpleUploadedFile("bank.txt", GIFT_BANK.encode())
+        response = self.client.post(
+            reverse("quiz:question_bank_import", args=[self.course.slug, self.quiz.pk]),
+            {"file": upload},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Question.objects.exists())
+        response = self.client.get(
+            reverse("quiz:question_bank_export", args=[self.course.slug, self.quiz.pk])
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class MarkingListTests(TestCase):
+    def setUp(self):
+        caches["querysets"].clear()
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms", code="CS101", program=program, semester="First"
+        )
+        other_course = Course.objects.create(
+            title="Databases", code="CS102", program=program, semester="First"
+        )
+        self.quiz = Quiz.objects.create(
+            course=self.course, title="Cuestionario 1", pass_mark=50
+        )
+        self.other = Quiz.objects.create(
+            course=other_course, title="Cuestionario 2", pass_mark=50
+        )
+        self.user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        start = now() - timedelta(days=1)
+        scores = [(1, 2), (3, 4), (0, 4), (4, 4), (2, 4)]
+        self.sittings = []
+        for i, (score, count) in enumerate(scores):
+            self.sittings.append(
+                Sitting.objects.create(
+                    user=self.user,
+                    quiz=self.quiz,
+                    course=self.course,
+                    question_count=count,
+                    current_score=score,
+                    complete=True,
+                    # Two sittings share their end, the id breaks the tie
+                    end=start + timedelta(minutes=min(i, 3)),
+                )
+            )
+        Sitting.objects.create(
+            user=self.user,
+            quiz=self.other,
+            course=other_course,
+            question_count=2,
+            current_score=2,
+            complete=True,
+            end=start,
+        )
+        # In progress, not listed
+        Sitting.objects.create(
+            user=self.user, quiz=self.quiz, course=self.course, current_score=0
+        )
+
+    def test_keyset_pages_cover_every_completed_sitting_once(self):
+        undated = [
+            Sitting.objects.create(
+                user=self.user,
+                quiz=self.quiz,
+                course=self.course,
+                question_count=1,
+                current_score=1,
+                complete=True,
+            )
+            for _ in range(2)
+        ]
+        queryset = Sitting.objects.filter(quiz=self.quiz, complete=True)
+        seen, cursor = [], None
+        while True:
+            page = SittingPage(queryset, cursor, size=2)
+            seen += page.sittings
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = sorted(
+            self.sittings, key=lambda sitting: (sitting.end, sitting.id), reverse=True
+        )
+        self.assertEqual(seen, expected + undated[::-1])
+
+    def test_keyset_filter_has_no_null_branch(self):
+        queryset = Sitting.objects.filter(quiz=self.quiz, complete=True)
+        page = SittingPage(queryset, size=2)
+        with CaptureQueriesContext(connection) as queries:
+            SittingPage(queryset, page.next_cursor, size=2)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"end" IS NULL', queries[0]["sql"])
+        self.assertEqual(decode_cursor("not a cursor"), None)
+
+    def test_summaries_are_cached_until_a_sitting_completes(self):
+        with self.assertNumQueries(1):
+            summaries = quiz_summaries([self.quiz.id, self.other.id])
+        self.assertEqual(
+            summaries[self.quiz.id], {"attempts": 5, "mean": 55.0, "pass_rate": 80.0}
+        )
+        self.assertEqual(summaries[self.other.id]["attempts"], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(quiz_summaries([self.quiz.id, self.other.id]), summaries)
+
+        Sitting.objects.get(complete=False).mark_quiz_complete()
+        with self.assertNumQueries(1):
+            summary = quiz_summaries([self.quiz.id, self.other.id])[self.quiz.id]
+        self.assertEqual(summary["attempts"], 6)
+
+        # Marking a question again changes the score
+        self.sittings[2].add_to_score(1)
+        self.assertEqual(quiz_summaries([self.quiz.id])[self.quiz.id]["mean"], 50.0)
+
+    def test_lecturers_see_a_page_of_their_courses(self):
+        lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        allocation = CourseAllocation.objects.create(lecturer=lecturer)
+        allocation.courses.add(self.course)
+        self.client.force_login(lecturer)
+
+        response = self.client.get(reverse("quiz:quiz_marking"))
+        self.assertEqual(len(response.context["sitting_list"]), 5)
+        self.assertFalse(response.context["page"].has_next)
+        self.assertEqual(
+            [summary["quiz"] for summary in response.context["quiz_summaries"]],
+            [self.quiz],
+        )
 
-# Create your tests here.
+        with mock.patch("quiz.marking.PAGE_SIZE", 3):
+            response = self.client.get(
+                reverse("quiz:quiz_marking"), {"user_filter": self.user.username}
+            )
+            page = response.context["page"]
+            self.assertTrue(page.has_next)
+            self.assertContains(response, f"after={quote(page.next_cursor)}")
+            response = self.client.get(
+                reverse("quiz:quiz_marking"),
+                {"user_filter": self.user.username, "after": page.next_cursor},
+            )
+        self.assertEqual(len(response.context["sitting_list"]), 2)
+        self.assertFalse(response.context["page"].has_next)
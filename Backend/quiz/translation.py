@@ -1,5 +1,5 @@
 from modeltranslation.translator import register, TranslationOptions
-from .models import Quiz, Question, Choice, MCQuestion
+from .models import Quiz, Question, Choice, MCQuestion, EssayQuestion
 
 @register(Quiz)
 class QuizTranslationOptions(TranslationOptions):
@@ -18,4 +18,8 @@ class ChoiceTranslationOptions(TranslationOptions):
 
 @register(MCQuestion)
 class MCQuestionTranslationOptions(TranslationOptions):
-    pass
\ No newline at end of file
+    pass
+
+@register(EssayQuestion)
+class EssayQuestionTranslationOptions(TranslationOptions):
+    pass
@@ -17,6 +17,16 @@ urlpatterns = [
     path("<slug>/quiz_add/", QuizCreateView.as_view(), name="quiz_create"),
     path("<slug>/<int:pk>/add/", QuizUpdateView.as_view(), name="quiz_update"),
     path("<slug>/<int:pk>/delete/", quiz_delete, name="quiz_delete"),
+    path(
+        "<slug>/<int:pk>/questions/import/",
+        question_bank_import,
+        name="question_bank_import",
+    ),
+    path(
+        "<slug>/<int:pk>/questions/export/",
+        question_bank_export,
+        name="question_bank_export",
+    ),
     path(
         "mc-question/add/<slug>/<int:quiz_id>/",
         MCQuestionCreate.as_view(),
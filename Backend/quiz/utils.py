@@ -28,3 +28,24 @@ def unique_slug_generator(instance, new_slug=None):
         )
         return unique_slug_generator(instance, new_slug=new_slug)
     return slug
+
+
+def new_seed():
+    """A random seed for ``seeded_shuffle``, e.g. one per sitting."""
+    return random.SystemRandom().randrange(2**31)
+
+
+def seeded_shuffle(items, seed, *salt):
+    """
+    ``items`` as a new list in an order that only depends on ``seed`` and
+    ``salt`` (e.g. a question id, so each question of a sitting gets its own
+    permutation). With ``seed=None`` the order is random.
+    """
+    items = list(items)
+    if seed is None:
+        rng = random.Random()
+    else:
+        # str seeds are hashed with SHA-512, so stable across processes
+        rng = random.Random(":".join(str(part) for part in (seed, *salt)))
+    rng.shuffle(items)
+    return items
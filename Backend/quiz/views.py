@@ -1,3 +1,5 @@
+import io
+
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404, render, redirect
@@ -12,13 +14,29 @@ from django.views.generic import (
 )
 from django.contrib import messages
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404, StreamingHttpResponse
 from django.urls import reverse
 
 from accounts.decorators import lecturer_required
 from course.models import Course
 from .models import Quiz, Question, Progress, Sitting, MCQuestion, EssayQuestion
-from .forms import QuestionForm, EssayForm, QuizAddForm, MCQuestionFormSet
+from .forms import (
+    QuestionForm,
+    EssayForm,
+    QuizAddForm,
+    MCQuestionFormSet,
+    QuestionBankImportForm,
+)
+from .question_bundle import get_question_bundle
+from .marking import SittingPage, quiz_summaries
+from .question_bank import (
+    CONTENT_TYPES,
+    QuestionBankError,
+    export_chunks,
+    export_filename,
+    format_from_name,
+    import_questions,
+)
 
 
 @method_decorator([login_required, lecturer_required], name="dispatch")
@@ -102,7 +120,7 @@ class MCQuestionCreate(CreateView):
         context["quizQuestions"] = Question.objects.filter(
             quiz=self.kwargs["quiz_id"]
         ).count()
-        
+
         if self.request.POST:
             context["formset"] = MCQuestionFormSet(self.request.POST)
         else:
@@ -114,7 +132,7 @@ class MCQuestionCreate(CreateView):
         context = self.get_context_data()
         formset = context["formset"]
         course = context["course"]
-        
+
         if formset.is_valid():
             with transaction.atomic():
                 # Save the question first
@@ -137,19 +155,95 @@ class MCQuestionCreate(CreateView):
         return super(MCQuestionCreate, self).form_invalid(form)
 
 
+def taught_quiz_or_403(request, slug, pk):
+    """El cuestionario, si el usuario es superusuario o imparte su curso."""
+    quiz = get_object_or_404(
+        Quiz.objects.select_related("course"), pk=pk, course__slug=slug
+    )
+    if not (
+        request.user.is_superuser or request.lecturer_allocations.teaches(quiz.course)
+    ):
+        raise PermissionDenied
+    return quiz
+
+
+@login_required
+@lecturer_required
+def question_bank_import(request, slug, pk):
+    """Importar preguntas de un archivo CSV, JSON o GIFT."""
+    quiz = taught_quiz_or_403(request, slug, pk)
+    if request.method == "POST":
+        form = QuestionBankImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            fmt = form.cleaned_data["format"] or format_from_name(upload.name)
+            if fmt is None:
+                form.add_error("format", "No se reconoce el formato del archivo.")
+            else:
+                stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig")
+                try:
+                    counts = import_questions(quiz, stream, fmt)
+                except QuestionBankError as error:
+                    for message in error.messages:
+                        messages.error(request, message)
+                    messages.error(
+                        request,
+                        f"{error.count} registro(s) con errores, no se importó ninguna pregunta.",
+                    )
+                except UnicodeDecodeError:
+                    messages.error(
+                        request, "El archivo debe estar codificado en UTF-8."
+                    )
+                else:
+                    messages.success(
+                        request,
+                        f"Se importaron {counts['mc'] + counts['essay']} preguntas.",
+                    )
+                    return redirect("quiz:quiz_index", slug)
+    else:
+        form = QuestionBankImportForm()
+    return render(
+        request,
+        "quiz/question_bank_import.html",
+        {"form": form, "quiz": quiz, "course": quiz.course},
+    )
+
+
+@login_required
+@lecturer_required
+def question_bank_export(request, slug, pk):
+    """``?format=json`` (por defecto), ``csv`` o ``gift``, enviado en streaming."""
+    quiz = taught_quiz_or_403(request, slug, pk)
+    fmt = request.GET.get("format", "json")
+    if fmt not in CONTENT_TYPES:
+        raise Http404
+    response = StreamingHttpResponse(
+        export_chunks(quiz, fmt), content_type=CONTENT_TYPES[fmt]
+    )
+    response[
+        "Content-Disposition"
+    ] = f'attachment; filename="{export_filename(quiz, fmt)}"'
+    return response
+
+
 @login_required
 def quiz_list(request, slug):
     quizzes = Quiz.objects.filter(course__slug=slug).order_by("-timestamp")
     course = Course.objects.get(slug=slug)
     # Identify which quizzes the current user has already completed for this course
     completed_quiz_ids = list(
-        Sitting.objects.filter(user=request.user, course=course, complete=True)
-        .values_list("quiz_id", flat=True)
+        Sitting.objects.filter(
+            user=request.user, course=course, complete=True
+        ).values_list("quiz_id", flat=True)
     )
     return render(
         request,
         "quiz/quiz_list.html",
-        {"quizzes": quizzes, "course": course, "completed_quiz_ids": completed_quiz_ids},
+        {
+            "quizzes": quizzes,
+            "course": course,
+            "completed_quiz_ids": completed_quiz_ids,
+        },
     )
     # return render(request, 'quiz/quiz_list.html', {'quizzes': quizzes})
 
@@ -192,21 +286,19 @@ class QuizUserProgressView(TemplateView):
 @method_decorator([login_required, lecturer_required], name="dispatch")
 class QuizMarkingList(QuizMarkerMixin, SittingFilterTitleMixin, ListView):
     model = Sitting
+    # La página es una lista, no un queryset del que deducir el nombre
+    context_object_name = "sitting_list"
 
-    # def get_context_data(self, **kwargs):
-    #     context = super(QuizMarkingList, self).get_context_data(**kwargs)
-    #     context['queryset_counter'] = super(QuizMarkingList, self).get_queryset().filter(complete=True).filter(course__allocated_course__lecturer__pk=self.request.user.id).count()
-    #     context['marking_list'] = super(QuizMarkingList, self).get_queryset().filter(complete=True).filter(course__allocated_course__lecturer__pk=self.request.user.id)
-    #     return context
     def get_queryset(self):
         if self.request.user.is_superuser:
             queryset = super(QuizMarkingList, self).get_queryset().filter(complete=True)
         else:
+            # Ids ya cargados para la petición, sin join con las asignaciones
             queryset = (
                 super(QuizMarkingList, self)
                 .get_queryset()
                 .filter(
-                    quiz__course__allocated_course__lecturer__pk=self.request.user.id
+                    quiz__course_id__in=self.request.lecturer_allocations.course_ids
                 )
                 .filter(complete=True)
             )
@@ -218,6 +310,23 @@ class QuizMarkingList(QuizMarkerMixin, SittingFilterTitleMixin, ListView):
 
         return queryset
 
+    def get_context_data(self, **kwargs):
+        page = SittingPage(self.object_list, self.request.GET.get("after"))
+        context = super(QuizMarkingList, self).get_context_data(
+            object_list=page.sittings, **kwargs
+        )
+        summaries = quiz_summaries({sitting.quiz_id for sitting in page.sittings})
+        quizzes = {sitting.quiz_id: sitting.quiz for sitting in page.sittings}
+        context["page"] = page
+        context["quiz_summaries"] = [
+            dict(summaries[quiz_id], quiz=quiz) for quiz_id, quiz in quizzes.items()
+        ]
+        # Los filtros se mantienen al pasar de página
+        filters = self.request.GET.copy()
+        filters.pop("after", None)
+        context["filters"] = filters.urlencode()
+        return context
+
 
 @method_decorator([login_required, lecturer_required], name="dispatch")
 class QuizMarkingDetail(QuizMarkerMixin, DetailView):
@@ -253,10 +362,13 @@ class QuizTake(FormView):
     def dispatch(self, request, *args, **kwargs):
         self.quiz = get_object_or_404(Quiz, slug=self.kwargs["slug"])
         self.course = get_object_or_404(Course, pk=self.kwargs["pk"])
-        quizQuestions = Question.objects.filter(quiz=self.quiz).count()
+        quizQuestions = len(get_question_bundle(self.quiz.id))
 
         if quizQuestions <= 0:
-            messages.warning(request, f"El conjunto de preguntas del examen está vacío. ¡Inténtalo más tarde!")
+            messages.warning(
+                request,
+                f"El conjunto de preguntas del examen está vacío. ¡Inténtalo más tarde!",
+            )
             return redirect("quiz:quiz_index", self.course.slug)
 
         # if self.quiz.draft and not request.user.has_perm("quiz.change_quiz"):
@@ -313,16 +425,10 @@ class QuizTake(FormView):
         return context
 
     def form_valid_user(self, form):
-        progress, _ = Progress.objects.get_or_create(user=self.request.user)
         guess = form.cleaned_data["answers"]
         is_correct = self.question.check_if_correct(guess)
 
-        if is_correct is True:
-            self.sitting.add_to_score(1)
-            progress.update_score(self.question, 1, 1)
-        else:
-            self.sitting.add_incorrect_question(self.question)
-            progress.update_score(self.question, 0, 1)
+        self.sitting.record_answer(self.question, guess, is_correct is True)
 
         if self.quiz.answers_at_end is not True:
             self.previous = {
@@ -335,9 +441,6 @@ class QuizTake(FormView):
         else:
             self.previous = {}
 
-        self.sitting.add_user_answer(self.question, guess)
-        self.sitting.remove_first_question()
-
     def final_result_user(self):
         results = {
             "course": get_object_or_404(Course, pk=self.kwargs["pk"]),
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 
-from .models import TakenCourse, Result
+from .models import TakenCourse, Result, GradeLedger, GradingScale, PdfJob
 
 
 class ScoreAdmin(admin.ModelAdmin):
@@ -19,5 +19,26 @@ class ScoreAdmin(admin.ModelAdmin):
     ]
 
 
+class GradeLedgerAdmin(admin.ModelAdmin):
+    list_display = ["student", "level", "semester", "credits", "points", "gpa"]
+
+
+class PdfJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "filename",
+        "kind",
+        "status",
+        "progress",
+        "attempts",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["kind", "status"]
+    readonly_fields = ["key", "inputs", "error"]
+
+
 admin.site.register(TakenCourse, ScoreAdmin)
 admin.site.register(Result)
+admin.site.register(GradeLedger, GradeLedgerAdmin)
+admin.site.register(GradingScale)
+admin.site.register(PdfJob, PdfJobAdmin)
@@ -3,3 +3,23 @@ from django.apps import AppConfig
 
 class ResultConfig(AppConfig):
     name = "result"
+
+    def ready(self) -> None:
+        from django.db.models.signals import pre_save, post_save, post_delete
+        from course.models import Course
+        from .models import TakenCourse
+        from .signals import (
+            pre_save_taken_course_receiver,
+            post_save_taken_course_receiver,
+            post_delete_taken_course_receiver,
+            pre_save_course_receiver,
+            post_save_course_receiver,
+        )
+
+        pre_save.connect(pre_save_taken_course_receiver, sender=TakenCourse)
+        post_save.connect(post_save_taken_course_receiver, sender=TakenCourse)
+        post_delete.connect(post_delete_taken_course_receiver, sender=TakenCourse)
+        pre_save.connect(pre_save_course_receiver, sender=Course)
+        post_save.connect(post_save_course_receiver, sender=Course)
+
+        return super().ready()
@@ -0,0 +1,100 @@
+"""
+ZIP export of many certificates at once.
+
+The certificate PDFs are rendered from their JSON inputs (see
+``result.pdf_jobs``), so rendering needs no database and runs in a pool of
+worker processes, ``PDF_EXPORT_WORKERS`` wide. A PDF already rendered by a
+PDF job for the same inputs is read from disk instead. The archive is
+written to a small buffer that is emptied after every entry and streamed
+out, so neither the archive nor more than a window of pending PDFs is ever
+held in memory.
+"""
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+
+from core.utils import StreamBuffer
+
+from .models import PdfJob
+from .pdf_jobs import job_key, certificate_inputs, inputs_as_json
+from .pdf import render_certificate
+
+
+def certificate_pdf(inputs):
+    """Certificate PDF bytes; runs in the export worker processes."""
+    out = BytesIO()
+    render_certificate(inputs, out)
+    return out.getvalue()
+
+
+def cached_pdf(inputs):
+    path = os.path.join(
+        settings.MEDIA_ROOT,
+        "pdf_jobs",
+        PdfJob.CERTIFICATE,
+        f"{job_key(PdfJob.CERTIFICATE, inputs)}.pdf",
+    )
+    if os.path.exists(path):
+        with open(path, "rb") as pdf:
+            return pdf.read()
+    return None
+
+
+def entry_name(inputs):
+    name = f"{inputs['username']}_{inputs['course_code']}_{inputs['serial_number']}.pdf"
+    return name.replace("/", "-")
+
+
+def rendered_pdfs(documents, workers):
+    """(name, PDF bytes) for each of ``documents``, in order."""
+    if workers < 1:
+        for inputs in documents:
+            yield entry_name(inputs), cached_pdf(inputs) or certificate_pdf(inputs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        pending = deque()
+        for inputs in documents:
+            pdf = cached_pdf(inputs)
+            pending.append(
+                (
+                    inputs,
+                    pdf if pdf is not None else pool.submit(certificate_pdf, inputs),
+                )
+            )
+            # Keep at most a couple of PDFs per worker in flight
+            while len(pending) > workers * 2:
+                yield finished(*pending.popleft())
+        while pending:
+            yield finished(*pending.popleft())
+
+
+def finished(inputs, pdf):
+    return entry_name(inputs), pdf if isinstance(pdf, bytes) else pdf.result()
+
+
+def certificate_zip(certificates, workers=None):
+    """Generator of ZIP archive chunks with a PDF for each certificate.
+
+    ``certificates`` need ``taken_course__student__student`` and
+    ``taken_course__course`` selected.
+    """
+    if workers is None:
+        workers = getattr(settings, "PDF_EXPORT_WORKERS", 2)
+    documents = [
+        inputs_as_json(certificate_inputs(certificate.taken_course, certificate))
+        for certificate in certificates
+    ]
+
+    stream = StreamBuffer()
+    # PDFs are compressed already, deflating them again is wasted work
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for name, pdf in rendered_pdfs(documents, workers):
+            archive.writestr(name, pdf)
+            yield stream.pop()
+    yield stream.pop()
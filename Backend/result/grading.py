@@ -0,0 +1,283 @@
+"""
+Grading helpers shared by score entry, regrading and GPA recomputation.
+
+``GradeTable`` turns weighted totals into grades and points with a bisect
+lookup, or for a whole array of totals at once with NumPy when available.
+``ScoreSheet`` applies a lecturer's score sheet to a whole course roster in
+a fixed number of queries: one to load the roster, one for the grading
+scale, one ``bulk_update`` for the scores, two for the grade ledger and a
+couple more for the certificates of students that passed.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib import messages
+from django.db import transaction
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the scalar lookup is used instead
+    np = None
+
+from .models import (
+    TakenCourse,
+    Certificate,
+    GradeLedger,
+    GradingScale,
+    PASS,
+    FAIL,
+    F,
+    NG,
+    ledger_key,
+)
+
+SCORE_FIELDS = ("assignment", "mid_exam", "quiz", "attendance", "final_exam")
+
+# Assignment 20%, Mid 25%, Quiz 15%, Attendance 10%, Final 30%
+SCORE_WEIGHTS = {
+    "assignment": 0.20,
+    "mid_exam": 0.25,
+    "quiz": 0.15,
+    "attendance": 0.10,
+    "final_exam": 0.30,
+}
+
+
+def round_score(score_str):
+    """Convert score to float and round to nearest integer if it has decimals"""
+    if not score_str:
+        return ""
+    try:
+        return str(round(float(score_str)))
+    except (ValueError, TypeError):
+        return ""
+
+
+def weighted_total(scores):
+    total = 0.0
+    for field in SCORE_FIELDS:
+        try:
+            total += float(scores.get(field) or 0) * SCORE_WEIGHTS[field]
+        except (ValueError, TypeError):
+            pass
+    return round(total, 2)
+
+
+class GradeTable:
+    """Immutable grade lookup built from ``{"min", "grade", "point"}`` bands.
+
+    A total belongs to the band with the highest ``min`` not above it;
+    totals below every band get an F worth no points.
+    """
+
+    def __init__(self, bands):
+        rows = sorted(
+            (float(band["min"]), band["grade"], float(band["point"])) for band in bands
+        )
+        if not rows:
+            raise ValueError("A grading scale needs at least one band.")
+        self.boundaries = tuple(row[0] for row in rows)
+        self.grades = tuple(row[1] for row in rows)
+        self.weights = tuple(row[2] for row in rows)
+        self.weight_by_grade = dict(zip(self.grades, self.weights))
+
+        if np is not None:
+            self._np_boundaries = np.array(self.boundaries)
+            # Index -1 (below the lowest band) lands on the trailing F entry
+            self._np_grades = np.array(self.grades + (F,), dtype=object)
+            self._np_weights = np.array(self.weights + (0.0,))
+
+    def grade(self, total):
+        index = bisect_right(self.boundaries, float(total)) - 1
+        return self.grades[index] if index >= 0 else F
+
+    def weight(self, grade):
+        return self.weight_by_grade.get(grade, 0)
+
+    @staticmethod
+    def comment(grade):
+        return FAIL if grade in (F, NG) else PASS
+
+    def grade_many(self, totals, credits):
+        """Grade a whole array of totals in one call.
+
+        Returns ``(grades, points)`` lists, where each point is the course
+        credit times the weight of the grade, rounded to two decimals.
+        """
+        if np is None:
+            grades = [self.grade(total) for total in totals]
+            points = [
+                round(int(credit or 0) * self.weight(grade), 2)
+                for grade, credit in zip(grades, credits)
+            ]
+            return grades, points
+
+        index = (
+            np.searchsorted(
+                self._np_boundaries, np.asarray(totals, dtype=float), side="right"
+            )
+            - 1
+        )
+        credits = np.asarray([credit or 0 for credit in credits], dtype=float)
+        points = np.round(credits * self._np_weights[index], 2)
+        return self._np_grades[index].tolist(), points.tolist()
+
+
+def regrade(queryset, batch_size=1000):
+    """Recompute grade, comment and point of every TakenCourse in
+    ``queryset`` from its stored total, keeping the grade ledger in step.
+    Returns the number of rows that changed."""
+    by_program = defaultdict(list)
+    for taken_course in queryset.select_related("course").iterator(
+        chunk_size=batch_size
+    ):
+        by_program[taken_course.course.program_id].append(taken_course)
+
+    changed = []
+    ledger_deltas = defaultdict(lambda: (0, Decimal("0")))
+    for program_id, rows in by_program.items():
+        table = GradingScale.objects.table_for(program_id)
+        grades, points = table.grade_many(
+            [row.total for row in rows], [row.course.credit for row in rows]
+        )
+        for row, grade, point in zip(rows, grades, points):
+            point = Decimal(str(point))
+            comment = table.comment(grade)
+            if (row.grade, row.comment, row.point) == (grade, comment, point):
+                continue
+            key = ledger_key(row)
+            credits, delta = ledger_deltas[key]
+            ledger_deltas[key] = (credits, delta + point - row.point)
+            row.grade, row.comment, row.point = grade, comment, point
+            row._ledger_point = point
+            changed.append(row)
+
+    with transaction.atomic():
+        TakenCourse.objects.bulk_update(
+            changed, fields=["grade", "comment", "point"], batch_size=batch_size
+        )
+        GradeLedger.objects.apply_deltas(dict(ledger_deltas))
+    return len(changed)
+
+
+def submitted_student_ids(data):
+    """Student (user) ids present in the posted score sheet, in form order."""
+    student_ids = []
+    for key in data.keys():
+        if key.startswith("assignment_"):
+            student_id = key.replace("assignment_", "")
+            if student_id not in student_ids:
+                student_ids.append(student_id)
+    return student_ids
+
+
+class ScoreSheet:
+    """Applies a posted score sheet to every enrolled student of a course.
+
+    ``messages`` collects ``(level, text)`` pairs, one per submitted row,
+    so the view can report them with ``django.contrib.messages``.
+    """
+
+    def __init__(self, course_id, lecturer, data):
+        self.course_id = course_id
+        self.lecturer = lecturer
+        self.data = data
+        self.messages = []
+        self.updated = []
+        self.ledger_deltas = {}
+
+    def load_roster(self, student_ids):
+        """Map student user id -> TakenCourse in a single query."""
+        numeric_ids = [int(sid) for sid in student_ids if str(sid).isdigit()]
+        roster = TakenCourse.objects.filter(
+            course__id=self.course_id,
+            student__student__id__in=numeric_ids,
+            course__allocated_course__lecturer__pk=self.lecturer.pk,
+        ).select_related("course", "student__student")
+        return {str(tc.student.student_id): tc for tc in roster}
+
+    @transaction.atomic
+    def apply(self):
+        student_ids = submitted_student_ids(self.data)
+        roster = self.load_roster(student_ids)
+
+        for student_id in student_ids:
+            taken_course = roster.get(student_id)
+            if taken_course is None:
+                self.messages.append(
+                    (
+                        messages.ERROR,
+                        f"No se encontró el registro del estudiante con ID {student_id}",
+                    )
+                )
+                continue
+            self.apply_row(student_id, taken_course)
+
+        if self.updated:
+            self.grade_rows()
+            TakenCourse.objects.bulk_update(
+                self.updated,
+                fields=[*SCORE_FIELDS, "total", "grade", "point", "comment"],
+            )
+            GradeLedger.objects.apply_deltas(self.ledger_deltas)
+            self.issue_certificates([tc for tc in self.updated if tc.comment == PASS])
+        return self
+
+    def grade_rows(self):
+        """Grade every updated row with one vectorised lookup."""
+        rows = self.updated
+        table = GradingScale.objects.table_for(rows[0].course.program_id)
+        grades, points = table.grade_many(
+            [row.total for row in rows], [row.course.credit for row in rows]
+        )
+        for row, grade, point in zip(rows, grades, points):
+            previous_point = row.point or Decimal("0")
+            row.grade = grade
+            row.comment = table.comment(grade)
+            row.point = Decimal(str(point))
+            row._ledger_point = row.point
+
+            key = ledger_key(row)
+            credits, delta = self.ledger_deltas.get(key, (0, Decimal("0")))
+            self.ledger_deltas[key] = (credits, delta + row.point - previous_point)
+
+    def apply_row(self, student_id, taken_course):
+        full_name = taken_course.student.student.get_full_name
+        original = {
+            field: self.data.get(f"{field}_{student_id}", "") for field in SCORE_FIELDS
+        }
+        rounded = {field: round_score(value) for field, value in original.items()}
+
+        if not any(rounded.values()):
+            self.messages.append(
+                (
+                    messages.WARNING,
+                    f"No se proporcionaron calificaciones para {full_name}",
+                )
+            )
+            return
+
+        for field, value in rounded.items():
+            if value:
+                setattr(taken_course, field, Decimal(value))
+
+        taken_course.total = Decimal(str(weighted_total(rounded)))
+        self.updated.append(taken_course)
+
+        was_rounded = any(
+            original[field]
+            and rounded[field]
+            and str(original[field]) != rounded[field]
+            for field in SCORE_FIELDS
+        )
+        if was_rounded:
+            text = f"Calificaciones actualizadas para {full_name} (valores decimales redondeados automáticamente)"
+        else:
+            text = f"Calificaciones actualizadas para {full_name}"
+        self.messages.append((messages.SUCCESS, text))
+
+    def issue_certificates(self, passed):
+        """Create missing certificates in one ``bulk_create`` and claim the
+        orphan ones (``issued_by`` empty) for the current lecturer."""
+        Certificate.objects.issue(passed, issued_by=self.lecturer, claim_orphans=True)
@@ -0,0 +1,94 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+
+from result.models import PdfJob
+from result.pdf_jobs import RENDERERS
+
+
+def result_sheet_inputs(students):
+    rows = [
+        {
+            "username": f"ugr-2026-{i}",
+            "full_name": f"student number {i}",
+            "total": f"{40 + i % 60}.00",
+            "grade": "A" if i % 7 else "F",
+            "point": "12.00" if i % 7 else "0.00",
+            "comment": "PASS" if i % 7 else "FAIL",
+            "failed": not i % 7,
+        }
+        for i in range(students)
+    ]
+    return {
+        "course_id": 1,
+        "level": "Bachelor",
+        "semester": "First",
+        "session": "2026/2027",
+        "lecturer": "Benchmark Lecturer",
+        "rows": rows,
+        "passed": sum(row["comment"] == "PASS" for row in rows),
+        "failed": sum(row["comment"] == "FAIL" for row in rows),
+    }
+
+
+def certificate_inputs():
+    return {
+        "taken_course_id": 1,
+        "full_name": "Benchmark Student",
+        "username": "ugr-2026-1",
+        "course_title": "Algorithms",
+        "course_code": "CS101",
+        "total": "80.00",
+        "comment": "PASS",
+        "duration": "40 horas",
+        "serial_number": "CERT-BENCHMARK",
+        "issued_at": "01/01/2026",
+    }
+
+
+class Command(BaseCommand):
+    help = "Time the PDF renderers on synthetic documents (no database needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=[PdfJob.RESULT_SHEET, PdfJob.CERTIFICATE],
+            default=PdfJob.RESULT_SHEET,
+        )
+        parser.add_argument(
+            "--students",
+            type=int,
+            default=200,
+            help="Rows of the result sheet.",
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        kind = options["kind"]
+        if kind == PdfJob.RESULT_SHEET:
+            inputs = result_sheet_inputs(options["students"])
+        else:
+            inputs = certificate_inputs()
+        render = RENDERERS[kind]
+
+        # The first document pays for imports and process-wide resources
+        start = time.perf_counter()
+        out = BytesIO()
+        render(inputs, out)
+        first = time.perf_counter() - start
+
+        timings = []
+        for _ in range(options["repeat"]):
+            out = BytesIO()
+            start = time.perf_counter()
+            render(inputs, out)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        self.stdout.write(
+            f"{kind}: first {first * 1000:.1f} ms, "
+            f"median {timings[len(timings) // 2] * 1000:.1f} ms, "
+            f"best {timings[0] * 1000:.1f} ms over {len(timings)} runs, "
+            f"{len(out.getvalue()) // 1024} KiB"
+        )
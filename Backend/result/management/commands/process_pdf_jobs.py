@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from result.pdf_jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF jobs (result sheets, certificates, registration forms)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Render what is queued now and exit instead of polling.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Exit after rendering this many jobs.",
+        )
+
+    def handle(self, *args, **options):
+        rendered = 0
+        while True:
+            limit = options["limit"]
+            ran = run_pending(None if limit is None else limit - rendered)
+            rendered += ran
+            if ran:
+                self.stdout.write(f"Rendered {ran} PDF job(s).")
+            if options["once"] or (limit is not None and rendered >= limit):
+                break
+            if not ran:
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Done, {rendered} PDF job(s) rendered."))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from result.grading import regrade
+from result.models import GradeLedger, TakenCourse
+
+
+class Command(BaseCommand):
+    help = "Rebuild the GPA/CGPA grade ledger from TakenCourse, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rows that differ from TakenCourse, without writing.",
+        )
+        parser.add_argument(
+            "--regrade",
+            action="store_true",
+            help="Recompute grades and points from the totals with the grading scales first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["regrade"] and not options["check"]:
+            changed = regrade(TakenCourse.objects.all())
+            self.stdout.write(f"Regraded {changed} course result(s).")
+
+        expected = GradeLedger.objects.expected_rows()
+
+        if options["check"]:
+            current = {
+                (row.student_id, row.level, row.semester): (row.credits, row.points)
+                for row in GradeLedger.objects.all()
+            }
+            drift = 0
+            for key in sorted(set(expected) | set(current), key=str):
+                want = expected.get(key, (0, 0))
+                have = current.get(key, (0, 0))
+                if want[0] != have[0] or want[1] != have[1]:
+                    drift += 1
+                    self.stdout.write(
+                        f"student={key[0]} level={key[1]!r} semester={key[2]!r}: "
+                        f"ledger={have[0]} credits/{have[1]} points, "
+                        f"expected={want[0]} credits/{want[1]} points"
+                    )
+            if drift:
+                raise CommandError(f"{drift} ledger row(s) drifted from TakenCourse.")
+            self.stdout.write(self.style.SUCCESS("Grade ledger is consistent."))
+            return
+
+        with transaction.atomic():
+            GradeLedger.objects.all().delete()
+            GradeLedger.objects.bulk_create(
+                [
+                    GradeLedger(
+                        student_id=student_id,
+                        level=level,
+                        semester=semester,
+                        credits=credits,
+                        points=points,
+                    )
+                    for (student_id, level, semester), (
+                        credits,
+                        points,
+                    ) in expected.items()
+                ],
+                batch_size=1000,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt grade ledger with {len(expected)} row(s).")
+        )
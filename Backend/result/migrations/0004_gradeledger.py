@@ -0,0 +1,61 @@
+# Generated by Django 4.0.8 on 2026-10-18 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def build_grade_ledger(apps, schema_editor):
+    TakenCourse = apps.get_model("result", "TakenCourse")
+    GradeLedger = apps.get_model("result", "GradeLedger")
+
+    totals = {}
+    rows = (
+        TakenCourse.objects.values("student_id", "course__level", "course__semester")
+        .annotate(credits=Sum("course__credit"), points=Sum("point"))
+        .order_by()
+    )
+    for row in rows:
+        key = (row["student_id"], row["course__level"] or "", row["course__semester"])
+        credits, points = totals.get(key, (0, 0))
+        totals[key] = (credits + (row["credits"] or 0), points + (row["points"] or 0))
+
+    GradeLedger.objects.bulk_create(
+        [
+            GradeLedger(
+                student_id=student_id,
+                level=level,
+                semester=semester,
+                credits=credits,
+                points=points,
+            )
+            for (student_id, level, semester), (credits, points) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_parent_relation_ship_alter_student_level_and_more'),
+        ('result', '0003_certificate_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(blank=True, default='', max_length=25)),
+                ('semester', models.CharField(blank=True, default='', max_length=200)),
+                ('credits', models.IntegerField(default=0)),
+                ('points', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.student')),
+            ],
+            options={
+                'unique_together': {('student', 'level', 'semester')},
+            },
+        ),
+        migrations.RunPython(build_grade_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.8 on 2026-10-18 06:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import result.models
+
+# The grades add_score_for gave before grading scales existed
+DEFAULT_BANDS = [
+    {"min": 80, "grade": "A", "point": 4},
+    {"min": 70, "grade": "B", "point": 3},
+    {"min": 60, "grade": "C", "point": 2},
+    {"min": 50, "grade": "D", "point": 1},
+    {"min": 0, "grade": "F", "point": 0},
+]
+
+
+def seed_default_scale(apps, schema_editor):
+    GradingScale = apps.get_model("result", "GradingScale")
+    GradingScale.objects.create(program=None, bands=DEFAULT_BANDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0009_alter_lessonblock_background_color_and_more'),
+        ('result', '0004_gradeledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bands', models.JSONField(default=result.models.default_grade_bands)),
+                ('program', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grading_scale', to='course.program')),
+            ],
+        ),
+        migrations.RunPython(seed_default_scale, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.0.8 on 2026-10-18 06:46
+
+from django.db import migrations
+from django.db.models import Count, F
+
+
+def drop_duplicate_enrollments(apps, schema_editor):
+    """Keep one TakenCourse per student and course (the one with the highest
+    total) and take the others out of the ledger and the course counter."""
+    TakenCourse = apps.get_model("result", "TakenCourse")
+    GradeLedger = apps.get_model("result", "GradeLedger")
+    Course = apps.get_model("course", "Course")
+
+    duplicated = (
+        TakenCourse.objects.values("student_id", "course_id")
+        .annotate(rows=Count("pk"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for pair in duplicated:
+        rows = list(
+            TakenCourse.objects.filter(
+                student_id=pair["student_id"], course_id=pair["course_id"]
+            )
+            .select_related("course")
+            .order_by("-total", "pk")
+        )
+        for row in rows[1:]:
+            GradeLedger.objects.filter(
+                student_id=row.student_id,
+                level=row.course.level or "",
+                semester=row.course.semester,
+            ).update(
+                credits=F("credits") - (row.course.credit or 0),
+                points=F("points") - row.point,
+            )
+            row.delete()
+        Course.objects.filter(pk=pair["course_id"]).update(
+            enrolled_count=F("enrolled_count") - (len(rows) - 1)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_parent_relation_ship_alter_student_level_and_more'),
+        ('course', '0010_course_enrolled_count'),
+        ('result', '0005_gradingscale'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='takencourse',
+            unique_together={('student', 'course')},
+        ),
+    ]
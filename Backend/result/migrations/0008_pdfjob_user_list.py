@@ -0,0 +1,23 @@
+# Generated by Django 4.0.8 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('result', '0007_pdfjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfjob',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='pdfjob',
+            name='kind',
+            field=models.CharField(choices=[('result_sheet', 'Result sheet'), ('certificate', 'Certificate'), ('registration_form', 'Registration form'), ('user_list', 'Student or lecturer list')], max_length=30),
+        ),
+    ]
@@ -1,12 +1,15 @@
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+import os
 import uuid
+from decimal import Decimal
 from django.urls import reverse
 
 from accounts.models import Student
-from core.models import Semester
-from course.models import Course
+from core.academic_period import get_current_period
+from course.models import Course, Program
 
 YEARS = (
     (1, "1"),
@@ -74,6 +77,70 @@ COMMENT = (
 )
 
 
+def default_grade_bands():
+    """The grades ``add_score_for`` has always given: A from 80, B from 70,
+    C from 60, D from 50 (the pass mark) and F below."""
+    return [
+        {"min": 80, "grade": A, "point": 4},
+        {"min": 70, "grade": B, "point": 3},
+        {"min": 60, "grade": C, "point": 2},
+        {"min": 50, "grade": D, "point": 1},
+        {"min": 0, "grade": F, "point": 0},
+    ]
+
+
+class GradingScaleManager(models.Manager):
+    def table_for(self, program_id=None):
+        """The GradeTable of a program, falling back to the scale without a
+        program and then to ``default_grade_bands``."""
+        from .grading import GradeTable
+
+        scale = (
+            self.filter(
+                models.Q(program_id=program_id) | models.Q(program__isnull=True)
+            )
+            .order_by(models.F("program_id").asc(nulls_last=True))
+            .first()
+        )
+        return GradeTable(scale.bands if scale else default_grade_bands())
+
+
+class GradingScale(models.Model):
+    """Grade boundaries and point weights, optionally per program.
+
+    ``bands`` is a list of ``{"min": total, "grade": grade, "point": weight}``.
+    The scale without a program is the default for every other program.
+    """
+
+    program = models.OneToOneField(
+        Program,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="grading_scale",
+    )
+    bands = models.JSONField(default=default_grade_bands)
+
+    objects = GradingScaleManager()
+
+    def __str__(self):
+        return str(self.program) if self.program else "Default grading scale"
+
+    def clean(self):
+        from .grading import GradeTable
+
+        grades = dict(GRADE)
+        try:
+            GradeTable(self.bands)
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                {"bands": "Each band needs numeric 'min' and 'point' and a 'grade'."}
+            )
+        for band in self.bands:
+            if band["grade"] not in grades:
+                raise ValidationError({"bands": f"Unknown grade {band['grade']}."})
+
+
 class TakenCourseManager(models.Manager):
     def new(self, user=None):
         user_obj = None
@@ -98,6 +165,9 @@ class TakenCourse(models.Model):
     point = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
     comment = models.CharField(choices=COMMENT, max_length=200, blank=True)
 
+    class Meta:
+        unique_together = ["student", "course"]
+
     def get_absolute_url(self):
         return reverse("course_detail", kwargs={"slug": self.course.slug})
 
@@ -114,176 +184,53 @@ class TakenCourse(models.Model):
             + float(final_exam)
         )
 
-    # @staticmethod
     def get_grade(self, total):
-        # total = float(assignment) + float(mid_exam) + float(quiz) + float(attendance) + float(final_exam)
-        # total = self.get_total(assignment=assignment, mid_exam=mid_exam, quiz=quiz, attendance=attendance, final_exam=final_exam)
-        # total = total
-        if total >= 90:
-            grade = A_PLUS
-        elif total >= 85:
-            grade = A
-        elif total >= 80:
-            grade = A_MINUS
-        elif total >= 75:
-            grade = B_PLUS
-        elif total >= 70:
-            grade = B
-        elif total >= 65:
-            grade = B_MINUS
-        elif total >= 60:
-            grade = C_PLUS
-        elif total >= 55:
-            grade = C
-        elif total >= 50:
-            grade = C_MINUS
-        elif total >= 45:
-            grade = D
-        elif total < 45:
-            grade = F
-        else:
-            grade = NG
-        return grade
+        return GradingScale.objects.table_for(self.course.program_id).grade(total)
 
-    # @staticmethod
     def get_comment(self, grade):
-        if grade == F or grade == NG:
-            comment = FAIL
-        # elif grade == NG:
-        #     comment = FAIL
-        else:
-            comment = PASS
-        return comment
+        from .grading import GradeTable
+
+        return GradeTable.comment(grade)
 
     def get_point(self, grade):
-        p = 0
-        # point = 0
-        # for i in student:
-        credit = self.course.credit
-        if self.grade == A_PLUS:
-            point = 4
-        elif self.grade == A:
-            point = 4
-        elif self.grade == A_MINUS:
-            point = 3.75
-        elif self.grade == B_PLUS:
-            point = 3.5
-        elif self.grade == B:
-            point = 3
-        elif self.grade == B_MINUS:
-            point = 2.75
-        elif self.grade == C_PLUS:
-            point = 2.5
-        elif self.grade == C:
-            point = 2
-        elif self.grade == C_MINUS:
-            point = 1.75
-        elif self.grade == D:
-            point = 1
-        else:
-            point = 0
-        p += int(credit) * point
-        return p
-
-    def calculate_gpa(self, total_credit_in_semester):
-        current_semester = Semester.objects.filter(is_current_semester=True).first()
+        table = GradingScale.objects.table_for(self.course.program_id)
+        return int(self.course.credit or 0) * table.weight(grade)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored point, student and course so the grade ledger
+        # can apply deltas
+        if "point" in instance.__dict__:
+            instance._ledger_point = instance.point
+        if "student_id" in instance.__dict__ and "course_id" in instance.__dict__:
+            instance._ledger_owner = (instance.student_id, instance.course_id)
+        return instance
+
+    def calculate_gpa(self, total_credit_in_semester=None):
+        current_semester = get_current_period().semester
         if not current_semester:
             return 0
-        
-        student = TakenCourse.objects.filter(
+
+        entry = GradeLedger.objects.filter(
             student=self.student,
-            course__level=self.student.level,
-            course__semester=current_semester,
-        )
-        p = 0
-        point = 0
-        for i in student:
-            credit = i.course.credit
-            if i.grade == A_PLUS:
-                point = 4
-            elif i.grade == A:
-                point = 4
-            elif i.grade == A_MINUS:
-                point = 3.75
-            elif i.grade == B_PLUS:
-                point = 3.5
-            elif i.grade == B:
-                point = 3
-            elif i.grade == B_MINUS:
-                point = 2.75
-            elif i.grade == C_PLUS:
-                point = 2.5
-            elif i.grade == C:
-                point = 2
-            elif i.grade == C_MINUS:
-                point = 1.75
-            elif i.grade == D:
-                point = 1
-            else:
-                point = 0
-            p += int(credit) * point
+            level=self.student.level or "",
+            semester=current_semester.semester,
+        ).first()
+        if entry is None:
+            return 0
+        credits = total_credit_in_semester or entry.credits
         try:
-            gpa = p / total_credit_in_semester
-            return round(gpa, 2)
+            return round(float(entry.points) / credits, 2)
         except ZeroDivisionError:
             return 0
 
     def calculate_cgpa(self):
-        current_semester = Semester.objects.filter(is_current_semester=True).first()
+        current_semester = get_current_period().semester
         if not current_semester:
             return 0
-        
-        previousResult = Result.objects.filter(
-            student__id=self.student.id, level__lt=self.student.level
-        )
-        previous_cgpa = 0
-        for i in previousResult:
-            if i.cgpa is not None:
-                previous_cgpa += i.cgpa
-        cgpa = 0
-        if str(current_semester) == SECOND:
-            first_sem_gpa = 0.0
-            sec_sem_gpa = 0.0
-            try:
-                first_sem_result = Result.objects.get(
-                    student=self.student.id, semester=FIRST, level=self.student.level
-                )
-                first_sem_gpa += first_sem_result.gpa
-            except:
-                first_sem_gpa = 0
-
-            try:
-                sec_sem_result = Result.objects.get(
-                    student=self.student.id, semester=SECOND, level=self.student.level
-                )
-                sec_sem_gpa += sec_sem_result.gpa
-            except:
-                sec_sem_gpa = 0
-
-            taken_courses = TakenCourse.objects.filter(
-                student=self.student, student__level=self.student.level
-            )
-            taken_course_credits = 0
-            taken_course_points = 0
-            for i in taken_courses:
-                taken_course_points += float(i.point)
-            for i in taken_courses:
-                taken_course_credits += int(i.course.credit)
-            # cgpa = (first_sem_gpa + sec_sem_gpa) / 2
-
-            print("taken_course_points = ", taken_course_points)
-            print("taken_course_credits = ", taken_course_credits)
-            print("first_sem_gpa = ", first_sem_gpa)
-            print("sec_sem_gpa = ", sec_sem_gpa)
-            print("cgpa = ", round(taken_course_points / taken_course_credits, 2))
 
-            try:
-                cgpa = taken_course_points / taken_course_credits
-                return round(cgpa, 2)
-            except ZeroDivisionError:
-                return 0
-
-            # return round(cgpa, 2)
+        return GradeLedger.objects.cgpa(self.student)
 
 
 class Result(models.Model):
@@ -295,6 +242,48 @@ class Result(models.Model):
     level = models.CharField(max_length=25, choices=LEVEL, null=True)
 
 
+class CertificateManager(models.Manager):
+    def issue(self, taken_courses, issued_by=None, reissue=False, claim_orphans=False):
+        """Issue certificates for ``taken_courses`` in a fixed number of queries.
+
+        Existing certificates are found with one query and the missing ones
+        created with one ``bulk_create``. With ``reissue`` the existing ones
+        get a new serial number and ``issued_by`` (one ``bulk_update``); with
+        ``claim_orphans`` only those without ``issued_by`` are given one.
+        Returns the number of certificates created or reissued.
+        """
+        taken_courses = list(taken_courses)
+        if not taken_courses:
+            return 0
+        existing = list(self.filter(taken_course__in=taken_courses))
+        have = {certificate.taken_course_id for certificate in existing}
+
+        if reissue:
+            for certificate in existing:
+                certificate.serial_number = self.model.generate_serial()
+                certificate.issued_by = issued_by
+            self.bulk_update(existing, ["serial_number", "issued_by"])
+        elif claim_orphans and issued_by is not None:
+            self.filter(
+                pk__in=[c.pk for c in existing if c.issued_by_id is None]
+            ).update(issued_by=issued_by)
+
+        created = self.bulk_create(
+            [
+                self.model(
+                    taken_course=tc,
+                    serial_number=self.model.generate_serial(),
+                    issued_by=issued_by,
+                )
+                for tc in taken_courses
+                if tc.pk not in have
+            ],
+            # Another request may have issued some in the meantime
+            ignore_conflicts=True,
+        )
+        return len(created) + (len(existing) if reissue else 0)
+
+
 class Certificate(models.Model):
     """Emisión de certificados para cursos aprobados.
 
@@ -312,9 +301,204 @@ class Certificate(models.Model):
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
 
+    objects = CertificateManager()
+
     def __str__(self):
         return f"Certificate {self.serial_number} - {self.taken_course}"
 
     @staticmethod
     def generate_serial():
         return f"CERT-{uuid.uuid4().hex[:12].upper()}"
+
+
+class PdfJob(models.Model):
+    """A PDF rendered in the background by ``manage.py process_pdf_jobs``.
+
+    Jobs are content-addressed: ``key`` is a digest of everything that goes
+    into the document (see ``result.pdf_jobs``), so asking for the same
+    document twice reuses the job and its file, and any change to the
+    inputs gives a new key.
+    """
+
+    RESULT_SHEET = "result_sheet"
+    CERTIFICATE = "certificate"
+    REGISTRATION_FORM = "registration_form"
+    USER_LIST = "user_list"
+    KIND_CHOICES = (
+        (RESULT_SHEET, "Result sheet"),
+        (CERTIFICATE, "Certificate"),
+        (REGISTRATION_FORM, "Registration form"),
+        (USER_LIST, "Student or lecturer list"),
+    )
+
+    # Output formats; everything but the list exports is a PDF
+    CONTENT_TYPES = {
+        "pdf": "application/pdf",
+        "csv": "text/csv",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    inputs = models.JSONField()
+    filename = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Percent done, reported by the renderers that work in chunks
+    progress = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"{self.kind} {self.key[:12]} ({self.status})"
+
+    @property
+    def format(self):
+        return self.inputs.get("format", "pdf")
+
+    @property
+    def content_type(self):
+        return self.CONTENT_TYPES[self.format]
+
+    @property
+    def path(self):
+        return os.path.join(
+            settings.MEDIA_ROOT, "pdf_jobs", self.kind, f"{self.key}.{self.format}"
+        )
+
+    @property
+    def is_ready(self):
+        return self.status == self.DONE and os.path.exists(self.path)
+
+
+class GradeLedgerManager(models.Manager):
+    def apply_deltas(self, deltas, create=True):
+        """Add credit/point deltas to the ledger in a fixed number of queries.
+
+        ``deltas`` maps ``(student_id, level, semester)`` to ``(credits, points)``.
+        Missing rows are created first unless ``create`` is False (used on
+        deletes, where the student itself may be going away).
+        """
+        deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+        if not deltas:
+            return
+        if create:
+            self.bulk_create(
+                [
+                    self.model(student_id=student_id, level=level, semester=semester)
+                    for student_id, level, semester in deltas
+                ],
+                ignore_conflicts=True,
+            )
+
+        lookup = models.Q()
+        credit_cases = []
+        point_cases = []
+        for (student_id, level, semester), (credits, points) in deltas.items():
+            condition = models.Q(student_id=student_id, level=level, semester=semester)
+            lookup |= condition
+            credit_cases.append(models.When(condition, then=models.Value(int(credits))))
+            point_cases.append(
+                models.When(condition, then=models.Value(Decimal(str(points))))
+            )
+
+        self.filter(lookup).update(
+            credits=models.F("credits")
+            + models.Case(
+                *credit_cases,
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            ),
+            points=models.F("points")
+            + models.Case(
+                *point_cases,
+                default=models.Value(Decimal("0")),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+    def cgpa(self, student):
+        totals = self.filter(student=student).aggregate(
+            credits=models.Sum("credits"), points=models.Sum("points")
+        )
+        if not totals["credits"]:
+            return 0
+        return round(float(totals["points"]) / totals["credits"], 2)
+
+    def expected_rows(self):
+        """Ledger totals recomputed from scratch out of TakenCourse."""
+        rows = (
+            TakenCourse.objects.values(
+                "student_id", "course__level", "course__semester"
+            )
+            .annotate(credits=models.Sum("course__credit"), points=models.Sum("point"))
+            .order_by()
+        )
+        totals = {}
+        for row in rows:
+            key = (
+                row["student_id"],
+                row["course__level"] or "",
+                row["course__semester"],
+            )
+            credits, points = totals.get(key, (0, Decimal("0")))
+            totals[key] = (
+                credits + (row["credits"] or 0),
+                points + (row["points"] or Decimal("0")),
+            )
+        return totals
+
+
+class GradeLedger(models.Model):
+    """Per-student, per-level, per-semester credit and point sums.
+
+    Kept up to date incrementally from TakenCourse changes, and from changes
+    to the credit, level or semester of a Course, so GPA and CGPA are
+    single-row reads. ``manage.py rebuild_grade_ledger`` rebuilds it.
+    """
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    level = models.CharField(max_length=25, blank=True, default="")
+    semester = models.CharField(max_length=200, blank=True, default="")
+    credits = models.IntegerField(default=0)
+    points = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    objects = GradeLedgerManager()
+
+    class Meta:
+        unique_together = ["student", "level", "semester"]
+
+    def __str__(self):
+        return f"{self.student} - {self.level} {self.semester}"
+
+    @property
+    def gpa(self):
+        if not self.credits:
+            return 0
+        return round(float(self.points) / self.credits, 2)
+
+
+def ledger_key(taken_course):
+    course = taken_course.course
+    return (taken_course.student_id, course.level or "", course.semester)
@@ -0,0 +1,545 @@
+"""
+ReportLab rendering of result sheets, certificates and registration forms.
+
+Everything the documents share is built once per process and only read
+afterwards: the paragraph styles (``STYLES``) and table styles at import,
+the logos and the certificate background on first use (``image``), already
+decoded and scaled down to the size they are drawn at. The documents only
+use the standard PDF fonts (Helvetica), which need no registration.
+``Letterhead`` is the page template of the flowing documents and draws
+their images straight on the first page.
+
+Each renderer takes the JSON ``inputs`` collected by the view (see
+``result.pdf_jobs``) and a path or file object to write to, and never
+touches the database. ``manage.py benchmark_pdf`` times them.
+"""
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+from io import BytesIO
+from types import MappingProxyType
+
+from django.conf import settings
+from PIL import Image as PILImage
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfgen import canvas as rl_canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import FIRST, SECOND
+
+cm = 2.54
+
+# Resolution images are scaled down to for the box they are drawn in
+IMAGE_DPI = 200
+
+
+@contextmanager
+def binary_streams():
+    """Write the streams of the documents built inside as binary instead of
+    ASCII85 text, whose pure Python encoder took most of the time of the
+    documents with images. ReportLab reads the global ``rl_config.useA85``
+    as it writes, so it is set for the block and restored after it."""
+    previous = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = previous
+
+
+# Styles
+
+
+def _style(name, **attributes):
+    return ParagraphStyle(name, parent=_SAMPLE["Normal"], **attributes)
+
+
+_SAMPLE = getSampleStyleSheet()
+
+STYLES = MappingProxyType(
+    {
+        "body": _SAMPLE["Normal"],
+        "body_right": _style("body_right", alignment=TA_RIGHT),
+        "sheet_title": _style(
+            "sheet_title",
+            alignment=TA_CENTER,
+            fontName="Helvetica",
+            fontSize=12,
+            leading=15,
+        ),
+        "sheet_subtitle": _style(
+            "sheet_subtitle",
+            alignment=TA_CENTER,
+            fontName="Helvetica",
+            fontSize=10,
+            leading=15,
+        ),
+        "form_title": _style(
+            "form_title",
+            alignment=TA_CENTER,
+            fontName="Helvetica",
+            fontSize=12,
+            leading=18,
+        ),
+        "form_school": _style(
+            "form_school",
+            alignment=TA_CENTER,
+            fontName="Helvetica",
+            fontSize=10,
+            leading=18,
+        ),
+        "form_department": _style(
+            "form_department",
+            alignment=TA_CENTER,
+            fontName="Helvetica",
+            fontSize=9,
+            leading=18,
+        ),
+        "form_section": _style(
+            "form_section",
+            alignment=TA_LEFT,
+            fontName="Helvetica",
+            fontSize=9,
+            leading=18,
+        ),
+        "form_total": _style(
+            "form_total",
+            alignment=TA_LEFT,
+            fontName="Helvetica",
+            fontSize=8,
+            leading=18,
+        ),
+        "form_certification": _style(
+            "form_certification",
+            alignment=TA_JUSTIFY,
+            fontName="Helvetica",
+            fontSize=8,
+            leading=18,
+        ),
+    }
+)
+
+# Result sheet table: header row, then one row per student
+SHEET_TABLE_COMMANDS = (
+    ("BACKGROUND", (0, 0), (-1, 0), colors.black),
+    ("TEXTCOLOR", (1, 0), (-1, 0), colors.white),
+    ("TEXTCOLOR", (0, 0), (0, 0), colors.cyan),
+    ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+    ("VALIGN", (0, 0), (-1, 0), "MIDDLE"),
+    ("BOX", (0, 0), (-1, 0), 1, colors.black),
+    ("INNERGRID", (0, 1), (-1, -1), 0.05, colors.black),
+    ("BOX", (0, 1), (-1, -1), 0.1, colors.black),
+)
+
+# Registration form course tables: header row, then one row per course
+FORM_TABLE_STYLE = TableStyle(
+    [
+        ("ALIGN", (0, 0), (0, -1), "CENTER"),
+        ("ALIGN", (1, 0), (2, -1), "LEFT"),
+        ("ALIGN", (3, 0), (3, -1), "CENTER"),
+        ("VALIGN", (0, 0), (-1, 0), "MIDDLE"),
+        ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
+        ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.black),
+        ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
+    ]
+)
+
+# Certificate palette
+DARK_GRAY = (69 / 255.0, 69 / 255.0, 69 / 255.0)
+LIME = (146 / 255.0, 182 / 255.0, 42 / 255.0)
+NAVY = (32 / 255.0, 32 / 255.0, 68 / 255.0)
+MUSTARD = (226 / 255.0, 210 / 255.0, 41 / 255.0)
+
+COMPANY_NAME = "Aprende Ya"
+COMPANY_CITY = "Santiago, Chile"
+COMPANY_WEBSITE = "https://aprendeyacapacitacion.cl"
+
+
+# Images
+
+
+@lru_cache(maxsize=None)
+def image(name, width, height, flatten=False):
+    """``static/img/<name>`` decoded once per process and scaled down for a
+    ``width`` x ``height`` points box, or None if the file is missing.
+
+    ``flatten`` puts it on white and keeps it as a JPEG, which goes into the
+    PDF as is instead of being compressed again on every document.
+    """
+    path = os.path.join(settings.STATICFILES_DIRS[0], "img", name)
+    if not os.path.exists(path):
+        return None
+    with PILImage.open(path) as source:
+        picture = source.convert("RGBA")
+    picture.thumbnail((round(width / 72 * IMAGE_DPI), round(height / 72 * IMAGE_DPI)))
+
+    buffer = BytesIO()
+    if flatten:
+        flat = PILImage.new("RGB", picture.size, "white")
+        flat.paste(picture, mask=picture.getchannel("A"))
+        flat.save(buffer, "JPEG", quality=90)
+    else:
+        picture.save(buffer, "PNG")
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+class Letterhead(SimpleDocTemplate):
+    """Flowing document that draws ``images`` on its first page.
+
+    ``images`` are ``(image, x, y, width, height)`` with an ``ImageReader``
+    or a file path; missing ones are skipped.
+    """
+
+    def __init__(self, out, images=(), **kwargs):
+        super().__init__(out, **kwargs)
+        self.images = images
+
+    def draw_images(self, canvas, doc):
+        for picture, x, y, width, height in self.images:
+            if picture is None or (
+                isinstance(picture, str) and not os.path.exists(picture)
+            ):
+                continue
+            canvas.drawImage(
+                picture,
+                x,
+                y,
+                width=width,
+                height=height,
+                preserveAspectRatio=True,
+                mask="auto",
+            )
+
+    def build(self, flowables):
+        super().build(flowables, onFirstPage=self.draw_images)
+
+
+# Documents
+
+
+@binary_streams()
+def render_result_sheet(inputs, out):
+    page_width, page_height = A4
+    doc = Letterhead(
+        out,
+        images=[(image("dj-lms.png", inch, inch), 70, page_height - 118, inch, inch)],
+        pagesize=A4,
+        rightMargin=0,
+        leftMargin=6.5 * cm,
+        topMargin=0.3 * cm,
+        bottomMargin=0,
+    )
+    story = [Spacer(1, 0.2), Spacer(1, inch)]
+
+    title = f"<b> {inputs['semester']} Semester {inputs['session']} Result Sheet</b>"
+    story.append(Paragraph(title.upper(), STYLES["sheet_title"]))
+    story.append(Spacer(1, 0.1 * inch))
+    title = f"<b>Course lecturer: {inputs['lecturer']}</b>"
+    story.append(Paragraph(title.upper(), STYLES["sheet_subtitle"]))
+    story.append(Spacer(1, 0.1 * inch))
+    title = f"<b>Level: </b>{inputs['level']}"
+    story.append(Paragraph(title.upper(), STYLES["sheet_subtitle"]))
+    story.append(Spacer(1, 0.6 * inch))
+
+    rows = [("S/N", "ID NO.", "FULL NAME", "TOTAL", "GRADE", "POINT", "COMMENT")]
+    commands = list(SHEET_TABLE_COMMANDS)
+    for count, row in enumerate(inputs["rows"], start=1):
+        rows.append(
+            (
+                count,
+                row["username"].upper(),
+                Paragraph(row["full_name"].capitalize(), STYLES["body"]),
+                row["total"],
+                row["grade"],
+                row["point"],
+                row["comment"],
+            )
+        )
+        if row["failed"]:
+            commands.append(("TEXTCOLOR", (0, count), (-1, count), colors.red))
+    story.append(
+        Table(
+            rows,
+            colWidths=[inch] * 7,
+            rowHeights=[0.5 * inch] + [None] * (len(rows) - 1),
+            style=TableStyle(commands),
+            repeatRows=1,
+        )
+    )
+
+    story.append(Spacer(1, 1 * inch))
+    story.append(
+        Table(
+            [
+                [
+                    Paragraph(
+                        "<b>Date:</b>_____________________________", STYLES["body"]
+                    ),
+                    Paragraph(
+                        f"<b>No. of PASS:</b> {inputs['passed']}", STYLES["body_right"]
+                    ),
+                ],
+                [
+                    Paragraph(
+                        "<b>Siganture / Stamp:</b> _____________________________",
+                        STYLES["body"],
+                    ),
+                    Paragraph(
+                        f"<b>No. of FAIL: </b>{inputs['failed']}", STYLES["body_right"]
+                    ),
+                ],
+            ]
+        )
+    )
+    doc.build(story)
+
+
+@binary_streams()
+def render_certificate(inputs, out):
+    width, height = landscape(A4)  # Horizontal
+    c = rl_canvas.Canvas(out, pagesize=(width, height))
+
+    margin = 40
+    header_h = 86
+
+    # Fondo con imagen (si existe)
+    background = image("pic-8.png", width, height, flatten=True)
+    if background is not None:
+        c.drawImage(
+            background, 0, 0, width=width, height=height, preserveAspectRatio=True
+        )
+
+    # Panel blanco solo en el lado derecho para legibilidad (deja visible el fondo a la izquierda)
+    panel_left = width * 0.40
+    panel_width = width - panel_left - margin
+    c.setFillColorRGB(1, 1, 1)
+    c.rect(panel_left, margin, panel_width, height - 2 * margin, fill=1, stroke=0)
+
+    # Logo en cabecera (izquierda) con enlace clicable al sitio
+    lw, lh = 160, 72
+    logo = image("logo-aprendeya.png", lw, lh)
+    if logo is not None:
+        lx = margin
+        ly = height - margin - lh - 8
+        c.drawImage(
+            logo, lx, ly, width=lw, height=lh, preserveAspectRatio=True, mask="auto"
+        )
+        c.linkURL(COMPANY_WEBSITE, (lx, ly, lx + lw, ly + lh), relative=0)
+
+    # Título en cabecera (derecha) sobre fondo blanco
+    c.setFillColorRGB(*DARK_GRAY)
+    c.setFont("Helvetica-Bold", 30)
+    c.drawRightString(width - margin - 10, height - margin - 36, "CERTIFICADO")
+    c.setFont("Helvetica", 12)
+    c.drawRightString(
+        width - margin - 10, height - margin - 56, "Otorgado al participante"
+    )
+
+    # Acentos superiores (lima + mostaza) alineados al panel
+    c.setFillColorRGB(*LIME)
+    c.rect(panel_left, height - margin - header_h + 4, panel_width, 6, fill=1, stroke=0)
+    c.setFillColorRGB(*MUSTARD)
+    c.rect(
+        panel_left,
+        height - margin - header_h - 4,
+        panel_width * 0.6,
+        3,
+        fill=1,
+        stroke=0,
+    )
+
+    # Barra vertical lima derecha sutil
+    c.setFillColorRGB(*LIME)
+    c.rect(width - margin - 10, margin, 10, height - 2 * margin - 60, fill=1, stroke=0)
+
+    # Contenido alineado a la derecha
+    y = height - margin - header_h - 30
+    right_x = width - margin - 18
+    c.setFillColorRGB(*DARK_GRAY)
+    c.setFont("Helvetica", 12)
+    c.drawRightString(right_x, y, "Se certifica que")
+    y -= 20
+    c.setFont("Helvetica-Bold", 22)
+    c.drawRightString(right_x, y, inputs["full_name"])
+    y -= 16
+    c.setFont("Helvetica", 10)
+    c.setFillColorRGB(0.38, 0.38, 0.38)
+    c.drawRightString(right_x, y, f"ID: {inputs['username']}")
+    y -= 20
+    c.setFillColorRGB(*DARK_GRAY)
+    c.setFont("Helvetica", 12)
+    c.drawRightString(
+        right_x,
+        y,
+        "ha sido capacitado(a), evaluado(a) y aprobado(a) en la actividad de",
+    )
+    y -= 20
+    c.setFont("Helvetica-Bold", 14)
+    c.setFillColorRGB(*NAVY)
+    c.drawRightString(right_x, y, f"{inputs['course_title']} ({inputs['course_code']})")
+    y -= 18
+    c.setFont("Helvetica", 10)
+    c.setFillColorRGB(0.26, 0.26, 0.26)
+    c.drawRightString(
+        right_x,
+        y,
+        f"Resultado final: {inputs['total']} ({inputs['comment']}) • Sede: Santiago, Chile",
+    )
+    y -= 22
+
+    # Párrafo adicional: narrativa corporativa + duración
+    c.setFont("Helvetica", 11)
+    c.setFillColorRGB(*DARK_GRAY)
+    paragraph_lines = [
+        f"{COMPANY_NAME} certifica que el participante mencionado ha sido capacitado, evaluado y aprobado en la actividad de capacitación.",
+        f"Componente formativo: {inputs['duration']}.",
+        f"Lugar de emisión: {COMPANY_CITY}.",
+    ]
+    max_width = width - 2 * margin - 40
+    for text in paragraph_lines:
+        for line in simpleSplit(text, "Helvetica", 11, max_width):
+            c.drawRightString(right_x, y, line)
+            y -= 14
+
+    # Firma en el centro inferior
+    c.setFont("Helvetica", 10)
+    c.setFillColorRGB(0, 0, 0)
+    c.line(width / 2 - 120, margin + 40, width / 2 + 120, margin + 40)
+    c.drawCentredString(width / 2, margin + 28, "Firma Autorizada")
+    c.drawCentredString(width / 2, margin + 16, "Camila Hernández")
+    c.drawCentredString(width / 2, margin + 4, "8.335.040-7")
+
+    # Serie
+    c.setFillColorRGB(0.38, 0.38, 0.38)
+    c.drawString(margin, margin + 28, f"N° Serie: {inputs['serial_number']}")
+    c.drawString(margin, margin + 14, f"Emitido: {inputs['issued_at']}")
+
+    c.showPage()
+    c.save()
+
+
+def _course_table(courses, header):
+    rows = [
+        (
+            "S/No",
+            "Course Code",
+            "Course Title",
+            "Unit",
+            Paragraph(header, STYLES["form_section"]),
+        )
+    ]
+    for count, course in enumerate(courses, start=1):
+        rows.append(
+            (
+                count,
+                course["code"].upper(),
+                Paragraph(course["title"], STYLES["form_section"]),
+                course["credit"],
+                "",
+            )
+        )
+    return Table(
+        rows,
+        colWidths=[1.4 * inch] * 5,
+        rowHeights=[0.5 * inch] + [0.3 * inch] * len(courses),
+        style=FORM_TABLE_STYLE,
+        repeatRows=1,
+    )
+
+
+@binary_streams()
+def render_registration_form(inputs, out):
+    page_width, page_height = A4
+    doc = Letterhead(
+        out,
+        images=[
+            (image("dj-lms.png", inch, inch), 35, page_height - 100, inch, inch),
+            (inputs["picture"], page_width - 35 - inch, page_height - 100, inch, inch),
+        ],
+        pagesize=A4,
+        rightMargin=15,
+        leftMargin=15,
+        topMargin=0,
+        bottomMargin=0,
+    )
+    story = [Spacer(1, 0.5), Spacer(1, 0.4 * inch)]
+
+    # TODO: Make the institution dynamic
+    title = "<b>EZOD UNIVERSITY OF TECHNOLOGY, ADAMA</b>"
+    story.append(Paragraph(title.upper(), STYLES["form_title"]))
+    title = "<b>SCHOOL OF ELECTRICAL ENGINEERING & COMPUTING</b>"
+    story.append(Paragraph(title.upper(), STYLES["form_school"]))
+    story.append(Spacer(1, 0.1 * inch))
+    title = "<b>DEPARTMENT OF COMPUTER SCIENCE & ENGINEERING</b>"
+    story.append(Paragraph(title, STYLES["form_department"]))
+    story.append(Spacer(1, 0.3 * inch))
+
+    title = "<b><u>STUDENT COURSE REGISTRATION FORM</u></b>"
+    story.append(Paragraph(title.upper(), STYLES["form_title"]))
+    story.append(
+        Table(
+            [
+                [
+                    Paragraph(
+                        f"<b>Registration Number : {inputs['username'].upper()}</b>",
+                        STYLES["body"],
+                    )
+                ],
+                [
+                    Paragraph(
+                        f"<b>Name : {inputs['full_name'].upper()}</b>", STYLES["body"]
+                    )
+                ],
+                [
+                    Paragraph(
+                        f"<b>Session : {inputs['session'].upper()}</b>", STYLES["body"]
+                    ),
+                    Paragraph(f"<b>Level: {inputs['level']}</b>", STYLES["body"]),
+                ],
+            ]
+        )
+    )
+    story.append(Spacer(1, 0.6 * inch))
+
+    semesters = (
+        (
+            FIRST,
+            "FIRST SEMESTER",
+            "Name, Siganture of course lecturer & Date",
+            "Total Second First Credit",
+        ),
+        (
+            SECOND,
+            "SECOND SEMESTER",
+            "<b>Name, Signature of course lecturer & Date</b>",
+            "Total Second Semester Credit",
+        ),
+    )
+    for index, (semester, heading, header, total_label) in enumerate(semesters):
+        courses = [c for c in inputs["courses"] if c["semester"] == semester]
+        if index:
+            story.append(Spacer(1, 0.6 * inch))
+        story.append(Paragraph(f"<b>{heading}</b>", STYLES["form_section"]))
+        story.append(_course_table(courses, header))
+        total = sum(int(course["credit"]) for course in courses)
+        story.append(Paragraph(f"<b>{total_label} : {total}</b>", STYLES["form_total"]))
+
+    story.append(Spacer(1, 2))
+    certification_text = (
+        "CERTIFICATION OF REGISTRATION: I certify that <b>"
+        + inputs["full_name"].upper()
+        + "</b> has been duly registered for the <b>"
+        + inputs["level"]
+        + " level </b> of study in the department of COMPUTER SICENCE & ENGINEERING"
+        " and that the courses and credits registered are as approved by the"
+        " senate of the University"
+    )
+    story.append(Paragraph(certification_text, STYLES["form_certification"]))
+    doc.build(story)
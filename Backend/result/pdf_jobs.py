@@ -0,0 +1,284 @@
+"""
+Background PDF jobs for result sheets, certificates, registration forms and
+the student and lecturer list exports (which can also be CSV or XLSX).
+
+A view collects everything its document shows into a JSON ``inputs`` dict
+(one or two queries), calls ``request_pdf`` and answers with
+``pdf_job_response``. The job key is a digest of
+the document kind, ``RENDER_VERSION`` and those inputs, so the key changes
+whenever a score, a name or the layout changes and stays the same
+otherwise: a finished job's file under ``MEDIA_ROOT/pdf_jobs/`` is served
+as is on every later download, and only new inputs are rendered.
+
+Rendering happens in ``manage.py process_pdf_jobs``, a worker that claims
+pending jobs from the ``PdfJob`` table, so it needs nothing but the
+database; several workers can run side by side. With ``PDF_JOBS_EAGER`` set
+the job is rendered inside the request instead, for development without a
+worker.
+"""
+import hashlib
+import json
+import logging
+import os
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import FileResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from accounts.exports import render_user_list
+
+from .models import PdfJob, TakenCourse, GradingScale, FAIL
+from .pdf import (
+    render_result_sheet,
+    render_certificate,
+    render_registration_form,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when a renderer changes its output, so cached files are redone
+RENDER_VERSION = 2
+
+RENDERERS = {
+    PdfJob.RESULT_SHEET: render_result_sheet,
+    PdfJob.CERTIFICATE: render_certificate,
+    PdfJob.REGISTRATION_FORM: render_registration_form,
+    PdfJob.USER_LIST: render_user_list,
+}
+
+# Renderers taking a ``progress(done, total)`` callback
+REPORTS_PROGRESS = {PdfJob.USER_LIST}
+
+# A job still running after this long is assumed lost with its worker
+STALE_AFTER = timedelta(minutes=10)
+
+# A job that failed this many times is not queued again by request_pdf
+MAX_ATTEMPTS = 3
+
+PDF_JOBS_SESSION_KEY = "pdf_jobs"
+
+
+def job_key(kind, inputs):
+    payload = json.dumps(
+        {"kind": kind, "version": RENDER_VERSION, "inputs": inputs},
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def inputs_as_json(inputs):
+    """``inputs`` through JSON once (decimals and dates become strings), so
+    they are exactly what is hashed and stored."""
+    return json.loads(json.dumps(inputs, cls=DjangoJSONEncoder))
+
+
+def request_pdf(kind, inputs, filename, user=None):
+    """The job rendering ``inputs``, queued if it is new, failed fewer than
+    ``MAX_ATTEMPTS`` times or lost its file."""
+    inputs = inputs_as_json(inputs)
+    job, created = PdfJob.objects.get_or_create(
+        key=job_key(kind, inputs),
+        defaults={
+            "kind": kind,
+            "inputs": inputs,
+            "filename": filename,
+            "requested_by": user,
+        },
+    )
+    if not created and job.status == PdfJob.FAILED and job.attempts < MAX_ATTEMPTS:
+        PdfJob.objects.filter(pk=job.pk, status=job.status).update(
+            status=PdfJob.PENDING, progress=0, error=""
+        )
+        job.status = PdfJob.PENDING
+    elif not created and job.status == PdfJob.DONE and not os.path.exists(job.path):
+        PdfJob.objects.filter(pk=job.pk, status=job.status).update(
+            status=PdfJob.PENDING, progress=0, attempts=0
+        )
+        job.status = PdfJob.PENDING
+        job.attempts = 0
+
+    if job.status == PdfJob.PENDING and getattr(settings, "PDF_JOBS_EAGER", False):
+        if claim(job):
+            run_job(job)
+    return job
+
+
+def pdf_job_response(request, job):
+    """Serve the finished PDF, or send the user to the job status page.
+
+    Only the views requesting a document check who may see it, so the job
+    key is remembered in the session for the status and download endpoints.
+    """
+    keys = request.session.get(PDF_JOBS_SESSION_KEY, [])
+    if job.key not in keys:
+        request.session[PDF_JOBS_SESSION_KEY] = (keys + [job.key])[-50:]
+    if job.is_ready:
+        return pdf_file_response(job)
+    return redirect("pdf_job_status", key=job.key)
+
+
+def pdf_file_response(job):
+    response = FileResponse(open(job.path, "rb"), content_type=job.content_type)
+    disposition = "inline" if job.format == "pdf" else "attachment"
+    response["Content-Disposition"] = f"{disposition}; filename={job.filename}"
+    return response
+
+
+def claim(job):
+    """Mark ``job`` running unless another worker got to it first."""
+    now = timezone.now()
+    claimed = PdfJob.objects.filter(
+        pk=job.pk, status=job.status, attempts=job.attempts
+    ).update(status=PdfJob.RUNNING, started_at=now, attempts=F("attempts") + 1)
+    if claimed:
+        job.status = PdfJob.RUNNING
+        job.started_at = now
+        job.attempts += 1
+    return bool(claimed)
+
+
+def progress_reporter(job):
+    """Callback saving ``done`` of ``total`` items as the job's percentage."""
+
+    def report(done, total):
+        percent = 100 * done // total if total else 100
+        if percent != job.progress:
+            job.progress = percent
+            PdfJob.objects.filter(pk=job.pk).update(progress=percent)
+
+    return report
+
+
+def run_job(job):
+    """Render a claimed job to its content-addressed path."""
+    os.makedirs(os.path.dirname(job.path), exist_ok=True)
+    partial = f"{job.path}.{os.getpid()}.part"
+    options = {}
+    if job.kind in REPORTS_PROGRESS:
+        options["progress"] = progress_reporter(job)
+    try:
+        RENDERERS[job.kind](job.inputs, partial, **options)
+        os.replace(partial, job.path)
+    except Exception:
+        logger.exception("PDF job %s failed", job.key)
+        if os.path.exists(partial):
+            os.remove(partial)
+        job.status = PdfJob.FAILED
+        job.error = traceback.format_exc()
+    else:
+        job.status = PdfJob.DONE
+        job.progress = 100
+        job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "progress", "error", "finished_at"])
+    return job
+
+
+def run_pending(limit=None):
+    """Claim and render queued jobs, oldest first; returns how many ran."""
+    done = 0
+    while limit is None or done < limit:
+        stale = timezone.now() - STALE_AFTER
+        candidates = PdfJob.objects.filter(
+            Q(status=PdfJob.PENDING) | Q(status=PdfJob.RUNNING, started_at__lt=stale)
+        ).order_by("created_at")[:10]
+        job = next((job for job in candidates if claim(job)), None)
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+# Inputs of each document
+
+
+def result_sheet_inputs(course, semester, session, lecturer):
+    grade_table = GradingScale.objects.table_for(course.program_id)
+    rows = [
+        {
+            "username": taken.student.student.username,
+            "full_name": taken.student.student.get_full_name,
+            "total": taken.total,
+            "grade": taken.grade,
+            "point": taken.point,
+            "comment": taken.comment,
+            "failed": grade_table.comment(taken.grade) == FAIL,
+        }
+        for taken in TakenCourse.objects.filter(course=course)
+        .select_related("student__student")
+        .order_by("pk")
+    ]
+    return {
+        "course_id": course.pk,
+        "level": course.level,
+        "semester": str(semester),
+        "session": str(session),
+        "lecturer": lecturer.get_full_name,
+        "rows": rows,
+        "passed": sum(row["comment"] == "PASS" for row in rows),
+        "failed": sum(row["comment"] == "FAIL" for row in rows),
+    }
+
+
+def course_duration_text(course):
+    try:
+        duration_value = getattr(course, "duration", None)
+        duration_unit = getattr(course, "duration_unit", None)
+        unit_display = (
+            course.get_duration_unit_display()
+            if hasattr(course, "get_duration_unit_display") and duration_unit
+            else None
+        )
+        if duration_value and unit_display:
+            return f"{duration_value} {unit_display}"
+        elif duration_value:
+            return f"{duration_value} horas"
+    except Exception:
+        pass
+    return "110 horas totales (102 teóricas y 8 prácticas)"
+
+
+def certificate_inputs(taken_course, certificate):
+    user = taken_course.student.student
+    return {
+        "taken_course_id": taken_course.pk,
+        "full_name": user.get_full_name,
+        "username": user.username,
+        "course_title": taken_course.course.title,
+        "course_code": taken_course.course.code,
+        "total": taken_course.total,
+        "comment": taken_course.comment,
+        "duration": course_duration_text(taken_course.course),
+        "serial_number": certificate.serial_number,
+        "issued_at": certificate.issued_at.strftime("%d/%m/%Y"),
+    }
+
+
+def registration_form_inputs(user, student, session):
+    courses = [
+        {
+            "code": taken.course.code,
+            "title": taken.course.title,
+            "credit": taken.course.credit,
+            "semester": taken.course.semester,
+        }
+        for taken in TakenCourse.objects.filter(student=student)
+        .select_related("course")
+        .order_by("pk")
+    ]
+    return {
+        "user_id": user.pk,
+        "username": user.username,
+        "full_name": user.get_full_name,
+        "session": session.session,
+        "level": student.level,
+        "courses": courses,
+        "picture": settings.BASE_DIR + user.get_picture(),
+    }
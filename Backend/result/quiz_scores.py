@@ -0,0 +1,174 @@
+"""
+Prefill of the score sheet from the quizzes students already took.
+
+Everything is loaded up front (course quizzes, completed sittings of the
+whole roster and the progress entries needed as fallback), so the score
+page runs the same number of queries whatever the size of the course.
+"""
+from collections import defaultdict
+
+from quiz.models import Sitting, Quiz, ProgressEntry
+
+CATEGORIES = ("assignment", "exam", "practice")
+
+CATEGORY_KEYWORDS = (
+    # Assignment / Tarea
+    ("assignment", ("assignment", "tarea", "tareas")),
+    # Practice / Quiz / Cuestionario / Práctica
+    ("practice", ("practice", "práctica", "practica", "quiz", "cuestionario")),
+    # Exam / Examen / Parcial / Final / Mid
+    ("exam", ("exam", "examen", "parcial", "final", "mid")),
+)
+
+
+def category_from_title(title):
+    title_l = (title or "").strip().lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(k in title_l for k in keywords):
+            return category
+    return None
+
+
+def resolve_category(quiz):
+    """Devuelve 'assignment' | 'exam' | 'practice' o None.
+    Prioriza el campo category; si viene vacío/none/'none', infiere por el título (ES/EN).
+    """
+    raw = (getattr(quiz, "category", "") or "").strip().lower()
+    if raw in CATEGORIES:
+        return raw
+    if not raw or raw == "none":
+        return category_from_title(getattr(quiz, "title", ""))
+    return None
+
+
+def is_final_exam(title):
+    """Exams are split into mid/final by title; unknown titles count as mid."""
+    return "final" in (title or "").lower()
+
+
+def avg_or_zero(values):
+    return round(sum(values) / len(values), 2) if values else 0.0
+
+
+class QuizScoreImport:
+    """Computes per-student averages from quizzes and prefills empty scores."""
+
+    def __init__(self, course):
+        self.course = course
+        self.quizzes = list(
+            Quiz.objects.filter(course=course).only("id", "title", "category")
+        )
+        self.title_to_category = {q.title: resolve_category(q) for q in self.quizzes}
+        self._quiz_categories = {
+            q.id: self.title_to_category[q.title] for q in self.quizzes
+        }
+
+    def quiz_category(self, quiz):
+        if quiz.id not in self._quiz_categories:
+            self._quiz_categories[quiz.id] = resolve_category(quiz)
+        return self._quiz_categories[quiz.id]
+
+    def load_sittings(self, user_ids):
+        sittings = defaultdict(list)
+        queryset = Sitting.objects.filter(
+            course=self.course, complete=True, user_id__in=user_ids
+        ).select_related("quiz")
+        for sitting in queryset:
+            sittings[sitting.user_id].append(sitting)
+        return sittings
+
+    def load_progress(self, user_ids):
+        """user id -> [(quiz id, title, score, possible)] for this course."""
+        progress = defaultdict(list)
+        if not user_ids:
+            return progress
+        rows = ProgressEntry.objects.filter(
+            user_id__in=user_ids, quiz__course=self.course, possible__gt=0
+        ).values_list("user_id", "quiz_id", "quiz__title", "score", "possible")
+        for user_id, *entry in rows:
+            progress[user_id].append(entry)
+        return progress
+
+    def averages(self, sittings, progress_entries):
+        percents = {category: [] for category in CATEGORIES}
+        exam_mid, exam_final = [], []
+
+        # 1) Sittings completados (preferido)
+        for sitting in sittings:
+            category = self.quiz_category(sitting.quiz)
+            if category not in percents:
+                continue
+            try:
+                percent = sitting.get_percent_correct
+            except Exception:
+                max_score = sitting.get_max_score
+                percent = (
+                    (float(sitting.current_score) / max_score * 100) if max_score else 0
+                )
+            percents[category].append(percent)
+            if category == "exam":
+                if is_final_exam(sitting.quiz.title):
+                    exam_final.append(percent)
+                else:
+                    exam_mid.append(percent)
+
+        # 2) Fallback con el progreso si faltan categorías
+        for quiz_id, title, score, possible in progress_entries:
+            category = self._quiz_categories.get(quiz_id)
+            value = (score / possible) * 100.0
+            if category in percents and not percents[category]:
+                percents[category].append(value)
+            if category == "exam":
+                if is_final_exam(title):
+                    if not exam_final:
+                        exam_final.append(value)
+                elif not exam_mid:
+                    exam_mid.append(value)
+
+        # Asistencia como % de quizzes completados del curso
+        completed_quiz_ids = {sitting.quiz_id for sitting in sittings}
+        attendance = (
+            round((len(completed_quiz_ids) / len(self.quizzes)) * 100, 2)
+            if self.quizzes
+            else 0.0
+        )
+        return {
+            "assignment": avg_or_zero(percents["assignment"]),
+            "mid_exam": avg_or_zero(exam_mid),
+            "quiz": avg_or_zero(percents["practice"]),
+            "attendance": attendance,
+            "final_exam": avg_or_zero(exam_final),
+        }, percents
+
+    def prefill(self, taken_courses):
+        """Set the quiz averages on every TakenCourse whose score is still zero.
+        ``taken_courses`` must have ``student`` selected."""
+        user_ids = [tc.student.student_id for tc in taken_courses]
+        sittings_by_user = self.load_sittings(user_ids)
+
+        first_pass = {}
+        needs_progress = []
+        for user_id in user_ids:
+            averages, percents = self.averages(sittings_by_user.get(user_id, []), [])
+            first_pass[user_id] = averages
+            if any(not values for values in percents.values()):
+                needs_progress.append(user_id)
+
+        progress = self.load_progress(needs_progress)
+        for tc in taken_courses:
+            user_id = tc.student.student_id
+            if progress.get(user_id):
+                averages, _ = self.averages(
+                    sittings_by_user.get(user_id, []), progress[user_id]
+                )
+            else:
+                averages = first_pass[user_id]
+            for field, value in averages.items():
+                try:
+                    current = getattr(tc, field)
+                    if not current or float(current) == 0.0:
+                        setattr(tc, field, value)
+                except (TypeError, ValueError):
+                    # Ignorar problemas de conversión y continuar
+                    pass
+        return taken_courses
@@ -0,0 +1,176 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+
+from course.models import Course
+from .models import GradeLedger, TakenCourse, ledger_key
+
+_state = threading.local()
+
+
+@contextmanager
+def taken_course_receivers_muted():
+    """
+    Skip the TakenCourse receivers in this thread, for bulk paths that update
+    the grade ledger and the enrollment counters themselves
+    """
+    _state.muted = getattr(_state, "muted", 0) + 1
+    try:
+        yield
+    finally:
+        _state.muted -= 1
+
+
+def receivers_muted():
+    return getattr(_state, "muted", 0) > 0
+
+
+def pre_save_taken_course_receiver(sender, instance=None, *args, **kwargs):
+    """
+    Read the stored point, student and course of a TakenCourse that was not
+    loaded with them (deferred, or built by hand with a pk) for the
+    post_save receiver
+    """
+    if receivers_muted() or instance.pk is None:
+        return
+    if hasattr(instance, "_ledger_point") and hasattr(instance, "_ledger_owner"):
+        return
+    stored = (
+        TakenCourse.objects.filter(pk=instance.pk)
+        .values_list("point", "student_id", "course_id")
+        .first()
+    )
+    if stored is None:
+        return
+    if not hasattr(instance, "_ledger_point"):
+        instance._ledger_point = stored[0]
+    if not hasattr(instance, "_ledger_owner"):
+        instance._ledger_owner = stored[1:]
+
+
+def add_delta(deltas, key, credits, points):
+    total_credits, total_points = deltas.get(key, (0, Decimal("0")))
+    deltas[key] = (total_credits + credits, total_points + points)
+
+
+def post_save_taken_course_receiver(
+    sender, instance=None, created=False, *args, **kwargs
+):
+    """
+    Keep the grade ledger and the course enrollment counters in step with
+    the saved TakenCourse, also when it moved to another student or course
+    """
+    if receivers_muted():
+        return
+    point = Decimal(str(instance.point or 0))
+    owner = (instance.student_id, instance.course_id)
+    previous_owner = getattr(instance, "_ledger_owner", None)
+    deltas = {}
+    if created:
+        Course.objects.filter(pk=instance.course_id).update(
+            enrolled_count=F("enrolled_count") + 1
+        )
+        add_delta(deltas, ledger_key(instance), instance.course.credit or 0, point)
+    else:
+        previous = Decimal(str(getattr(instance, "_ledger_point", None) or 0))
+        if previous_owner is None or tuple(previous_owner) == owner:
+            add_delta(deltas, ledger_key(instance), 0, point - previous)
+        else:
+            student_id, course_id = previous_owner
+            if course_id != instance.course_id:
+                Course.objects.filter(pk=course_id, enrolled_count__gt=0).update(
+                    enrolled_count=F("enrolled_count") - 1
+                )
+                Course.objects.filter(pk=instance.course_id).update(
+                    enrolled_count=F("enrolled_count") + 1
+                )
+            old_course = (
+                Course.objects.filter(pk=course_id)
+                .values_list("credit", "level", "semester")
+                .first()
+            )
+            if old_course is not None:
+                credit, level, semester = old_course
+                add_delta(
+                    deltas,
+                    (student_id, level or "", semester),
+                    -int(credit or 0),
+                    -previous,
+                )
+            add_delta(deltas, ledger_key(instance), instance.course.credit or 0, point)
+
+    GradeLedger.objects.apply_deltas(deltas)
+    instance._ledger_point = point
+    instance._ledger_owner = owner
+
+
+def post_delete_taken_course_receiver(sender, instance=None, *args, **kwargs):
+    """
+    Remove the deleted TakenCourse from the grade ledger and the course
+    enrollment counter
+    """
+    if receivers_muted():
+        return
+    Course.objects.filter(pk=instance.course_id, enrolled_count__gt=0).update(
+        enrolled_count=F("enrolled_count") - 1
+    )
+    try:
+        key = ledger_key(instance)
+    except Course.DoesNotExist:
+        return
+    point = getattr(instance, "_ledger_point", instance.point) or Decimal("0")
+    GradeLedger.objects.apply_deltas(
+        {key: (-(instance.course.credit or 0), -Decimal(str(point)))}, create=False
+    )
+
+
+def course_ledger_fields(course):
+    return (int(course.credit or 0), course.level or "", course.semester)
+
+
+def pre_save_course_receiver(sender, instance=None, *args, **kwargs):
+    """
+    Remember the stored credit, level and semester of the course, which the
+    grade ledger rows of its students are keyed and summed by
+    """
+    if instance.pk is None:
+        return
+    stored = (
+        Course.objects.filter(pk=instance.pk)
+        .values_list("credit", "level", "semester")
+        .first()
+    )
+    instance._ledger_fields = (
+        (int(stored[0] or 0), stored[1] or "", stored[2]) if stored else None
+    )
+
+
+def post_save_course_receiver(sender, instance=None, created=False, *args, **kwargs):
+    """
+    Move the results of the course to their new grade ledger rows after a
+    change of its credit, level or semester
+    """
+    previous = getattr(instance, "_ledger_fields", None)
+    current = instance._ledger_fields = course_ledger_fields(instance)
+    if created or previous is None or previous == current:
+        return
+
+    rows = (
+        TakenCourse.objects.filter(course=instance)
+        .values("student_id")
+        .annotate(taken=Count("id"), points=Sum("point"))
+        .order_by()
+    )
+    deltas = {}
+    for row in rows:
+        points = row["points"] or Decimal("0")
+        for (credit, level, semester), sign in ((previous, -1), (current, 1)):
+            key = (row["student_id"], level, semester)
+            credits, total = deltas.get(key, (0, Decimal("0")))
+            deltas[key] = (
+                credits + sign * credit * row["taken"],
+                total + sign * points,
+            )
+    GradeLedger.objects.apply_deltas(deltas)
@@ -1,3 +1,666 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib import messages
+from django.core.cache import caches
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Student
+from core.models import Session, Semester
+from course.models import Program, Course, CourseAllocation
+from result.grading import ScoreSheet, GradeTable, regrade
+from quiz.models import Quiz, Sitting, ProgressEntry
+from result.quiz_scores import QuizScoreImport
+from result.certificate_export import certificate_zip
+from result.pdf import STYLES, image, render_result_sheet
+from result.pdf_jobs import (
+    MAX_ATTEMPTS,
+    RENDERERS,
+    request_pdf,
+    run_pending,
+    certificate_inputs,
+    result_sheet_inputs,
+)
+from result.models import (
+    TakenCourse,
+    Certificate,
+    GradeLedger,
+    GradingScale,
+    PdfJob,
+    default_grade_bands,
+)
+
+User = get_user_model()
+
+
+class ScoreSheetTests(TestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        allocation = CourseAllocation.objects.create(lecturer=self.lecturer)
+        allocation.courses.add(self.course)
+
+        self.students = []
+        for i in range(3):
+            user = User.objects.create_user(
+                username=f"student{i}", password="password", is_student=True
+            )
+            student = Student.objects.create(student=user, program=program)
+            TakenCourse.objects.create(student=student, course=self.course)
+            self.students.append(user)
+
+    def sheet_data(self, scores):
+        data = {}
+        for user, value in zip(self.students, scores):
+            for field in ("assignment", "mid_exam", "quiz", "attendance", "final_exam"):
+                data[f"{field}_{user.id}"] = value
+        return data
+
+    def test_apply_grades_whole_roster(self):
+        data = self.sheet_data(["90", "65.4", "10"])
+        sheet = ScoreSheet(self.course.id, self.lecturer, data).apply()
+
+        rows = {
+            tc.student.student_id: tc
+            for tc in TakenCourse.objects.filter(course=self.course)
+        }
+        self.assertEqual(rows[self.students[0].id].grade, "A")
+        self.assertEqual(float(rows[self.students[0].id].point), 12)
+        self.assertEqual(rows[self.students[1].id].grade, "C")
+        self.assertEqual(rows[self.students[2].id].comment, "FAIL")
+        self.assertEqual(
+            Certificate.objects.filter(taken_course__course=self.course).count(), 2
+        )
+        self.assertEqual([level for level, _ in sheet.messages], [messages.SUCCESS] * 3)
+        self.assertIn("redondeados", sheet.messages[1][1])
+
+    def test_add_score_for_keeps_the_pass_mark_and_grades(self):
+        caches["querysets"].clear()
+        session = Session.objects.create(session="2026/2027", is_current_session=True)
+        Semester.objects.create(
+            semester="First", is_current_semester=True, session=session
+        )
+        user = User.objects.create_user(
+            username="student3", password="password", is_student=True
+        )
+        student = Student.objects.create(student=user, program=self.course.program)
+        TakenCourse.objects.create(student=student, course=self.course)
+        self.students.append(user)
+
+        self.client.force_login(self.lecturer)
+        response = self.client.post(
+            reverse("add_score_for", args=[self.course.id]),
+            self.sheet_data(["45", "49", "50", "80"]),
+        )
+        self.assertRedirects(
+            response,
+            reverse("add_score_for", args=[self.course.id]),
+            fetch_redirect_response=False,
+        )
+        results = {
+            tc.student.student_id: (tc.grade, tc.comment, float(tc.point))
+            for tc in TakenCourse.objects.filter(course=self.course)
+        }
+        self.assertEqual(
+            [results[user.id] for user in self.students],
+            [
+                ("F", "FAIL", 0),
+                ("F", "FAIL", 0),
+                ("D", "PASS", 3),
+                ("A", "PASS", 12),
+            ],
+        )
+        self.assertEqual(
+            Certificate.objects.filter(taken_course__course=self.course).count(), 2
+        )
+        # Scores are rounded before weighting, the table itself decides 49.99
+        table = GradingScale.objects.table_for(self.course.program_id)
+        self.assertEqual(table.grade(49.99), "F")
+
+    def test_apply_uses_constant_number_of_queries(self):
+        data = self.sheet_data(["90", "90", "90"])
+        with self.assertNumQueries(9):
+            ScoreSheet(self.course.id, self.lecturer, data).apply()
+
+    def test_apply_reports_unknown_and_empty_rows(self):
+        data = self.sheet_data(["", "", ""])
+        data["assignment_999999"] = "50"
+        sheet = ScoreSheet(self.course.id, self.lecturer, data).apply()
+
+        levels = [level for level, _ in sheet.messages]
+        self.assertEqual(levels.count(messages.WARNING), 3)
+        self.assertEqual(levels.count(messages.ERROR), 1)
+        self.assertFalse(Certificate.objects.exists())
+
+
+class GradeLedgerTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.other = Course.objects.create(
+            title="Networks", code="CS102", credit=2, program=program, semester="First"
+        )
+        user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.student = Student.objects.create(student=user, program=program)
+
+    def test_ledger_follows_taken_course_changes(self):
+        taken = TakenCourse.objects.create(
+            student=self.student, course=self.course, point=12
+        )
+        TakenCourse.objects.create(student=self.student, course=self.other, point=4)
+        entry = GradeLedger.objects.get(student=self.student)
+        self.assertEqual((entry.credits, float(entry.points)), (5, 16))
+
+        taken = TakenCourse.objects.get(pk=taken.pk)
+        taken.point = 6
+        taken.save()
+        entry.refresh_from_db()
+        self.assertEqual(float(entry.points), 10)
+        self.assertEqual(entry.gpa, 2)
+        self.assertEqual(GradeLedger.objects.cgpa(self.student), 2)
+
+        taken.delete()
+        entry.refresh_from_db()
+        self.assertEqual((entry.credits, float(entry.points)), (2, 4))
+
+    def test_ledger_reads_the_stored_point_when_it_was_not_loaded(self):
+        taken = TakenCourse.objects.create(
+            student=self.student, course=self.course, point=12
+        )
+        deferred = TakenCourse.objects.defer("point").get(pk=taken.pk)
+        deferred.point = 9
+        deferred.save()
+        by_hand = TakenCourse(
+            pk=taken.pk, student=self.student, course=self.course, point=6
+        )
+        by_hand.save()
+        self.assertEqual(float(GradeLedger.objects.get().points), 6)
+        call_command("rebuild_grade_ledger", check=True, stdout=StringIO())
+
+    def test_ledger_and_counters_follow_a_moved_result(self):
+        self.other.semester = "Second"
+        self.other.save()
+        taken = TakenCourse.objects.create(
+            student=self.student, course=self.course, point=12
+        )
+        taken = TakenCourse.objects.get(pk=taken.pk)
+        taken.course = self.other
+        taken.point = 4
+        taken.save()
+        ledger = {
+            row.semester: (row.credits, float(row.points))
+            for row in GradeLedger.objects.all()
+        }
+        self.assertEqual(ledger, {"First": (0, 0), "Second": (2, 4)})
+        self.course.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(
+            (self.course.enrolled_count, self.other.enrolled_count), (0, 1)
+        )
+
+        user = User.objects.create_user(
+            username="other", password="password", is_student=True
+        )
+        other_student = Student.objects.create(
+            student=user, program=self.course.program
+        )
+        by_hand = TakenCourse(
+            pk=taken.pk, student=other_student, course=self.other, point=4
+        )
+        by_hand.save()
+        self.assertEqual(
+            GradeLedger.objects.get(student=other_student, semester="Second").credits,
+            2,
+        )
+        self.assertEqual(
+            GradeLedger.objects.get(student=self.student, semester="Second").credits,
+            0,
+        )
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.enrolled_count, 1)
+        call_command("rebuild_grade_ledger", check=True, stdout=StringIO())
+
+    def test_ledger_follows_course_changes(self):
+        TakenCourse.objects.create(student=self.student, course=self.course, point=12)
+        TakenCourse.objects.create(student=self.student, course=self.other, point=4)
+
+        self.course.credit = 4
+        self.course.save()
+        self.assertEqual(GradeLedger.objects.get().credits, 6)
+
+        self.course.semester = "Second"
+        self.course.level = "Bachelor"
+        self.course.save()
+        ledger = {
+            (row.level, row.semester): (row.credits, float(row.points))
+            for row in GradeLedger.objects.all()
+        }
+        self.assertEqual(
+            ledger, {("", "First"): (2, 4), ("Bachelor", "Second"): (4, 12)}
+        )
+        call_command("rebuild_grade_ledger", check=True, stdout=StringIO())
+
+    def test_rebuild_command_detects_and_fixes_drift(self):
+        TakenCourse.objects.create(student=self.student, course=self.course, point=9)
+        GradeLedger.objects.update(points=0)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_grade_ledger", check=True, stdout=StringIO())
+        call_command("rebuild_grade_ledger", stdout=StringIO())
+        call_command("rebuild_grade_ledger", check=True, stdout=StringIO())
+        self.assertEqual(float(GradeLedger.objects.get().points), 9)
+
+
+class GradingScaleTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=2,
+            program=self.program,
+            semester="First",
+        )
+
+    def test_batch_lookup_matches_scalar_lookup(self):
+        table = GradeTable(default_grade_bands())
+        totals = [-5, 0, 49.99, 50, 59.5, 60, 70, 79.99, 80, 100]
+        grades, points = table.grade_many(totals, [3] * len(totals))
+
+        self.assertEqual(grades, [table.grade(total) for total in totals])
+        self.assertEqual(grades[:4], ["F", "F", "F", "D"])
+        self.assertEqual(points[-1], 12)
+        self.assertEqual(table.comment("D"), "PASS")
+        self.assertEqual(table.comment("F"), "FAIL")
+
+    def test_program_scale_overrides_default(self):
+        GradingScale.objects.create(
+            program=self.program,
+            bands=[
+                {"min": 90, "grade": "A+", "point": 4},
+                {"min": 40, "grade": "D", "point": 1},
+                {"min": 0, "grade": "F", "point": 0},
+            ],
+        )
+        table = GradingScale.objects.table_for(self.program.id)
+        self.assertEqual(table.grade(95), "A+")
+        self.assertEqual(table.grade(45), "D")
+        self.assertEqual(table.grade(40), "D")
+        self.assertEqual(GradingScale.objects.table_for(None).grade(40), "F")
+
+    def test_regrade_updates_rows_and_ledger(self):
+        user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        student = Student.objects.create(student=user, program=self.program)
+        TakenCourse.objects.create(student=student, course=self.course, total=85)
+
+        self.assertEqual(regrade(TakenCourse.objects.all()), 1)
+        taken = TakenCourse.objects.get()
+        self.assertEqual(
+            (taken.grade, taken.comment, float(taken.point)), ("A", "PASS", 8)
+        )
+        self.assertEqual(float(GradeLedger.objects.get().points), 8)
+        self.assertEqual(regrade(TakenCourse.objects.all()), 0)
+
+
+class QuizScoreImportTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms",
+            code="CS101",
+            credit=3,
+            program=program,
+            semester="First",
+        )
+        self.exam = Quiz.objects.create(
+            course=self.course, title="Examen final", category="exam"
+        )
+        self.practice = Quiz.objects.create(course=self.course, title="Cuestionario 1")
+        self.assignment = Quiz.objects.create(course=self.course, title="Tarea 1")
+        self.taken = []
+        for i in range(4):
+            user = User.objects.create_user(
+                username=f"student{i}", password="password", is_student=True
+            )
+            student = Student.objects.create(student=user, program=program)
+            self.taken.append(
+                TakenCourse.objects.create(student=student, course=self.course)
+            )
+            Sitting.objects.create(
+                user=user,
+                quiz=self.exam,
+                course=self.course,
+                question_count=4,
+                current_score=3,
+                complete=True,
+            )
+            ProgressEntry.objects.create(
+                user=user, quiz=self.assignment, score=8, possible=10
+            )
+
+    def test_prefill_uses_fixed_number_of_queries(self):
+        rows = list(
+            TakenCourse.objects.filter(course=self.course).select_related(
+                "student__student", "course"
+            )
+        )
+        with self.assertNumQueries(3):
+            QuizScoreImport(self.course).prefill(rows)
+
+        for row in rows:
+            self.assertEqual(row.final_exam, 75)
+            self.assertEqual(row.assignment, 80)
+            self.assertEqual(row.mid_exam, 0)
+            self.assertEqual(row.attendance, 33.33)
+
+
+class PdfJobTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media, PDF_JOBS_EAGER=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms", code="CS101", credit=3, program=program
+        )
+        self.user = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        student = Student.objects.create(student=self.user, program=program)
+        self.taken = TakenCourse.objects.create(
+            student=student, course=self.course, total=80, grade="A", comment="PASS"
+        )
+        self.url = reverse("certificate_pdf_view", args=[self.taken.id])
+
+    def test_pdf_is_rendered_by_the_worker_and_then_served_from_disk(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        job = PdfJob.objects.get()
+        self.assertRedirects(
+            response,
+            reverse("pdf_job_status", args=[job.key]),
+            target_status_code=202,
+        )
+        status = self.client.get(
+            reverse("pdf_job_status", args=[job.key]), {"format": "json"}
+        )
+        self.assertEqual(status.status_code, 202)
+        self.assertEqual(status.json()["status"], PdfJob.PENDING)
+
+        call_command("process_pdf_jobs", once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, PdfJob.DONE)
+        self.assertTrue(os.path.exists(job.path))
+
+        status = self.client.get(
+            reverse("pdf_job_status", args=[job.key]), {"format": "json"}
+        )
+        self.assertEqual(
+            status.json()["url"], reverse("pdf_job_download", args=[job.key])
+        )
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+        self.assertEqual(PdfJob.objects.count(), 1)
+
+    def test_key_follows_the_inputs(self):
+        certificate = Certificate.objects.create(
+            taken_course=self.taken, serial_number="CERT-1"
+        )
+        first = request_pdf(
+            PdfJob.CERTIFICATE, certificate_inputs(self.taken, certificate), "a.pdf"
+        )
+        again = request_pdf(
+            PdfJob.CERTIFICATE, certificate_inputs(self.taken, certificate), "a.pdf"
+        )
+        self.assertEqual(first.pk, again.pk)
+
+        self.taken.total = 95
+        self.taken.save()
+        changed = request_pdf(
+            PdfJob.CERTIFICATE, certificate_inputs(self.taken, certificate), "a.pdf"
+        )
+        self.assertNotEqual(changed.key, first.key)
+
+    def test_failed_job_is_queued_again(self):
+        certificate = Certificate.objects.create(
+            taken_course=self.taken, serial_number="CERT-1"
+        )
+        inputs = certificate_inputs(self.taken, certificate)
+        job = request_pdf(PdfJob.CERTIFICATE, inputs, "a.pdf")
+
+        def broken(inputs, out):
+            raise ValueError("no fonts")
+
+        with mock.patch.dict(RENDERERS, {PdfJob.CERTIFICATE: broken}):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, PdfJob.FAILED)
+        self.assertIn("no fonts", job.error)
+        self.assertFalse(os.path.exists(job.path))
+
+        job = request_pdf(PdfJob.CERTIFICATE, inputs, "a.pdf")
+        self.assertEqual(job.status, PdfJob.PENDING)
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, PdfJob.DONE)
+
+    def test_job_failing_every_time_stops_being_queued(self):
+        certificate = Certificate.objects.create(
+            taken_course=self.taken, serial_number="CERT-1"
+        )
+        inputs = certificate_inputs(self.taken, certificate)
+
+        def broken(inputs, out):
+            raise ValueError("no fonts")
+
+        with mock.patch.dict(RENDERERS, {PdfJob.CERTIFICATE: broken}):
+            for _ in range(MAX_ATTEMPTS):
+                request_pdf(PdfJob.CERTIFICATE, inputs, "a.pdf")
+                self.assertEqual(run_pending(), 1)
+            job = request_pdf(PdfJob.CERTIFICATE, inputs, "a.pdf")
+            self.assertEqual(job.status, PdfJob.FAILED)
+            self.assertEqual(run_pending(), 0)
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+
+    def test_eager_setting_renders_in_the_request(self):
+        self.client.force_login(self.user)
+        with override_settings(PDF_JOBS_EAGER=True):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PdfJob.objects.get().status, PdfJob.DONE)
+
+    def test_status_needs_a_job_requested_in_the_session(self):
+        job = request_pdf(
+            PdfJob.RESULT_SHEET,
+            result_sheet_inputs(self.course, "First", "2026/2027", self.lecturer),
+            "sheet.pdf",
+        )
+        self.client.force_login(self.lecturer)
+        response = self.client.get(reverse("pdf_job_status", args=[job.key]))
+        self.assertEqual(response.status_code, 404)
+
+
+class PdfRenderTests(TestCase):
+    def test_styles_and_images_are_built_once(self):
+        with self.assertRaises(TypeError):
+            STYLES["body"] = None
+        logo = image("dj-lms.png", 72, 72)
+        self.assertIsNotNone(logo)
+        self.assertIs(image("dj-lms.png", 72, 72), logo)
+        # Scaled down to the drawn size instead of the full source image
+        self.assertLessEqual(max(logo.getSize()), 200)
+        self.assertIsNone(image("missing.png", 72, 72))
+
+    def test_long_result_sheet_spans_pages(self):
+        rows = [
+            {
+                "username": f"ugr-{i}",
+                "full_name": f"student {i}",
+                "total": "50.00",
+                "grade": "C",
+                "point": "6.00",
+                "comment": "PASS",
+                "failed": i == 3,
+            }
+            for i in range(120)
+        ]
+        out = BytesIO()
+        render_result_sheet(
+            {
+                "level": "Bachelor",
+                "semester": "First",
+                "session": "2026/2027",
+                "lecturer": "Lecturer",
+                "rows": rows,
+                "passed": 119,
+                "failed": 1,
+            },
+            out,
+        )
+        pdf = out.getvalue()
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertGreater(pdf.count(b"/Type /Page\n"), 1)
+
+    def test_binary_streams_are_only_set_while_rendering(self):
+        from reportlab import rl_config
+
+        self.assertEqual(rl_config.useA85, 1)
+        out = BytesIO()
+        render_result_sheet(
+            {
+                "level": "Bachelor",
+                "semester": "First",
+                "session": "2026/2027",
+                "lecturer": "Lecturer",
+                "rows": [],
+                "passed": 0,
+                "failed": 0,
+            },
+            out,
+        )
+        self.assertNotIn(b"ASCII85Decode", out.getvalue())
+        self.assertEqual(rl_config.useA85, 1)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_pdf", kind=PdfJob.CERTIFICATE, repeat=1, stdout=out)
+        self.assertIn("certificate: first", out.getvalue())
+
+
+class CertificateExportTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media, PDF_EXPORT_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create_superuser(
+            username="admin", password="password", email="admin@example.com"
+        )
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms", code="CS101", credit=3, program=program
+        )
+        self.passed = []
+        for i in range(4):
+            user = User.objects.create_user(
+                username=f"student{i}", password="password", is_student=True
+            )
+            student = Student.objects.create(student=user, program=program)
+            self.passed.append(
+                TakenCourse.objects.create(
+                    student=student, course=self.course, total=80, comment="PASS"
+                )
+            )
+
+    def test_issue_creates_only_missing_certificates(self):
+        Certificate.objects.create(taken_course=self.passed[0], serial_number="OLD")
+
+        # existing certificates and one bulk_create
+        with self.assertNumQueries(2):
+            created = Certificate.objects.issue(self.passed, issued_by=self.admin)
+        self.assertEqual(created, 3)
+        self.assertEqual(Certificate.objects.count(), 4)
+        self.assertEqual(
+            Certificate.objects.get(taken_course=self.passed[0]).serial_number, "OLD"
+        )
+
+        self.assertEqual(Certificate.objects.issue(self.passed, reissue=True), 4)
+        self.assertFalse(Certificate.objects.filter(serial_number="OLD").exists())
+
+    def test_bulk_generate_view_reissues_the_filter(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse("certificate_bulk_generate"), {"course": self.course.pk}
+        )
+        self.assertRedirects(response, reverse("certificate_manage"))
+        self.assertEqual(Certificate.objects.count(), 4)
+
+    def test_export_streams_a_zip_of_active_certificates(self):
+        Certificate.objects.issue(self.passed[:1], issued_by=self.admin)
+        Certificate.objects.filter(taken_course=self.passed[0]).update(
+            status=Certificate.STATUS_SUSPENDED
+        )
+
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse("certificate_export_zip"), {"course": self.course.pk}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/zip")
+
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        names = archive.namelist()
+        self.assertEqual(len(names), 3)
+        self.assertEqual(
+            sorted(name.split("_")[0] for name in names),
+            sorted(tc.student.student.username for tc in self.passed[1:]),
+        )
+        self.assertTrue(archive.read(names[0]).startswith(b"%PDF"))
+
+    def test_export_renders_in_worker_processes(self):
+        Certificate.objects.issue(self.passed, issued_by=self.admin)
+        certificates = Certificate.objects.select_related(
+            "taken_course__course", "taken_course__student__student"
+        ).order_by("pk")
+
+        archive = zipfile.ZipFile(BytesIO(b"".join(certificate_zip(certificates, 2))))
+        self.assertEqual(
+            [name.split("_")[0] for name in archive.namelist()],
+            [tc.student.student.username for tc in self.passed],
+        )
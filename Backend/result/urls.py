@@ -13,8 +13,11 @@ from .views import (
     certificate_manage,
     certificate_generate,
     certificate_bulk_generate,
+    certificate_export_zip,
     certificate_toggle_status,
     program_course_grades,
+    pdf_job_status,
+    pdf_job_download,
 )
 
 
@@ -31,9 +34,12 @@ urlpatterns = [
     path("certificates/manage/", certificate_manage, name="certificate_manage"),
     path("certificates/generate/<int:id>/", certificate_generate, name="certificate_generate"),
     path("certificates/bulk_generate/", certificate_bulk_generate, name="certificate_bulk_generate"),
+    path("certificates/export/", certificate_export_zip, name="certificate_export_zip"),
     path("certificates/toggle/<int:id>/", certificate_toggle_status, name="certificate_toggle_status"),
     path("program/grades/", program_course_grades, name="program_course_grades"),
     path(
         "registration/form/", course_registration_form, name="course_registration_form"
     ),
+    path("pdf/<str:key>/", pdf_job_status, name="pdf_job_status"),
+    path("pdf/<str:key>/download/", pdf_job_download, name="pdf_job_download"),
 ]
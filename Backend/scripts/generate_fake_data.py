@@ -5,6 +5,7 @@ from faker import Faker
 
 from course.models import Program, Course, CourseAllocation,Upload, UploadVideo,CourseOffer, SEMESTER
 from accounts.models import User, DepartmentHead
+from core.activity import activity_log_disabled
 from core.models import Session
 
 from .generate_fake_accounts_data import UserFactory, ProgramFactory
@@ -176,4 +177,6 @@ def generate_fake_course_data(num_programs: int, num_courses: int, num_course_al
 
 
 
-generate_fake_course_data(10, 10, 10, 10, 10, 10)
\ No newline at end of file
+# Bulk load: skip the activity log entry of every fake object
+with activity_log_disabled():
+    generate_fake_course_data(10, 10, 10, 10, 10, 10)
\ No newline at end of file